@@ -14,6 +14,8 @@ interface CurvePool:
     def add_liquidity(_amounts: uint256[2], _min_mint_amount: uint256) -> uint256: nonpayable
     def remove_liquidity_imbalance(_amounts: uint256[2], _max_burn_amount: uint256) -> uint256: nonpayable
     def get_virtual_price() -> uint256: view
+    def calc_token_amount(_amounts: uint256[2], _is_deposit: bool) -> uint256: view
+    def fee() -> uint256: view
     def balanceOf(arg0: address) -> uint256: view
     def transfer(_to : address, _value : uint256) -> bool: nonpayable
 
@@ -41,8 +43,11 @@ ACTION_DELAY: constant(uint256) = 15 * 60
 ADMIN_ACTIONS_DELAY: constant(uint256) = 3 * 86400
 
 PRECISION: constant(uint256) = 10 ** 18
+FEE_DENOMINATOR: constant(uint256) = 10 ** 10
 # Calculation error for profit
 PROFIT_THRESHOLD: constant(uint256) = 10 ** 18
+# Steps estimated in adaptive mode: whole difference of balances, 1/2 and 1/4 of it
+ADAPTIVE_STEPS: constant(uint256) = 3
 
 POOL: immutable(address)
 I: immutable(uint256)  # index of pegged in pool
@@ -51,11 +56,16 @@ PEGGED: immutable(address)
 METAPOOL: immutable(address)
 META_I: immutable(uint256)
 
-last_change: public(uint256)
-debt: public(uint256)
-
 SHARE_PRECISION: constant(uint256) = 10 ** 5
-caller_share: public(uint256)
+
+# Bits of packed state, from the lowest:
+# last_change (64) | admin_actions_deadline (64) | caller_share (31) | adaptive (1) | debt (96)
+# adaptive: step the largest part of the difference estimated profitable instead of 1/5 of it
+UINT31_MASK: constant(uint256) = 2 ** 31 - 1
+UINT64_MASK: constant(uint256) = 2 ** 64 - 1
+MAX_DEBT: constant(uint256) = 2 ** 96 - 1
+ADAPTIVE_OFFSET: constant(int128) = 159
+packed_state: uint256
 
 admin: public(address)
 future_admin: public(address)
@@ -64,8 +74,6 @@ future_admin: public(address)
 receiver: public(address)
 future_receiver: public(address)
 
-admin_actions_deadline: public(uint256)
-
 
 @external
 def __init__(_pool: address, _index: uint256, _meta_index: uint256, _receiver: address, _caller_share: uint256):
@@ -89,7 +97,83 @@ def __init__(_pool: address, _index: uint256, _meta_index: uint256, _receiver: a
     self.admin = msg.sender
     self.receiver = _receiver
 
-    self.caller_share = _caller_share
+    assert _caller_share <= SHARE_PRECISION  # dev: bad part value
+    self.packed_state = shift(_caller_share, 128)
+
+
+@internal
+@pure
+def _pack(
+    _last_change: uint256, _deadline: uint256, _caller_share: uint256, _adaptive: bool, _debt: uint256
+) -> uint256:
+    assert _debt <= MAX_DEBT  # dev: debt overflow
+    return bitwise_or(
+        bitwise_or(_last_change, shift(_deadline, 64)),
+        bitwise_or(
+            bitwise_or(shift(_caller_share, 128), shift(convert(_adaptive, uint256), ADAPTIVE_OFFSET)),
+            shift(_debt, 160),
+        ),
+    )
+
+
+@internal
+@pure
+def _unpack(_state: uint256) -> (uint256, uint256, uint256, bool, uint256):
+    """
+    @return last_change, admin_actions_deadline, caller_share, adaptive, debt
+    """
+    return (
+        bitwise_and(_state, UINT64_MASK),
+        bitwise_and(shift(_state, -64), UINT64_MASK),
+        bitwise_and(shift(_state, -128), UINT31_MASK),
+        bitwise_and(shift(_state, -ADAPTIVE_OFFSET), 1) == 1,
+        shift(_state, -160),
+    )
+
+
+@internal
+@view
+def _admin_actions_deadline() -> uint256:
+    return bitwise_and(shift(self.packed_state, -64), UINT64_MASK)
+
+
+@internal
+def _store(_value: uint256, _offset: int128, _mask: uint256):
+    """
+    @notice Replace one value of packed state
+    """
+    state: uint256 = bitwise_and(self.packed_state, bitwise_not(shift(_mask, _offset)))
+    self.packed_state = bitwise_or(state, shift(_value, _offset))
+
+
+@view
+@external
+def last_change() -> uint256:
+    return bitwise_and(self.packed_state, UINT64_MASK)
+
+
+@view
+@external
+def admin_actions_deadline() -> uint256:
+    return self._admin_actions_deadline()
+
+
+@view
+@external
+def caller_share() -> uint256:
+    return bitwise_and(shift(self.packed_state, -128), UINT31_MASK)
+
+
+@view
+@external
+def adaptive() -> bool:
+    return bitwise_and(shift(self.packed_state, -ADAPTIVE_OFFSET), 1) == 1
+
+
+@view
+@external
+def debt() -> uint256:
+    return shift(self.packed_state, -160)
 
 
 @pure
@@ -105,47 +189,123 @@ def pool() -> address:
 
 
 @internal
-def _provide(_amount: uint256):
+def _provide(_amount: uint256) -> uint256:
+    """
+    @return Amount of LP tokens minted
+    """
     ERC20Pegged(PEGGED).mint(self, _amount)
 
     amounts: uint256[2] = empty(uint256[2])
     amounts[I] = _amount
-    CurvePool(POOL).add_liquidity(amounts, 0)
+    lp_amount: uint256 = CurvePool(POOL).add_liquidity(amounts, 0)
 
-    self.last_change = block.timestamp
-    self.debt += _amount
     log Provide(_amount)
+    return lp_amount
 
 
 @internal
-def _withdraw(_amount: uint256):
-    debt: uint256 = self.debt
-    amount: uint256 = _amount
-    if amount > debt:
-        amount = debt
-
+def _withdraw(_amount: uint256) -> uint256:
+    """
+    @return Amount of LP tokens burned
+    """
     amounts: uint256[2] = empty(uint256[2])
-    amounts[I] = amount
-    CurvePool(POOL).remove_liquidity_imbalance(amounts, MAX_UINT256)
+    amounts[I] = _amount
+    lp_amount: uint256 = CurvePool(POOL).remove_liquidity_imbalance(amounts, MAX_UINT256)
+
+    log Withdraw(_amount)
+    return lp_amount
 
-    self.last_change = block.timestamp
-    self.debt -= amount
 
-    log Withdraw(amount)
+@internal
+@pure
+def _calc_profit_from(_lp_balance: uint256, _debt: uint256, _virtual_price: uint256) -> uint256:
+    lp_debt: uint256 = _debt * PRECISION / _virtual_price
+
+    if _lp_balance <= lp_debt + PROFIT_THRESHOLD:
+        return 0
+    else:
+        return _lp_balance - lp_debt - PROFIT_THRESHOLD
 
 
 @internal
 @view
 def _calc_profit() -> uint256:
-    lp_balance: uint256 = CurvePool(POOL).balanceOf(self)
+    return self._calc_profit_from(
+        CurvePool(POOL).balanceOf(self),
+        shift(self.packed_state, -160),
+        CurvePool(POOL).get_virtual_price(),
+    )
 
-    virtual_price: uint256 = CurvePool(POOL).get_virtual_price()
-    lp_debt: uint256 = self.debt * PRECISION / virtual_price
 
-    if lp_balance <= lp_debt + PROFIT_THRESHOLD:
-        return 0
+@internal
+@view
+def _estimate_lp(
+    _amount: uint256, _provide: bool, _balance_pegged: uint256, _balance_peg: uint256,
+    _virtual_price: uint256
+) -> uint256:
+    """
+    @notice Estimate LP tokens minted by providing or burned by withdrawing `_amount`
+    @dev `calc_token_amount` does not charge the imbalance fee, it is estimated
+         with the invariant approximated by the sum of balances
+    """
+    amounts: uint256[2] = empty(uint256[2])
+    amounts[I] = _amount
+    lp_amount: uint256 = CurvePool(POOL).calc_token_amount(amounts, _provide)
+
+    # Balances differ from the ideal ones, which keep the proportion, by
+    # the whole change of the peg balance and a part of the pegged one
+    d_invariant: uint256 = lp_amount * _virtual_price / PRECISION
+    balances_sum: uint256 = _balance_pegged + _balance_peg
+    ideal: uint256 = _balance_pegged * d_invariant / balances_sum
+    difference: uint256 = _balance_peg * d_invariant / balances_sum
+    if ideal > _amount:
+        difference += ideal - _amount
     else:
-        return lp_balance - lp_debt - PROFIT_THRESHOLD
+        difference += _amount - ideal
+    # Base fee of a pool with 2 coins is a half of its fee
+    fee: uint256 = CurvePool(POOL).fee() * difference / (2 * FEE_DENOMINATOR)
+    fee = fee * PRECISION / _virtual_price
+
+    if _provide:
+        return lp_amount - min(fee, lp_amount)
+    return lp_amount + fee + 1
+
+
+@internal
+@view
+def _step(
+    _diff: uint256, _provide: bool, _adaptive: bool, _debt: uint256,
+    _balance_pegged: uint256, _balance_peg: uint256, _virtual_price: uint256
+) -> uint256:
+    """
+    @notice Amount of pegged coin moved by `update()`: 1/5 of `_diff` or, in adaptive mode,
+            the largest of `_diff`, `_diff / 2` and `_diff / 4` which is estimated not
+            to decrease the value of the Peg Keeper
+    @dev Shared by `update()` and `preview_update()`, steps are estimated with `_estimate_lp`
+    """
+    amount: uint256 = _diff / 5
+    if not _provide:
+        amount = min(amount, _debt)
+    if not _adaptive:
+        return amount
+
+    step: uint256 = _diff
+    for i in range(ADAPTIVE_STEPS):
+        if not _provide:
+            step = min(step, _debt)
+        if step <= amount:
+            break
+
+        step_lp: uint256 = self._estimate_lp(
+            step, _provide, _balance_pegged, _balance_peg, _virtual_price
+        )
+        # Debt of the step in LP tokens is covered by minted and exceeds burned ones
+        step_lp_debt: uint256 = step * PRECISION / _virtual_price
+        if (_provide and step_lp >= step_lp_debt) or (not _provide and step_lp <= step_lp_debt):
+            return step
+        step /= 2
+
+    return amount
 
 
 @external
@@ -158,6 +318,74 @@ def calc_profit() -> uint256:
     return self._calc_profit()
 
 
+@external
+@view
+def preview_update() -> (int128, uint256, uint256, bool, bool):
+    """
+    @notice Preview `update()` without sending a transaction
+    @dev LP tokens are estimated with `calc_token_amount` of the pool, which is
+         exact for pools without fees. Balanced pool or withdrawal without debt
+         leaves nothing to move, then `update()` reverts in the pool. The amount
+         is chosen by `_step` as in `update()`, adaptive steps included
+    @return Action (1 to provide, -1 to withdraw, 0 for none), amount of pegged coin,
+            expected caller profit, whether `update()` is blocked by the delay
+            and whether it reverts after the delay, as unprofitable or with
+            nothing to move
+    """
+    last_change: uint256 = 0
+    deadline: uint256 = 0
+    caller_share: uint256 = 0
+    adaptive: bool = False
+    debt: uint256 = 0
+    last_change, deadline, caller_share, adaptive, debt = self._unpack(self.packed_state)
+    delayed: bool = last_change + ACTION_DELAY > block.timestamp
+
+    balance_pegged: uint256 = CurvePool(POOL).balances(I)
+    balance_peg: uint256 = CurvePool(POOL).balances(1 - I)
+    meta_virtual_price: uint256 = CurvePool(METAPOOL).get_virtual_price()
+    if I == META_I:
+        balance_peg = balance_peg * PRECISION / meta_virtual_price
+    else:
+        balance_peg = balance_peg * meta_virtual_price / PRECISION
+
+    lp_balance: uint256 = CurvePool(POOL).balanceOf(self)
+    virtual_price: uint256 = CurvePool(POOL).get_virtual_price()
+    initial_profit: uint256 = self._calc_profit_from(lp_balance, debt, virtual_price)
+
+    provide: bool = balance_peg > balance_pegged
+    diff: uint256 = 0
+    if provide:
+        diff = balance_peg - balance_pegged
+    else:
+        diff = balance_pegged - balance_peg
+
+    amount: uint256 = self._step(
+        diff, provide, adaptive, debt, balance_pegged, balance_peg, virtual_price
+    )
+    if amount == 0:
+        return 0, 0, 0, delayed, True
+
+    action: int128 = -1
+    lp_amount: uint256 = self._estimate_lp(
+        amount, provide, balance_pegged, balance_peg, virtual_price
+    )
+    if provide:
+        action = 1
+        lp_balance += lp_amount
+        debt += amount
+    else:
+        if lp_amount > lp_balance:
+            return action, amount, 0, delayed, True
+        lp_balance -= lp_amount
+        debt -= amount
+
+    new_profit: uint256 = self._calc_profit_from(lp_balance, debt, virtual_price)
+    if new_profit < initial_profit:
+        return action, amount, 0, delayed, True
+    caller_profit: uint256 = (new_profit - initial_profit) * caller_share / SHARE_PRECISION
+    return action, amount, caller_profit, delayed, False
+
+
 @external
 @nonpayable
 def update(_beneficiary: address = msg.sender) -> uint256:
@@ -166,34 +394,72 @@ def update(_beneficiary: address = msg.sender) -> uint256:
     @param _beneficiary Beneficiary address
     @return Amount of profit received by beneficiary
     """
-    if self.last_change + ACTION_DELAY > block.timestamp:
+    last_change: uint256 = 0
+    deadline: uint256 = 0
+    caller_share: uint256 = 0
+    adaptive: bool = False
+    debt: uint256 = 0
+    last_change, deadline, caller_share, adaptive, debt = self._unpack(self.packed_state)
+    if last_change + ACTION_DELAY > block.timestamp:
         return 0
 
     balance_pegged: uint256 = CurvePool(POOL).balances(I)
     balance_peg: uint256 = CurvePool(POOL).balances(1 - I)
-    virtual_price: uint256 = CurvePool(METAPOOL).get_virtual_price()
+    meta_virtual_price: uint256 = CurvePool(METAPOOL).get_virtual_price()
     if I == META_I:
-        balance_peg = balance_peg * PRECISION / virtual_price
+        balance_peg = balance_peg * PRECISION / meta_virtual_price
     else:
-        balance_peg = balance_peg * virtual_price / PRECISION
+        balance_peg = balance_peg * meta_virtual_price / PRECISION
 
-    initial_profit: uint256 = self._calc_profit()
+    # LP balance and debt are tracked locally. Profit before and after the action
+    # is valued by one virtual price: fees paid by the action only raise it,
+    # so the profit delta is a lower bound of the real one
+    lp_balance: uint256 = CurvePool(POOL).balanceOf(self)
+    virtual_price: uint256 = CurvePool(POOL).get_virtual_price()
+    initial_profit: uint256 = self._calc_profit_from(lp_balance, debt, virtual_price)
 
-    if balance_peg > balance_pegged:
-        self._provide((balance_peg - balance_pegged) / 5)
+    provide: bool = balance_peg > balance_pegged
+    diff: uint256 = 0
+    if provide:
+        diff = balance_peg - balance_pegged
+    else:
+        diff = balance_pegged - balance_peg
+    # Estimated as in `preview_update()`, the profit check below guards the step
+    amount: uint256 = self._step(
+        diff, provide, adaptive, debt, balance_pegged, balance_peg, virtual_price
+    )
+    if provide:
+        lp_balance += self._provide(amount)
+        debt += amount
     else:
-        self._withdraw((balance_pegged - balance_peg) / 5)
+        lp_balance -= self._withdraw(amount)
+        debt -= amount
+
+    self.packed_state = self._pack(block.timestamp, deadline, caller_share, adaptive, debt)
 
     # Send generated profit
-    new_profit: uint256 = self._calc_profit()
+    new_profit: uint256 = self._calc_profit_from(lp_balance, debt, virtual_price)
     assert new_profit >= initial_profit  # dev: peg was unprofitable
     lp_amount: uint256 = new_profit - initial_profit
-    caller_profit: uint256 = lp_amount * self.caller_share / SHARE_PRECISION
+    caller_profit: uint256 = lp_amount * caller_share / SHARE_PRECISION
     CurvePool(POOL).transfer(_beneficiary, caller_profit)
 
     return caller_profit
 
 
+@external
+@nonpayable
+def set_adaptive(_adaptive: bool):
+    """
+    @notice Switch the size of provide/withdraw steps
+    @param _adaptive Step the largest of the difference of balances, 1/2 and 1/4 of it
+        which is estimated profitable if True, 1/5 of the difference otherwise
+    """
+    assert msg.sender == self.admin  # dev: only admin
+
+    self._store(convert(_adaptive, uint256), ADAPTIVE_OFFSET, 1)
+
+
 @external
 @nonpayable
 def set_new_caller_share(_new_caller_share: uint256):
@@ -204,7 +470,7 @@ def set_new_caller_share(_new_caller_share: uint256):
     assert msg.sender == self.admin  # dev: only admin
     assert _new_caller_share <= SHARE_PRECISION  # dev: bad part value
 
-    self.caller_share = _new_caller_share
+    self._store(_new_caller_share, 128, UINT31_MASK)
 
 
 @external
@@ -230,10 +496,10 @@ def commit_new_admin(_new_admin: address):
     @param _new_admin Address of the new admin
     """
     assert msg.sender == self.admin  # dev: only admin
-    assert self.admin_actions_deadline == 0 # dev: active action
+    assert self._admin_actions_deadline() == 0 # dev: active action
 
     deadline: uint256 = block.timestamp + ADMIN_ACTIONS_DELAY
-    self.admin_actions_deadline = deadline
+    self._store(deadline, 64, UINT64_MASK)
     self.future_admin = _new_admin
 
 
@@ -245,11 +511,11 @@ def apply_new_admin():
     @dev Should be executed from new admin
     """
     assert msg.sender == self.future_admin  # dev: only new admin
-    assert block.timestamp >= self.admin_actions_deadline  # dev: insufficient time
-    assert self.admin_actions_deadline != 0  # dev: no active action
+    assert block.timestamp >= self._admin_actions_deadline()  # dev: insufficient time
+    assert self._admin_actions_deadline() != 0  # dev: no active action
 
     self.admin = self.future_admin
-    self.admin_actions_deadline = 0
+    self._store(0, 64, UINT64_MASK)
 
 
 @external
@@ -260,10 +526,10 @@ def commit_new_receiver(_new_receiver: address):
     @param _new_receiver Address of the new receiver
     """
     assert msg.sender == self.admin  # dev: only admin
-    assert self.admin_actions_deadline == 0 # dev: active action
+    assert self._admin_actions_deadline() == 0 # dev: active action
 
     deadline: uint256 = block.timestamp + ADMIN_ACTIONS_DELAY
-    self.admin_actions_deadline = deadline
+    self._store(deadline, 64, UINT64_MASK)
     self.future_receiver = _new_receiver
 
 
@@ -273,11 +539,11 @@ def apply_new_receiver():
     """
     @notice Apply new receiver of profit
     """
-    assert block.timestamp >= self.admin_actions_deadline  # dev: insufficient time
-    assert self.admin_actions_deadline != 0  # dev: no active action
+    assert block.timestamp >= self._admin_actions_deadline()  # dev: insufficient time
+    assert self._admin_actions_deadline() != 0  # dev: no active action
 
     self.receiver = self.future_receiver
-    self.admin_actions_deadline = 0
+    self._store(0, 64, UINT64_MASK)
 
 
 @external
@@ -289,4 +555,4 @@ def revert_new_staff():
     """
     assert msg.sender == self.admin  # dev: only admin
 
-    self.admin_actions_deadline = 0
+    self._store(0, 64, UINT64_MASK)
@@ -0,0 +1,527 @@
+# @version 0.3.2
+"""
+@title Peg Keeper for several pools
+@license MIT
+@author Curve.Fi
+@notice Peg Keeper for pools with equal decimals of coins sharing one pegged coin
+"""
+
+
+interface CurvePool:
+    def get_balances() -> uint256[2]: view
+    def coins(i: uint256) -> address: view
+    def add_liquidity(_amounts: uint256[2], _min_mint_amount: uint256) -> uint256: nonpayable
+    def remove_liquidity_imbalance(_amounts: uint256[2], _max_burn_amount: uint256) -> uint256: nonpayable
+    def get_virtual_price() -> uint256: view
+    def balanceOf(arg0: address) -> uint256: view
+    def transfer(_to : address, _value : uint256) -> bool: nonpayable
+
+interface ERC20Pegged:
+    def approve(_spender: address, _amount: uint256): nonpayable
+    def mint(_to: address, _amount: uint256): nonpayable
+    def burn(_amount: uint256): nonpayable
+    def balanceOf(arg0: address) -> uint256: view
+
+
+event Provide:
+    pool: indexed(address)
+    amount: uint256
+
+
+event Withdraw:
+    pool: indexed(address)
+    amount: uint256
+
+
+event Profit:
+    pool: indexed(address)
+    lp_amount: uint256
+
+
+event AddPool:
+    pool: indexed(address)
+
+
+event RemovePool:
+    pool: indexed(address)
+
+
+# Time between providing/withdrawing coins
+ACTION_DELAY: constant(uint256) = 15 * 60
+ADMIN_ACTIONS_DELAY: constant(uint256) = 3 * 86400
+
+PRECISION: constant(uint256) = 10 ** 18
+# Calculation error for profit
+PROFIT_THRESHOLD: constant(uint256) = 10 ** 18
+
+MAX_POOLS: constant(uint256) = 8
+
+PEGGED: immutable(address)
+
+pools: public(address[MAX_POOLS])
+n_pools: public(uint256)
+
+# Bits of pool state, from the lowest:
+# last_change (64) | index of pegged + 1, 0 for unknown pools (64) | unused (32) | debt (96)
+UINT64_MASK: constant(uint256) = 2 ** 64 - 1
+MAX_DEBT: constant(uint256) = 2 ** 96 - 1
+pool_state: HashMap[address, uint256]
+
+SHARE_PRECISION: constant(uint256) = 10 ** 5
+caller_share: public(uint256)
+
+admin: public(address)
+future_admin: public(address)
+
+# Receiver of profit
+receiver: public(address)
+future_receiver: public(address)
+
+admin_actions_deadline: public(uint256)
+
+
+@external
+def __init__(_pegged: address, _receiver: address, _caller_share: uint256):
+    """
+    @notice Contract constructor
+    @param _pegged Pegged coin shared by the pools
+    @param _receiver Receiver of the profit
+    @param _caller_share Caller's share of profit
+    """
+    assert _caller_share <= SHARE_PRECISION  # dev: bad part value
+    PEGGED = _pegged
+
+    self.admin = msg.sender
+    self.receiver = _receiver
+
+    self.caller_share = _caller_share
+
+
+@internal
+@pure
+def _pack(_last_change: uint256, _index: uint256, _debt: uint256) -> uint256:
+    assert _debt <= MAX_DEBT  # dev: debt overflow
+    return bitwise_or(bitwise_or(_last_change, shift(_index + 1, 64)), shift(_debt, 160))
+
+
+@internal
+@view
+def _pool_state(_pool: address) -> (uint256, uint256, uint256):
+    """
+    @return last_change, index of pegged, debt
+    """
+    state: uint256 = self.pool_state[_pool]
+    index: uint256 = bitwise_and(shift(state, -64), UINT64_MASK)
+    assert index != 0  # dev: unknown pool
+    return bitwise_and(state, UINT64_MASK), index - 1, shift(state, -160)
+
+
+@pure
+@external
+def pegged() -> address:
+    return PEGGED
+
+
+@view
+@external
+def last_change(_pool: address) -> uint256:
+    return bitwise_and(self.pool_state[_pool], UINT64_MASK)
+
+
+@view
+@external
+def debt(_pool: address) -> uint256:
+    return shift(self.pool_state[_pool], -160)
+
+
+@internal
+def _provide(_pool: address, _index: uint256, _amount: uint256) -> uint256:
+    """
+    @return Amount of LP tokens minted
+    """
+    ERC20Pegged(PEGGED).mint(self, _amount)
+
+    amounts: uint256[2] = empty(uint256[2])
+    amounts[_index] = _amount
+    lp_amount: uint256 = CurvePool(_pool).add_liquidity(amounts, 0)
+
+    log Provide(_pool, _amount)
+    return lp_amount
+
+
+@internal
+def _withdraw(_pool: address, _index: uint256, _amount: uint256) -> uint256:
+    """
+    @return Amount of LP tokens burned
+    """
+    amounts: uint256[2] = empty(uint256[2])
+    amounts[_index] = _amount
+    lp_amount: uint256 = CurvePool(_pool).remove_liquidity_imbalance(amounts, MAX_UINT256)
+
+    log Withdraw(_pool, _amount)
+    return lp_amount
+
+
+@internal
+@pure
+def _calc_profit_from(_lp_balance: uint256, _debt: uint256, _virtual_price: uint256) -> uint256:
+    lp_debt: uint256 = _debt * PRECISION / _virtual_price
+
+    if _lp_balance <= lp_debt + PROFIT_THRESHOLD:
+        return 0
+    else:
+        return _lp_balance - lp_debt - PROFIT_THRESHOLD
+
+
+@internal
+@view
+def _calc_profit(_pool: address) -> uint256:
+    return self._calc_profit_from(
+        CurvePool(_pool).balanceOf(self),
+        shift(self.pool_state[_pool], -160),
+        CurvePool(_pool).get_virtual_price(),
+    )
+
+
+@external
+@view
+def calc_profit(_pool: address) -> uint256:
+    """
+    @notice Calculate profit generated in a pool in LP tokens
+    @param _pool Pool address
+    @return Amount of generated profit
+    """
+    return self._calc_profit(_pool)
+
+
+@internal
+@view
+def _amount(_pool: address, _index: uint256, _debt: uint256) -> (uint256, bool):
+    """
+    @return Amount of pegged coin to change, 0 if there is nothing to do,
+            True to provide it and False to withdraw it
+    """
+    balances: uint256[2] = CurvePool(_pool).get_balances()
+    balance_pegged: uint256 = balances[_index]
+    balance_peg: uint256 = balances[1 - _index]
+
+    if balance_peg > balance_pegged:
+        return (balance_peg - balance_pegged) / 5, True
+    return min((balance_pegged - balance_peg) / 5, _debt), False
+
+
+@internal
+def _update(
+    _pool: address,
+    _index: uint256,
+    _debt: uint256,
+    _amount: uint256,
+    _provide: bool,
+    _caller_share: uint256,
+    _beneficiary: address,
+) -> (uint256, uint256):
+    """
+    @notice Provide or withdraw `_amount` given by `_amount()`
+    @return Amount of LP tokens received by beneficiary, virtual price of the pool
+    """
+    # LP balance and debt are tracked locally. Profit before and after the action
+    # is valued by one virtual price: fees paid by the action only raise it,
+    # so the profit delta is a lower bound of the real one
+    lp_balance: uint256 = CurvePool(_pool).balanceOf(self)
+    virtual_price: uint256 = CurvePool(_pool).get_virtual_price()
+    initial_profit: uint256 = self._calc_profit_from(lp_balance, _debt, virtual_price)
+
+    debt: uint256 = _debt
+    if _provide:
+        lp_balance += self._provide(_pool, _index, _amount)
+        debt += _amount
+    else:
+        lp_balance -= self._withdraw(_pool, _index, _amount)
+        debt -= _amount
+
+    self.pool_state[_pool] = self._pack(block.timestamp, _index, debt)
+
+    # Send generated profit
+    new_profit: uint256 = self._calc_profit_from(lp_balance, debt, virtual_price)
+    assert new_profit >= initial_profit  # dev: peg was unprofitable
+    lp_amount: uint256 = new_profit - initial_profit
+    caller_profit: uint256 = lp_amount * _caller_share / SHARE_PRECISION
+    CurvePool(_pool).transfer(_beneficiary, caller_profit)
+
+    return caller_profit, virtual_price
+
+
+@external
+@nonpayable
+def update(_pool: address, _beneficiary: address = msg.sender) -> uint256:
+    """
+    @notice Provide or withdraw coins from a pool to stabilize it
+    @param _pool Pool address
+    @param _beneficiary Beneficiary address
+    @return Amount of profit received by beneficiary in LP tokens
+    """
+    last_change: uint256 = 0
+    index: uint256 = 0
+    debt: uint256 = 0
+    last_change, index, debt = self._pool_state(_pool)
+    if last_change + ACTION_DELAY > block.timestamp:
+        return 0
+
+    amount: uint256 = 0
+    provide: bool = False
+    amount, provide = self._amount(_pool, index, debt)
+    if amount == 0:
+        return 0
+
+    caller_profit: uint256 = 0
+    virtual_price: uint256 = 0
+    caller_profit, virtual_price = self._update(
+        _pool, index, debt, amount, provide, self.caller_share, _beneficiary
+    )
+    return caller_profit
+
+
+@external
+@nonpayable
+def update_many(_pools: address[MAX_POOLS], _beneficiary: address = msg.sender) -> uint256:
+    """
+    @notice Provide or withdraw coins to stabilize several pools
+    @dev Pools are read until the first empty address. Pools within
+         the action delay or with nothing to do are skipped, so are
+         pools where the action is unprofitable
+    @param _pools Pools addresses
+    @param _beneficiary Beneficiary address
+    @return Value of LP tokens received by beneficiary in coins, by virtual prices
+    """
+    caller_share: uint256 = self.caller_share
+    last_change: uint256 = 0
+    index: uint256 = 0
+    debt: uint256 = 0
+    amount: uint256 = 0
+    provide: bool = False
+    success: bool = False
+    response: Bytes[64] = b""
+    caller_profit: uint256 = 0
+    virtual_price: uint256 = 0
+    total: uint256 = 0
+    for pool in _pools:
+        if pool == ZERO_ADDRESS:
+            break
+        last_change, index, debt = self._pool_state(pool)
+        if last_change + ACTION_DELAY > block.timestamp:
+            continue
+        amount, provide = self._amount(pool, index, debt)
+        if amount == 0:
+            continue
+
+        # Unprofitable update reverts in its own call and only that pool is left out.
+        # The state and balances read here are passed on, nothing changes them before
+        success, response = raw_call(
+            self,
+            _abi_encode(
+                pool, index, debt, amount, provide, caller_share, _beneficiary,
+                method_id=method_id(
+                    "update_one(address,uint256,uint256,uint256,bool,uint256,address)"
+                ),
+            ),
+            max_outsize=64,
+            revert_on_failure=False,
+        )
+        if success:
+            caller_profit = extract32(response, 0, output_type=uint256)
+            virtual_price = extract32(response, 32, output_type=uint256)
+            total += caller_profit * virtual_price / PRECISION
+
+    return total
+
+
+@external
+@nonpayable
+def update_one(
+    _pool: address,
+    _index: uint256,
+    _debt: uint256,
+    _amount: uint256,
+    _provide: bool,
+    _caller_share: uint256,
+    _beneficiary: address,
+) -> (uint256, uint256):
+    """
+    @notice Update one pool of `update_many`
+    @dev Only callable by this contract, with the pool state and action it read
+    @return Amount of LP tokens received by beneficiary, virtual price of the pool
+    """
+    assert msg.sender == self  # dev: only self
+    return self._update(_pool, _index, _debt, _amount, _provide, _caller_share, _beneficiary)
+
+
+@external
+@nonpayable
+def set_new_caller_share(_new_caller_share: uint256):
+    """
+    @notice Set new update caller's part
+    @param _new_caller_share Part with SHARE_PRECISION
+    """
+    assert msg.sender == self.admin  # dev: only admin
+    assert _new_caller_share <= SHARE_PRECISION  # dev: bad part value
+
+    self.caller_share = _new_caller_share
+
+
+@external
+@nonpayable
+def withdraw_profit() -> uint256:
+    """
+    @notice Withdraw profit generated in all pools
+    @return Value of LP tokens received in coins, by virtual prices
+    """
+    receiver: address = self.receiver
+    total: uint256 = 0
+    for pool in self.pools:
+        if pool == ZERO_ADDRESS:
+            break
+
+        virtual_price: uint256 = CurvePool(pool).get_virtual_price()
+        lp_amount: uint256 = self._calc_profit_from(
+            CurvePool(pool).balanceOf(self), shift(self.pool_state[pool], -160), virtual_price
+        )
+        if lp_amount == 0:
+            continue
+        CurvePool(pool).transfer(receiver, lp_amount)
+        total += lp_amount * virtual_price / PRECISION
+
+        log Profit(pool, lp_amount)
+
+    return total
+
+
+@external
+@nonpayable
+def add_pool(_pool: address):
+    """
+    @notice Add a pool to stabilize
+    @param _pool Pool with the pegged coin
+    """
+    assert msg.sender == self.admin  # dev: only admin
+    assert self.pool_state[_pool] == 0  # dev: pool already added
+
+    n_pools: uint256 = self.n_pools
+    assert n_pools < MAX_POOLS  # dev: too many pools
+
+    index: uint256 = 0
+    if CurvePool(_pool).coins(1) == PEGGED:
+        index = 1
+    else:
+        assert CurvePool(_pool).coins(0) == PEGGED  # dev: no pegged coin in pool
+
+    ERC20Pegged(PEGGED).approve(_pool, MAX_UINT256)
+    self.pool_state[_pool] = self._pack(0, index, 0)
+    self.pools[n_pools] = _pool
+    self.n_pools = n_pools + 1
+
+    log AddPool(_pool)
+
+
+@external
+@nonpayable
+def remove_pool(_pool: address):
+    """
+    @notice Stop stabilizing a pool, its LP tokens are sent to the receiver
+    @dev Debt of the pool should be withdrawn first
+    @param _pool Pool address
+    """
+    assert msg.sender == self.admin  # dev: only admin
+
+    last_change: uint256 = 0
+    index: uint256 = 0
+    debt: uint256 = 0
+    last_change, index, debt = self._pool_state(_pool)
+    assert debt == 0  # dev: pool has debt
+
+    n_pools: uint256 = self.n_pools - 1
+    for i in range(MAX_POOLS):
+        if self.pools[i] == _pool:
+            # Move the last pool into the gap
+            self.pools[i] = self.pools[n_pools]
+            break
+    self.pools[n_pools] = ZERO_ADDRESS
+    self.n_pools = n_pools
+    self.pool_state[_pool] = 0
+
+    ERC20Pegged(PEGGED).approve(_pool, 0)
+    lp_amount: uint256 = CurvePool(_pool).balanceOf(self)
+    if lp_amount > 0:
+        CurvePool(_pool).transfer(self.receiver, lp_amount)
+        log Profit(_pool, lp_amount)
+
+    log RemovePool(_pool)
+
+
+@external
+@nonpayable
+def commit_new_admin(_new_admin: address):
+    """
+    @notice Commit new admin of the Peg Keeper
+    @param _new_admin Address of the new admin
+    """
+    assert msg.sender == self.admin  # dev: only admin
+    assert self.admin_actions_deadline == 0 # dev: active action
+
+    deadline: uint256 = block.timestamp + ADMIN_ACTIONS_DELAY
+    self.admin_actions_deadline = deadline
+    self.future_admin = _new_admin
+
+
+@external
+@nonpayable
+def apply_new_admin():
+    """
+    @notice Apply new admin of the Peg Keeper
+    @dev Should be executed from new admin
+    """
+    assert msg.sender == self.future_admin  # dev: only new admin
+    assert block.timestamp >= self.admin_actions_deadline  # dev: insufficient time
+    assert self.admin_actions_deadline != 0  # dev: no active action
+
+    self.admin = self.future_admin
+    self.admin_actions_deadline = 0
+
+
+@external
+@nonpayable
+def commit_new_receiver(_new_receiver: address):
+    """
+    @notice Commit new receiver of profit
+    @param _new_receiver Address of the new receiver
+    """
+    assert msg.sender == self.admin  # dev: only admin
+    assert self.admin_actions_deadline == 0 # dev: active action
+
+    deadline: uint256 = block.timestamp + ADMIN_ACTIONS_DELAY
+    self.admin_actions_deadline = deadline
+    self.future_receiver = _new_receiver
+
+
+@external
+@nonpayable
+def apply_new_receiver():
+    """
+    @notice Apply new receiver of profit
+    """
+    assert block.timestamp >= self.admin_actions_deadline  # dev: insufficient time
+    assert self.admin_actions_deadline != 0  # dev: no active action
+
+    self.receiver = self.future_receiver
+    self.admin_actions_deadline = 0
+
+
+@external
+@nonpayable
+def revert_new_staff():
+    """
+    @notice Revert new admin of the Peg Keeper
+    @dev Should be executed from admin
+    """
+    assert msg.sender == self.admin  # dev: only admin
+
+    self.admin_actions_deadline = 0
@@ -0,0 +1,34 @@
+# @version 0.3.4
+"""
+@notice Aggregate results of multiple view calls, ABI compatible with
+        MakerDAO Multicall `aggregate`
+"""
+
+MAX_CALLS: constant(uint256) = 64
+# Selector and up to two arguments
+MAX_CALLDATA: constant(uint256) = 68
+# One word of returned data
+MAX_RETURNDATA: constant(uint256) = 32
+
+struct Query:
+    target: address
+    call_data: Bytes[MAX_CALLDATA]
+
+
+@external
+@view
+def aggregate(
+    _calls: DynArray[Query, MAX_CALLS]
+) -> (uint256, DynArray[Bytes[MAX_RETURNDATA], MAX_CALLS]):
+    """
+    @notice Make static calls and return their results with the block number
+    @dev Reverts if any of the calls reverts
+    @param _calls Targets and calldata of calls
+    @return Block number, returned data of every call
+    """
+    results: DynArray[Bytes[MAX_RETURNDATA], MAX_CALLS] = []
+    for query in _calls:
+        results.append(
+            raw_call(query.target, query.call_data, max_outsize=MAX_RETURNDATA, is_static_call=True)
+        )
+    return block.number, results
@@ -82,6 +82,8 @@ A_PRECISION: constant(uint256) = 100
 MAX_A: constant(uint256) = 10 ** 6
 MAX_A_CHANGE: constant(uint256) = 10
 MIN_RAMP_TIME: constant(uint256) = 86400
+# get_D stops early only if balances differ at most this many times
+EARLY_STOP_RATIO: constant(uint256) = 10
 
 EIP712_TYPEHASH: constant(bytes32) = keccak256("EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)")
 PERMIT_TYPEHASH: constant(bytes32) = keccak256("Permit(address owner,address spender,uint256 value,uint256 nonce,uint256 deadline)")
@@ -358,17 +360,22 @@ def get_D(_xp: uint256[N_COINS], _amp: uint256) -> uint256:
 
     D: uint256 = S
     Ann: uint256 = _amp * N_COINS
+    # Away from balance, rounding keeps moving D by a few wei after Newton's method
+    # has converged. There the loop runs until the step is 1 as in deployed pools.
+    early_stop: bool = _xp[0] <= EARLY_STOP_RATIO * _xp[1] and _xp[1] <= EARLY_STOP_RATIO * _xp[0]
     for i in range(255):
         D_P: uint256 = D * D / _xp[0] * D / _xp[1] / (N_COINS)**2
         Dprev: uint256 = D
         D = (Ann * S / A_PRECISION + D_P * N_COINS) * D / ((Ann - A_PRECISION) * D / A_PRECISION + (N_COINS + 1) * D_P)
-        # Equality with the precision of 1
+        diff: uint256 = 0
         if D > Dprev:
-            if D - Dprev <= 1:
-                return D
+            diff = D - Dprev
         else:
-            if Dprev - D <= 1:
-                return D
+            diff = Dprev - D
+        # Equality with the precision of 1. Newton's method converges quadratically
+        # (the next step is at most diff**2 / D), so stop once it would be below 1
+        if diff <= 1 or (early_stop and diff * diff < D / 4):
+            return D
     # convergence typically occurs in 4 rounds or less, this should be unreachable!
     # if it does happen the pool is borked and LPs can withdraw via `remove_liquidity`
     raise
@@ -557,14 +564,17 @@ def get_y(i: int128, j: int128, x: uint256, xp: uint256[N_COINS]) -> uint256:
 
     for _i in range(255):
         y_prev = y
-        y = (y*y + c) / (2 * y + b - D)
-        # Equality with the precision of 1
+        denominator: uint256 = 2 * y + b - D
+        y = (y*y + c) / denominator
+        diff: uint256 = 0
         if y > y_prev:
-            if y - y_prev <= 1:
-                return y
+            diff = y - y_prev
         else:
-            if y_prev - y <= 1:
-                return y
+            diff = y_prev - y
+        # Equality with the precision of 1. Newton's method converges quadratically
+        # (the next step is at most diff**2 / denominator), so stop once it would be below 1
+        if diff <= 1 or diff * diff < denominator / 4:
+            return y
     raise
 
 
@@ -809,14 +819,17 @@ def get_y_D(A: uint256, i: int128, xp: uint256[N_COINS], D: uint256) -> uint256:
 
     for _i in range(255):
         y_prev = y
-        y = (y*y + c) / (2 * y + b - D)
-        # Equality with the precision of 1
+        denominator: uint256 = 2 * y + b - D
+        y = (y*y + c) / denominator
+        diff: uint256 = 0
         if y > y_prev:
-            if y - y_prev <= 1:
-                return y
+            diff = y - y_prev
         else:
-            if y_prev - y <= 1:
-                return y
+            diff = y_prev - y
+        # Equality with the precision of 1. Newton's method converges quadratically
+        # (the next step is at most diff**2 / denominator), so stop once it would be below 1
+        if diff <= 1 or diff * diff < denominator / 4:
+            return y
     raise
 
 
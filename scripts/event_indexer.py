@@ -0,0 +1,247 @@
+"""
+Indexer of `Provide`, `Withdraw`, `Profit` and `WithdrawPegged` events of Peg Keepers.
+
+Logs are fetched in ranges of `CHUNK_BLOCKS` blocks and every range with logs
+is written to its own chunk file. A checkpoint of the next block to index is
+saved after every range, so indexing resumes where it stopped. Only blocks
+with `CONFIRMATIONS` blocks on top of them are indexed.
+
+    brownie run event_indexer main reports/events PegKeeperMim:0x... --network mainnet
+The first block to index is taken from `INDEX_FROM_BLOCK` env variable, 0 by default.
+
+Chunks are zip archives with one member per column. A column is a raw
+little-endian array, e.g. readable by `numpy.frombuffer`:
+    block       uint64
+    log_index   uint32
+    keeper      uint16, index of the Peg Keeper in the checkpoint
+    event       uint8, index of the event in `EVENTS`
+    amount      32 bytes per row, big-endian uint256
+    receiver    20 bytes per row, zero address for events other than `WithdrawPegged`
+"""
+
+import json
+import os
+import sys
+import time
+import zipfile
+from array import array
+
+from brownie import web3
+from eth_utils import to_checksum_address
+from hexbytes import HexBytes
+
+from scripts.keeper import load_peg_keeper
+
+EVENTS = ("Provide", "Withdraw", "Profit", "WithdrawPegged")
+PROVIDE, WITHDRAW, PROFIT, WITHDRAW_PEGGED = range(len(EVENTS))
+
+CHUNK_BLOCKS = 10_000
+CONFIRMATIONS = 12
+POLL_INTERVAL = 60  # seconds
+CHECKPOINT = "checkpoint.json"
+
+# Array typecode of a column, or size of one value in bytes
+COLUMNS = {
+    "block": "Q",
+    "log_index": "I",
+    "keeper": "H",
+    "event": "B",
+    "amount": 32,
+    "receiver": 20,
+}
+
+
+def _dump(column: array) -> bytes:
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _load(typecode: str, data: bytes) -> array:
+    column = array(typecode)
+    column.frombytes(data)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column
+
+
+def _write_atomic(path: str, write):
+    # Readers never see a partially written file
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+class EventIndexer:
+    """
+    Indexes events of `peg_keepers` into chunk files in the `path` directory.
+    Indexing starts at `from_block` unless the directory has a checkpoint.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        peg_keepers,
+        from_block: int = 0,
+        chunk_blocks: int = CHUNK_BLOCKS,
+        confirmations: int = CONFIRMATIONS,
+    ):
+        self.path = path
+        self.peg_keepers = list(peg_keepers)
+        self.chunk_blocks = chunk_blocks
+        self.confirmations = confirmations
+
+        addresses = [peg_keeper.address for peg_keeper in self.peg_keepers]
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(self._file(CHECKPOINT)):
+            self.checkpoint = load_checkpoint(path)
+            if self.checkpoint["keepers"] != addresses:
+                raise ValueError(f"{path} indexes other Peg Keepers")
+        else:
+            self.checkpoint = {
+                "keepers": addresses,
+                "next_block": from_block,
+                "chunks": [],
+            }
+
+        # topic -> index of the event
+        self._events = {}
+        for peg_keeper in self.peg_keepers:
+            for name, topic in peg_keeper.topics.items():
+                if name in EVENTS:
+                    self._events[topic] = EVENTS.index(name)
+        self._topics = {HexBytes(topic): event for topic, event in self._events.items()}
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _save_checkpoint(self):
+        data = json.dumps(self.checkpoint, indent=2).encode()
+        _write_atomic(self._file(CHECKPOINT), lambda f: f.write(data))
+
+    def _write_chunk(self, name: str, logs):
+        columns = {
+            column: array(kind) if isinstance(kind, str) else bytearray()
+            for column, kind in COLUMNS.items()
+        }
+        keepers = self.checkpoint["keepers"]
+        for log in logs:
+            event = self._topics[HexBytes(log.topics[0])]
+            data = HexBytes(log.data)
+            columns["block"].append(log.blockNumber)
+            columns["log_index"].append(log.logIndex)
+            columns["keeper"].append(keepers.index(to_checksum_address(log.address)))
+            columns["event"].append(event)
+            columns["amount"] += data[:32]
+            # Receiver is the second word of `WithdrawPegged` data
+            columns["receiver"] += (
+                data[44:64] if event == WITHDRAW_PEGGED else bytes(20)
+            )
+
+        def write(f):
+            with zipfile.ZipFile(f, "w", zipfile.ZIP_STORED) as archive:
+                for column, values in columns.items():
+                    if isinstance(values, array):
+                        values = _dump(values)
+                    archive.writestr(column, bytes(values))
+
+        _write_atomic(self._file(name), write)
+
+    def sync(self, block_identifier="latest") -> int:
+        """
+        Index confirmed blocks up to a block, one range of blocks per request.
+        Returns the next block to index.
+        """
+        head = web3.eth.get_block(block_identifier).number - self.confirmations
+        start = self.checkpoint["next_block"]
+        while start <= head:
+            end = min(start + self.chunk_blocks - 1, head)
+            logs = web3.eth.get_logs(
+                {
+                    "address": self.checkpoint["keepers"],
+                    "fromBlock": start,
+                    "toBlock": end,
+                    "topics": [list(self._events)],
+                }
+            )
+            if logs:
+                name = f"{start:012d}-{end:012d}.zip"
+                self._write_chunk(name, logs)
+                self.checkpoint["chunks"].append(name)
+            self.checkpoint["next_block"] = end + 1
+            self._save_checkpoint()
+            start = end + 1
+        return self.checkpoint["next_block"]
+
+
+def load_checkpoint(path: str) -> dict:
+    with open(os.path.join(path, CHECKPOINT)) as f:
+        return json.load(f)
+
+
+def read_columns(path: str) -> dict:
+    """
+    Read all indexed events as columns of equal length, ordered by block and log index.
+    `amount` is a list of ints and `receiver` a list of checksummed addresses.
+    """
+    columns = {name: [] for name in COLUMNS}
+    for chunk in load_checkpoint(path)["chunks"]:
+        with zipfile.ZipFile(os.path.join(path, chunk)) as archive:
+            for name, kind in COLUMNS.items():
+                data = archive.read(name)
+                if isinstance(kind, str):
+                    columns[name] += _load(kind, data)
+                elif name == "amount":
+                    columns[name] += [
+                        int.from_bytes(data[i : i + kind], "big")
+                        for i in range(0, len(data), kind)
+                    ]
+                else:
+                    columns[name] += [
+                        to_checksum_address(data[i : i + kind])
+                        for i in range(0, len(data), kind)
+                    ]
+    return columns
+
+
+def _history(path: str, address: str, events, signs) -> list:
+    keepers = load_checkpoint(path)["keepers"]
+    keeper = keepers.index(to_checksum_address(address))
+    columns = read_columns(path)
+
+    history = []
+    total = 0
+    for block, i, event, amount in zip(
+        columns["block"], columns["keeper"], columns["event"], columns["amount"]
+    ):
+        if i != keeper or event not in events:
+            continue
+        total += signs[events.index(event)] * amount
+        if history and history[-1][0] == block:
+            history[-1] = (block, total)
+        else:
+            history.append((block, total))
+    return history
+
+
+def debt_history(path: str, address: str) -> list:
+    """`(block, debt)` of a Peg Keeper after every block it provided or withdrew in."""
+    return _history(path, address, (PROVIDE, WITHDRAW), (1, -1))
+
+
+def profit_history(path: str, address: str) -> list:
+    """`(block, total LP tokens withdrawn as profit)` of a Peg Keeper after every `Profit`."""
+    return _history(path, address, (PROFIT,), (1,))
+
+
+def main(path, *specs):
+    peg_keepers = [load_peg_keeper(spec) for spec in specs]
+    from_block = int(os.environ.get("INDEX_FROM_BLOCK", 0))
+    indexer = EventIndexer(path, peg_keepers, from_block)
+
+    while True:
+        next_block = indexer.sync()
+        print(f"Indexed up to block {next_block - 1}")
+        time.sleep(POLL_INTERVAL)
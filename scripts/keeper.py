@@ -0,0 +1,243 @@
+"""
+Bot calling `update()` of deployed Peg Keepers only when it pays off.
+
+Every Peg Keeper is given as `<contract name>:<address>`, e.g.
+    brownie run keeper main PegKeeperMim:0x... --network mainnet
+The caller account is loaded by the name in `KEEPER_ACCOUNT` env variable.
+"""
+
+import os
+import time
+
+from brownie import Contract, accounts, chain, web3
+from brownie.exceptions import VirtualMachineError
+from brownie.project.main import get_loaded_projects
+
+from scripts.multicall import MULTICALL, read
+from scripts.simulation import peg_keeper as models
+from scripts.simulation.stableswap import PRECISION, Revert, StableSwap, StableSwapMeta
+
+ETH_USD_FEED = "0x5f4eC3Df9cbd43714FE2740f5E3616155c5b8419"  # Chainlink ETH / USD
+ETH_USD_FEED_ABI = [
+    {
+        "name": "latestAnswer",
+        "inputs": [],
+        "outputs": [{"name": "", "type": "int256"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+]
+ETH_USD_DECIMALS = 8
+
+# Metapool coins which are LP tokens of a base pool
+THREE_CRV = "0x6c3F90f043a72FA612cbac8115EE7e52BDe6E490"
+THREE_POOL = "0xbEbc44782C7dB0a1A60Cb6fe97d0b483032FF1C7"
+BASE_POOLS = {THREE_CRV: THREE_POOL}
+
+# Caller's profit should exceed gas cost by this factor, in percent
+MIN_PROFIT_RATIO = 120
+POLL_INTERVAL = 12  # seconds
+
+MODELS = {
+    "PegKeeperOptimized": models.PegKeeper,
+    "PegKeeperMetaOptimized": models.PegKeeperMeta,
+    "PegKeeperMim": models.PegKeeperMim,
+}
+
+
+# Immutable state of Peg Keepers by contract name and address
+_DESCRIPTIONS = {}
+
+
+def load_peg_keeper(spec: str):
+    """Load a Peg Keeper contract from `<contract name>:<address>`."""
+    name, address = spec.split(":")
+    if name not in MODELS:
+        raise ValueError(f"Unknown Peg Keeper contract: {name}")
+    project = get_loaded_projects()[0]
+    return getattr(project, name).at(address)
+
+
+def load_contract(name: str, address: str, interface: str):
+    # Use ABI of the testing contracts as interface to the deployed ones
+    project = get_loaded_projects()[0]
+    return Contract.from_abi(name, address, getattr(project, interface).abi)
+
+
+def describe(peg_keeper) -> tuple:
+    """
+    Immutable part of a Peg Keeper: `(pool, pegged, index of pegged, rate sources)`.
+    Rate source is a contract with `get_virtual_price` for a metapool token.
+    """
+    key = (peg_keeper._name, peg_keeper.address)
+    if key not in _DESCRIPTIONS:
+        pool = load_contract("CurvePool", peg_keeper.pool(), "StableSwapMeta")
+        pegged = load_contract("Pegged", peg_keeper.pegged(), "ERC20Mock")
+        coins = [pool.coins(i) for i in range(2)]
+
+        # Rate of a metapool token is the virtual price of its base pool
+        rate_sources = [None, None]
+        for i, coin in enumerate(coins):
+            if coin in BASE_POOLS:
+                rate_sources[i] = load_contract(
+                    "BasePool", BASE_POOLS[coin], "StableSwap"
+                )
+            elif peg_keeper._name == "PegKeeperMetaOptimized" and coin != pegged:
+                # PegKeeperMetaOptimized reads the virtual price from the coin itself
+                rate_sources[i] = load_contract("BasePool", coin, "ERC20Mock")
+
+        index = 0 if coins[0] == pegged else 1
+        _DESCRIPTIONS[key] = (pool, pegged, index, rate_sources)
+    return _DESCRIPTIONS[key]
+
+
+def _model_calls(peg_keeper) -> list:
+    pool, pegged, _, rate_sources = describe(peg_keeper)
+
+    calls = [
+        (pool.balances, (0,)),
+        (pool.balances, (1,)),
+        (pool.A_precise, ()),
+        (pool.fee, ()),
+        (pool.totalSupply, ()),
+        (pool.balanceOf, (peg_keeper.address,)),
+        (peg_keeper.caller_share, ()),
+        (peg_keeper.debt, ()),
+        (peg_keeper.last_change, ()),
+        (peg_keeper.adaptive, ()),
+    ]
+    calls += [
+        (source.get_virtual_price, ()) for source in rate_sources if source is not None
+    ]
+    if peg_keeper._name == "PegKeeperMim":
+        calls.append((pegged.balanceOf, (peg_keeper.address,)))
+    return calls
+
+
+def _build_model(peg_keeper, values):
+    # Consumes the values of `_model_calls(peg_keeper)` from the iterator `values`
+    _, _, index, rate_sources = describe(peg_keeper)
+    sources = [source for source in rate_sources if source is not None]
+
+    balances = [next(values), next(values)]
+    A_precise, fee, total_supply, lp_balance = (next(values) for _ in range(4))
+    kwargs = {
+        "caller_share": next(values),
+        "debt": next(values),
+        "lp_balance": lp_balance,
+        "last_change": next(values),
+        "adaptive": next(values),
+    }
+    rates = [PRECISION if source is None else next(values) for source in rate_sources]
+
+    pool_cls = StableSwapMeta if sources else StableSwap
+    model = pool_cls(balances, rates, A_precise, fee, total_supply)
+
+    if peg_keeper._name == "PegKeeperMim":
+        return models.PegKeeperMim(model, pegged_balance=next(values), **kwargs)
+    return MODELS[peg_keeper._name](model, index=index, **kwargs)
+
+
+def load_models(peg_keepers, block_identifier=None, multicall=None, cache=None) -> list:
+    """
+    Build the Python models of Peg Keepers and their pools from chain state.
+    With `multicall` the calls of all of them are aggregated together. With
+    `cache` the state is read at the block it is synced to, only values missing
+    in it are fetched.
+    """
+    calls = [call for peg_keeper in peg_keepers for call in _model_calls(peg_keeper)]
+    if cache is not None:
+        values = iter(cache.read(calls))
+    else:
+        values = iter(read(calls, block_identifier, multicall))
+    return [_build_model(peg_keeper, values) for peg_keeper in peg_keepers]
+
+
+def load_model(peg_keeper, block_identifier=None, multicall=None, cache=None):
+    """Build the Python model of one Peg Keeper, see `load_models`."""
+    return load_models([peg_keeper], block_identifier, multicall, cache)[0]
+
+
+def gas_cost(gas: int, gas_price: int) -> int:
+    """Cost of gas in USD with 18 decimals."""
+    if gas_price == 0:
+        return 0
+    feed = Contract.from_abi("EthUsdFeed", ETH_USD_FEED, ETH_USD_FEED_ABI)
+    eth_price = feed.latestAnswer() * 10 ** (18 - ETH_USD_DECIMALS)
+    return gas * gas_price * eth_price // 10**18
+
+
+def expected_caller_profit(model, timestamp: int) -> int:
+    """
+    Expected profit of calling `update()` at `timestamp` in USD with 18 decimals.
+    Returns 0 when the call would return nothing or revert.
+    """
+    virtual_price = model.pool.get_virtual_price()
+    try:
+        caller_profit = model.copy().update(timestamp)
+    except Revert:
+        return 0
+    # LP tokens are valued by the virtual price, the peg is assumed to be 1 USD
+    return caller_profit * virtual_price // PRECISION
+
+
+def is_profitable(
+    peg_keeper, model, timestamp: int, caller, beneficiary, gas_price
+) -> bool:
+    """Check if `update()` pays off the gas, given the model read at `timestamp`."""
+    if model.last_change + models.ACTION_DELAY > timestamp:
+        return False
+
+    # The transaction lands in one of the next blocks
+    profit = expected_caller_profit(model, timestamp + POLL_INTERVAL)
+    if profit == 0:
+        return False
+
+    try:
+        # `update` is overloaded by its default argument
+        update = peg_keeper.update["address"]
+        gas = update.estimate_gas(beneficiary, {"from": caller})
+    except (ValueError, VirtualMachineError):
+        return False
+    return profit * 100 >= gas_cost(gas, gas_price) * MIN_PROFIT_RATIO
+
+
+def try_update(
+    peg_keeper, caller, beneficiary=None, gas_price=None, multicall=None
+) -> bool:
+    """
+    Simulate `update()` and send it if the caller's profit covers gas.
+    Returns True if the transaction was sent.
+    """
+    block = web3.eth.get_block("latest")
+    timestamp = block.timestamp
+    model = load_model(peg_keeper, block.number, multicall)
+    beneficiary = beneficiary or caller
+    if gas_price is None:
+        gas_price = web3.eth.gas_price
+    if not is_profitable(peg_keeper, model, timestamp, caller, beneficiary, gas_price):
+        return False
+
+    peg_keeper.update(beneficiary, {"from": caller, "gas_price": gas_price})
+    return True
+
+
+def next_update_time(peg_keeper) -> int:
+    return peg_keeper.last_change() + models.ACTION_DELAY
+
+
+def main(*specs):
+    caller = accounts.load(os.environ["KEEPER_ACCOUNT"])
+    peg_keepers = [load_peg_keeper(spec) for spec in specs]
+    multicall = load_contract("Multicall", MULTICALL, "Multicall")
+
+    while True:
+        now = chain.time()
+        for peg_keeper in peg_keepers:
+            if next_update_time(peg_keeper) > now:
+                continue
+            try:
+                try_update(peg_keeper, caller, multicall=multicall)
+            except Exception as e:
+                print(f"{peg_keeper._name} at {peg_keeper.address}: {e!r}")
+        time.sleep(POLL_INTERVAL)
@@ -0,0 +1,233 @@
+"""
+Asyncio scheduler calling `update()` over a fleet of Peg Keepers.
+
+Peg Keepers wait in a priority queue keyed by the time of the next allowed
+update. The state of all due Peg Keepers is read at once and their
+transactions are sent concurrently, with nonces assigned locally.
+
+    brownie run keeper_fleet main PegKeeperOptimized:0x... PegKeeperMim:0x... --network mainnet
+The caller account is loaded by the name in `KEEPER_ACCOUNT` env variable.
+"""
+
+import asyncio
+import heapq
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from brownie import accounts, web3
+
+from scripts import keeper
+from scripts.multicall import MULTICALL
+from scripts.simulation.peg_keeper import ACTION_DELAY
+from scripts.state_cache import StateCache
+
+MAX_WORKERS = 16
+
+
+class NonceManager:
+    """
+    Hands out consecutive nonces for transactions sent concurrently.
+    After a send fails the nonce is read again from the node, once the other
+    sends in flight are finished. No nonce is handed out until then.
+    """
+
+    def __init__(self, account):
+        self.account = account
+        self._nonce = None
+        self._in_flight = 0
+        self._condition = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        # The condition is bound to the running event loop
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def next(self, call) -> int:
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(
+                lambda: self._nonce is not None or self._in_flight == 0
+            )
+            if self._nonce is None:
+                # Account for transactions which are still pending
+                self._nonce = await call(
+                    web3.eth.get_transaction_count, self.account.address, "pending"
+                )
+            nonce = self._nonce
+            self._nonce += 1
+            self._in_flight += 1
+            return nonce
+
+    async def done(self, failed: bool = False):
+        """Mark the send of a nonce as finished, `failed` if it was not sent."""
+        condition = self._get_condition()
+        async with condition:
+            self._in_flight -= 1
+            if failed:
+                self._nonce = None
+            condition.notify_all()
+
+
+class Fleet:
+    """
+    Schedules `update()` calls of many Peg Keepers from one account.
+    Blocking brownie calls run in a thread pool. `gas_price` defaults to
+    the one suggested by the node at every step. With `multicall` the state
+    of every Peg Keeper is read in one call. With `cache` only the state
+    touched by events since the previous step is read.
+    """
+
+    def __init__(
+        self,
+        peg_keepers,
+        caller,
+        beneficiary=None,
+        gas_price=None,
+        multicall=None,
+        cache=None,
+        max_workers=MAX_WORKERS,
+    ):
+        self.peg_keepers = list(peg_keepers)
+        self.caller = caller
+        self.beneficiary = beneficiary or caller
+        self.gas_price = gas_price
+        self.multicall = multicall
+        self.cache = cache
+        self.nonces = NonceManager(caller)
+        self._executor = ThreadPoolExecutor(max_workers)
+        self._pools = []
+        # (next update time, index in `peg_keepers`)
+        self._queue = []
+
+    async def _call(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, *args))
+
+    def _push(self, timestamp: int, i: int):
+        heapq.heappush(self._queue, (timestamp, i))
+
+    def _pop_due(self, now: int) -> list:
+        due = []
+        while self._queue and self._queue[0][0] <= now:
+            due.append(heapq.heappop(self._queue)[1])
+        return due
+
+    async def schedule(self):
+        """Fill the queue with the next update time of every Peg Keeper."""
+        times = await asyncio.gather(
+            *(self._call(peg_keeper.last_change) for peg_keeper in self.peg_keepers)
+        )
+        self._pools = await asyncio.gather(
+            *(self._call(peg_keeper.pool) for peg_keeper in self.peg_keepers)
+        )
+        if self.cache is not None:
+            for peg_keeper in self.peg_keepers:
+                await self._call(self.cache.add_peg_keeper, peg_keeper)
+
+        self._queue = []
+        for i, last_change in enumerate(times):
+            self._push(last_change + ACTION_DELAY, i)
+
+    async def _update(self, peg_keeper, model, timestamp: int, gas_price: int) -> tuple:
+        # Returns the time of the next update attempt and if the transaction was sent
+        profitable = await self._call(
+            keeper.is_profitable,
+            peg_keeper,
+            model,
+            timestamp,
+            self.caller,
+            self.beneficiary,
+            gas_price,
+        )
+        if not profitable:
+            return timestamp + keeper.POLL_INTERVAL, False
+
+        nonce = await self.nonces.next(self._call)
+        tx_params = {
+            "from": self.caller,
+            "nonce": nonce,
+            "gas_price": gas_price,
+            "required_confs": 0,
+        }
+        try:
+            tx = await self._call(peg_keeper.update, self.beneficiary, tx_params)
+        except Exception:
+            await self.nonces.done(failed=True)
+            raise
+        await self.nonces.done()
+        await self._call(tx.wait, 1)
+        if tx.status != 1:
+            return timestamp + keeper.POLL_INTERVAL, True
+        return tx.timestamp + ACTION_DELAY, True
+
+    async def step(self) -> list:
+        """
+        Update all due Peg Keepers.
+        Returns indexes of Peg Keepers for which a transaction was sent.
+        """
+        block = await self._call(web3.eth.get_block, "latest")
+        now = block.timestamp
+
+        # Peg Keepers of the same pool can not be updated on one state
+        due, pools = [], set()
+        for i in self._pop_due(now):
+            pool = self._pools[i]
+            if pool in pools:
+                self._push(now + keeper.POLL_INTERVAL, i)
+                continue
+            pools.add(pool)
+            due.append(i)
+        if not due:
+            return []
+
+        gas_price = self.gas_price
+        if gas_price is None:
+            gas_price = await self._call(lambda: web3.eth.gas_price)
+        if self.cache is not None:
+            await self._call(self.cache.sync, block.number)
+        loaded = await self._call(
+            keeper.load_models,
+            [self.peg_keepers[i] for i in due],
+            block.number,
+            self.multicall,
+            self.cache,
+        )
+        results = await asyncio.gather(
+            *(
+                self._update(self.peg_keepers[i], model, now, gas_price)
+                for i, model in zip(due, loaded)
+            ),
+            return_exceptions=True,
+        )
+
+        sent = []
+        for i, result in zip(due, results):
+            if isinstance(result, Exception):
+                peg_keeper = self.peg_keepers[i]
+                print(f"{peg_keeper._name} at {peg_keeper.address}: {result!r}")
+                result = now + keeper.POLL_INTERVAL, False
+            next_time, is_sent = result
+            if is_sent:
+                sent.append(i)
+            self._push(next_time, i)
+        return sent
+
+    async def run(self):
+        await self.schedule()
+        while True:
+            await self.step()
+            await asyncio.sleep(keeper.POLL_INTERVAL)
+
+
+def main(*specs):
+    caller = accounts.load(os.environ["KEEPER_ACCOUNT"])
+    multicall = keeper.load_contract("Multicall", MULTICALL, "Multicall")
+    fleet = Fleet(
+        [keeper.load_peg_keeper(spec) for spec in specs],
+        caller,
+        multicall=multicall,
+        cache=StateCache(multicall),
+    )
+    asyncio.run(fleet.run())
@@ -0,0 +1,31 @@
+"""
+Reading of many view functions in one `eth_call` through a Multicall contract.
+
+`contracts/testing/Multicall.vy` is ABI compatible with MakerDAO Multicall,
+so on mainnet the deployed MakerDAO one is used. Only one word of returned
+data is kept for every call.
+"""
+
+# MakerDAO Multicall on mainnet
+MULTICALL = "0xeefBa1e63905eF1D7ACbA5a8513c70307C1cE441"
+MAX_CALLS = 64
+
+
+def read(calls, block_identifier=None, multicall=None) -> list:
+    """
+    Read `(contract_call, args)` pairs at the same block.
+    With `multicall` they are aggregated into one call, otherwise called one by one.
+    """
+    if multicall is None:
+        return [fn(*args, block_identifier=block_identifier) for fn, args in calls]
+
+    values = []
+    for i in range(0, len(calls), MAX_CALLS):
+        chunk = calls[i : i + MAX_CALLS]
+        # Later chunks are read at the block of the first one
+        block_identifier, results = multicall.aggregate(
+            [(fn._address, fn.encode_input(*args)) for fn, args in chunk],
+            block_identifier=block_identifier,
+        )
+        values += [fn.decode_output(data) for (fn, _), data in zip(chunk, results)]
+    return values
@@ -0,0 +1,132 @@
+"""
+Batch evaluation of `PegKeeperOptimized.update()` over many pool states.
+
+Each state is a tuple `(balances, total_supply, debt, lp_balance, A, fee)`
+with `A` as given to the pool constructor. Results are returned by columns,
+one entry per state, to make parameter sweeps easy to aggregate.
+"""
+
+from itertools import product
+from multiprocessing import Pool
+from typing import NamedTuple, Sequence
+
+from .peg_keeper import PROFIT_THRESHOLD, STEP_DIVISOR, PegKeeper
+from .stableswap import A_PRECISION, PRECISION, Revert, StableSwap
+
+
+class UpdateOutcomes(NamedTuple):
+    # PROVIDE, WITHDRAW or NONE when the pool is balanced
+    action: list
+    # Amount of pegged coin provided or withdrawn
+    amount: list
+    # Difference of `_calc_profit()` after and before the update
+    profit_delta: list
+    # LP tokens sent to the caller
+    caller_profit: list
+    # True when `assert new_profit >= initial_profit` (or the pool) reverts
+    reverted: list
+
+
+def evaluate_update(
+    state: Sequence,
+    caller_share: int = 2 * 10**4,
+    step_divisor: int = STEP_DIVISOR,
+    profit_threshold: int = PROFIT_THRESHOLD,
+    rates: Sequence = (PRECISION, PRECISION),
+    adaptive: bool = False,
+) -> tuple:
+    """
+    Evaluate one `update()` with the pegged coin at index 0.
+    Returns `(action, amount, profit_delta, caller_profit, reverted)`, the action
+    and amount as reported by the model, also for reverted updates.
+    """
+    balances, total_supply, debt, lp_balance, A, fee = state
+    pool = StableSwap(balances, rates, A * A_PRECISION, fee, total_supply)
+    keeper = PegKeeper(
+        pool,
+        caller_share=caller_share,
+        debt=debt,
+        lp_balance=lp_balance,
+        step_divisor=step_divisor,
+        profit_threshold=profit_threshold,
+        adaptive=adaptive,
+    )
+
+    initial_profit = keeper.calc_profit()
+    try:
+        caller_profit = keeper.update()
+    except (Revert, ZeroDivisionError):
+        return keeper.last_action, keeper.last_amount, 0, 0, True
+
+    # caller's profit is already transferred out of the Peg Keeper
+    profit_delta = keeper.calc_profit() + caller_profit - initial_profit
+    return keeper.last_action, keeper.last_amount, profit_delta, caller_profit, False
+
+
+def _evaluate_chunk(args) -> list:
+    states, kwargs = args
+    return [evaluate_update(state, **kwargs) for state in states]
+
+
+def evaluate_updates(
+    states: Sequence,
+    caller_share: int = 2 * 10**4,
+    step_divisor: int = STEP_DIVISOR,
+    profit_threshold: int = PROFIT_THRESHOLD,
+    rates: Sequence = (PRECISION, PRECISION),
+    adaptive: bool = False,
+    processes: int = None,
+    chunk_size: int = 1000,
+) -> UpdateOutcomes:
+    """
+    Evaluate `update()` for every state.
+    With `processes` the states are split into chunks evaluated in parallel.
+    """
+    kwargs = {
+        "caller_share": caller_share,
+        "step_divisor": step_divisor,
+        "profit_threshold": profit_threshold,
+        "rates": tuple(rates),
+        "adaptive": adaptive,
+    }
+    if processes:
+        chunks = [
+            (states[i : i + chunk_size], kwargs)
+            for i in range(0, len(states), chunk_size)
+        ]
+        with Pool(processes) as pool:
+            results = [
+                row for chunk in pool.map(_evaluate_chunk, chunks) for row in chunk
+            ]
+    else:
+        results = _evaluate_chunk((states, kwargs))
+
+    if not results:
+        return UpdateOutcomes([], [], [], [], [])
+    return UpdateOutcomes(*map(list, zip(*results)))
+
+
+def sweep(
+    states: Sequence,
+    caller_shares: Sequence = (2 * 10**4,),
+    step_divisors: Sequence = (STEP_DIVISOR,),
+    profit_thresholds: Sequence = (PROFIT_THRESHOLD,),
+    **kwargs,
+) -> dict:
+    """
+    Evaluate the states for every combination of parameters.
+    Returns a dict keyed by `(caller_share, step_divisor, profit_threshold)`,
+    other arguments are passed to `evaluate_updates`.
+    """
+    return {
+        (caller_share, step_divisor, profit_threshold): evaluate_updates(
+            states,
+            caller_share=caller_share,
+            step_divisor=step_divisor,
+            profit_threshold=profit_threshold,
+            **kwargs,
+        )
+        for caller_share, step_divisor, profit_threshold in product(
+            caller_shares, step_divisors, profit_thresholds
+        )
+    }
@@ -0,0 +1,283 @@
+"""
+Python model of the Peg Keepers, working on top of the StableSwap model.
+
+`PegKeeper` mirrors `contracts/PegKeeperOptimized.vy`,
+`PegKeeperMeta` mirrors `contracts/PegKeeperMetaOptimized.vy` and
+`PegKeeperMim` mirrors `contracts/mim/PegKeeperMim.vy`.
+"""
+
+from .stableswap import FEE_DENOMINATOR, Revert
+
+# Time between providing/withdrawing coins
+ACTION_DELAY = 15 * 60
+
+PRECISION = 10**18
+# Calculation error for profit
+PROFIT_THRESHOLD = 10**18
+
+SHARE_PRECISION = 10**5
+
+# Part of the balances difference moved by one update
+STEP_DIVISOR = 5
+# Steps estimated in adaptive mode: whole difference of balances, 1/2 and 1/4 of it
+ADAPTIVE_STEPS = 3
+
+# Actions reported by `PegKeeper.update()`
+NONE = 0
+PROVIDE = 1
+WITHDRAW = -1
+
+
+class PegKeeper:
+    """
+    State of a Peg Keeper attached to a pool model.
+    `step_divisor`, `profit_threshold` and `action_delay` are constants in
+    the contract, they are parameters here to allow sweeping over them.
+    `adaptive` is the mode set by `set_adaptive()`.
+    `last_action` (`PROVIDE`, `WITHDRAW` or `NONE`) and `last_amount` of pegged
+    coin report the step of the last `update()`.
+    """
+
+    def __init__(
+        self,
+        pool,
+        index: int = 0,
+        caller_share: int = 2 * 10**4,
+        debt: int = 0,
+        lp_balance: int = 0,
+        last_change: int = 0,
+        step_divisor: int = STEP_DIVISOR,
+        profit_threshold: int = PROFIT_THRESHOLD,
+        adaptive: bool = False,
+        action_delay: int = ACTION_DELAY,
+    ):
+        self.pool = pool
+        self.index = index
+        self.caller_share = caller_share
+        self.debt = debt
+        self.lp_balance = lp_balance
+        self.last_change = last_change
+        self.step_divisor = step_divisor
+        self.profit_threshold = profit_threshold
+        self.adaptive = adaptive
+        self.action_delay = action_delay
+        self.last_action = NONE
+        self.last_amount = 0
+
+    def copy(self, pool=None):
+        keeper = self.__class__.__new__(self.__class__)
+        keeper.__dict__.update(self.__dict__)
+        keeper.pool = pool or self.pool.copy()
+        return keeper
+
+    def _provide(self, amount: int) -> int:
+        amounts = [0, 0]
+        amounts[self.index] = amount
+        self.lp_balance += self.pool.add_liquidity(amounts, 0)
+
+        self.debt += amount
+        return amount
+
+    def _withdraw(self, amount: int) -> int:
+        amount = min(amount, self.debt)
+
+        amounts = [0, 0]
+        amounts[self.index] = amount
+        burned = self.pool.remove_liquidity_imbalance(amounts)
+        if burned > self.lp_balance:
+            raise Revert("underflow")
+        self.lp_balance -= burned
+
+        self.debt -= amount
+        return amount
+
+    def calc_profit(self, virtual_price: int = None) -> int:
+        if virtual_price is None:
+            virtual_price = self.pool.get_virtual_price()
+        lp_debt = self.debt * PRECISION // virtual_price
+
+        if self.lp_balance <= lp_debt + self.profit_threshold:
+            return 0
+        return self.lp_balance - lp_debt - self.profit_threshold
+
+    def _balances(self) -> tuple:
+        balances = self.pool.balances
+        return balances[self.index], balances[1 - self.index]
+
+    def update(self, timestamp: int = None) -> int:
+        """
+        Provide or withdraw coins from the pool to stabilize it.
+        Returns the caller's profit in LP tokens. Raises `Revert` leaving the
+        state untouched if the peg was unprofitable, as the contract does.
+        The delay is checked only when `timestamp` is given.
+        `last_action` and `last_amount` are set to the step taken, or which
+        reverted, `NONE` and 0 when delayed.
+        """
+        self.last_action, self.last_amount = NONE, 0
+        if timestamp is not None and self.last_change + self.action_delay > timestamp:
+            return 0
+
+        state = dict(self.__dict__)
+        pool_state = dict(self.pool.__dict__)
+        try:
+            return self._update(timestamp)
+        except Revert:
+            step = self.last_action, self.last_amount
+            self.__dict__.update(state)
+            self.pool.__dict__.update(pool_state)
+            self.last_action, self.last_amount = step
+            raise
+
+    def _estimate_lp(
+        self,
+        amount: int,
+        provide: bool,
+        balance_pegged: int,
+        balance_peg: int,
+        virtual_price: int,
+    ) -> int:
+        """
+        Estimate LP tokens minted by providing or burned by withdrawing `amount`,
+        `calc_token_amount` plus the imbalance fee approximated as in the contract.
+        """
+        amounts = [0, 0]
+        amounts[self.index] = amount
+        lp_amount = self.pool.calc_token_amount(amounts, provide)
+
+        d_invariant = lp_amount * virtual_price // PRECISION
+        balances_sum = balance_pegged + balance_peg
+        ideal = balance_pegged * d_invariant // balances_sum
+        difference = balance_peg * d_invariant // balances_sum + abs(ideal - amount)
+        # Base fee of a pool with 2 coins is a half of its fee
+        fee = self.pool.fee * difference // (2 * FEE_DENOMINATOR)
+        fee = fee * PRECISION // virtual_price
+
+        if provide:
+            return lp_amount - min(fee, lp_amount)
+        return lp_amount + fee + 1
+
+    def _cap_provide(self, amount: int) -> int:
+        """Part of `amount` the Peg Keeper can provide."""
+        return amount
+
+    def _step(
+        self,
+        diff: int,
+        provide: bool,
+        balance_pegged: int,
+        balance_peg: int,
+        virtual_price: int,
+    ) -> int:
+        """
+        Amount of pegged coin moved by `update()`: `diff / step_divisor` or, in
+        adaptive mode, the largest of `diff`, `diff / 2` and `diff / 4` which is
+        estimated not to decrease the value of the Peg Keeper.
+        """
+        amount = diff // self.step_divisor
+        if not provide:
+            amount = min(amount, self.debt)
+
+        if self.adaptive:
+            # Steps are halved uncapped and capped when estimated
+            step = diff
+            for _ in range(ADAPTIVE_STEPS):
+                if not provide:
+                    step = min(step, self.debt)
+                if step <= amount:
+                    break
+                step_amount = self._cap_provide(step) if provide else step
+
+                step_lp = self._estimate_lp(
+                    step_amount, provide, balance_pegged, balance_peg, virtual_price
+                )
+                # Debt of the step in LP tokens is covered by minted and exceeds
+                # burned ones
+                step_lp_debt = step_amount * PRECISION // virtual_price
+                if (provide and step_lp >= step_lp_debt) or (
+                    not provide and step_lp <= step_lp_debt
+                ):
+                    return step_amount
+                step //= 2
+
+        return self._cap_provide(amount) if provide else amount
+
+    def _update(self, timestamp: int) -> int:
+        balance_pegged, balance_peg = self._balances()
+
+        # Profit before and after the action is valued by one virtual price
+        virtual_price = self.pool.get_virtual_price()
+        initial_profit = self.calc_profit(virtual_price)
+
+        provide = balance_peg > balance_pegged
+        diff = abs(balance_peg - balance_pegged)
+        amount = self._step(diff, provide, balance_pegged, balance_peg, virtual_price)
+        if diff:
+            self.last_action = PROVIDE if provide else WITHDRAW
+        self.last_amount = amount
+        if provide:
+            self._provide(amount)
+        else:
+            self._withdraw(amount)
+        if timestamp is not None:
+            self.last_change = timestamp
+
+        # Send generated profit
+        new_profit = self.calc_profit(virtual_price)
+        if new_profit < initial_profit:
+            raise Revert("dev: peg was unprofitable")
+        lp_amount = new_profit - initial_profit
+        caller_profit = lp_amount * self.caller_share // SHARE_PRECISION
+        self.lp_balance -= caller_profit
+
+        return caller_profit
+
+    def withdraw_profit(self) -> int:
+        lp_amount = self.calc_profit()
+        self.lp_balance -= lp_amount
+        return lp_amount
+
+
+class PegKeeperMeta(PegKeeper):
+    """
+    Peg Keeper for a metapool. The virtual price of the metapool token is
+    taken from the pool's rates unless `meta_virtual_price` is set.
+    """
+
+    def __init__(self, pool, index: int = 0, meta_index: int = 1, **kwargs):
+        super().__init__(pool, index, **kwargs)
+        self.meta_index = meta_index
+        self.meta_virtual_price = None
+
+    def _balances(self) -> tuple:
+        balance_pegged, balance_peg = super()._balances()
+        virtual_price = self.meta_virtual_price or self.pool.rates[self.meta_index]
+        if self.index == self.meta_index:
+            balance_peg = balance_peg * PRECISION // virtual_price
+        else:
+            balance_peg = balance_peg * virtual_price // PRECISION
+        return balance_pegged, balance_peg
+
+
+class PegKeeperMim(PegKeeper):
+    """
+    Peg Keeper which does not mint pegged coin but provides it from
+    `pegged_balance`.
+    """
+
+    def __init__(self, pool, pegged_balance: int = 0, **kwargs):
+        kwargs["index"] = 0
+        super().__init__(pool, **kwargs)
+        self.pegged_balance = pegged_balance
+
+    def _cap_provide(self, amount: int) -> int:
+        return min(amount, self.pegged_balance)
+
+    def _provide(self, amount: int) -> int:
+        amount = min(amount, self.pegged_balance)
+        self.pegged_balance -= amount
+        return super()._provide(amount)
+
+    def _withdraw(self, amount: int) -> int:
+        amount = super()._withdraw(amount)
+        self.pegged_balance += amount
+        return amount
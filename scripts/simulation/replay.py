@@ -0,0 +1,192 @@
+"""
+Replay of recorded pool events through the StableSwap and Peg Keeper models.
+
+Events are tuples `(timestamp, kind, amount0, amount1)` ordered by time:
+    EXCHANGE                    coin with a nonzero amount is sold for the other one
+    ADD_LIQUIDITY               amounts of coins deposited
+    REMOVE_LIQUIDITY            `amount0` of LP tokens burned for both coins
+    REMOVE_LIQUIDITY_IMBALANCE  amounts of coins withdrawn
+    REMOVE_LIQUIDITY_ONE        LP tokens burned for the coin with a nonzero amount
+
+After every event `update()` is called as soon as the delay has passed and
+the caller's profit is at least `min_caller_profit`, as a keeper bot would.
+Events reverting on the replayed state, e.g. withdrawals of more than the
+pool holds, are skipped. No chain is involved.
+"""
+
+import csv
+from itertools import product
+from multiprocessing import Pool
+from typing import NamedTuple, Sequence
+
+from .peg_keeper import ACTION_DELAY, PRECISION, STEP_DIVISOR, PegKeeper
+from .stableswap import Revert
+
+EXCHANGE = 0
+ADD_LIQUIDITY = 1
+REMOVE_LIQUIDITY = 2
+REMOVE_LIQUIDITY_IMBALANCE = 3
+REMOVE_LIQUIDITY_ONE = 4
+KINDS = {
+    "exchange": EXCHANGE,
+    "add_liquidity": ADD_LIQUIDITY,
+    "remove_liquidity": REMOVE_LIQUIDITY,
+    "remove_liquidity_imbalance": REMOVE_LIQUIDITY_IMBALANCE,
+    "remove_liquidity_one": REMOVE_LIQUIDITY_ONE,
+}
+
+# Time between rows of the history, in seconds
+SAMPLE_INTERVAL = 3600
+
+
+class ReplayReport(NamedTuple):
+    # Columns of the history, one row per `sample_interval` and per update
+    timestamp: list
+    debt: list
+    # Profit left in the Peg Keeper, `calc_profit()`
+    profit: list
+    # LP tokens paid to callers of `update()` in total
+    caller_payout: list
+    # Price of 1 pegged coin in peg coins, as `get_dy()` of the pool
+    price: list
+    # Number of successful updates and of events skipped as reverted
+    updates: int
+    skipped: int
+
+
+def read_events(path: str) -> list:
+    """Read events from a CSV file with `timestamp,kind,amount0,amount1` columns."""
+    with open(path, newline="") as f:
+        return [
+            (
+                int(row["timestamp"]),
+                KINDS[row["kind"]],
+                int(row["amount0"]),
+                int(row["amount1"]),
+            )
+            for row in csv.DictReader(f)
+        ]
+
+
+def _apply(pool, kind: int, amount0: int, amount1: int):
+    if kind == EXCHANGE:
+        if amount0:
+            pool.exchange(0, 1, amount0)
+        else:
+            pool.exchange(1, 0, amount1)
+    elif kind == ADD_LIQUIDITY:
+        pool.add_liquidity([amount0, amount1])
+    elif kind == REMOVE_LIQUIDITY:
+        pool.remove_liquidity(amount0)
+    elif kind == REMOVE_LIQUIDITY_IMBALANCE:
+        pool.remove_liquidity_imbalance([amount0, amount1])
+    elif kind == REMOVE_LIQUIDITY_ONE:
+        if amount0:
+            pool.remove_liquidity_one_coin(amount0, 0)
+        else:
+            pool.remove_liquidity_one_coin(amount1, 1)
+    else:
+        raise ValueError(f"Unknown event kind: {kind}")
+
+
+def _price(keeper) -> int:
+    # Exchange of a small amount, fees included
+    index = keeper.index
+    try:
+        return keeper.pool.get_dy(index, 1 - index, PRECISION)
+    except Revert:
+        return 0
+
+
+def replay(
+    keeper: PegKeeper,
+    events: Sequence,
+    min_caller_profit: int = 0,
+    sample_interval: int = SAMPLE_INTERVAL,
+) -> ReplayReport:
+    """
+    Replay `events` on the pool of `keeper`, both models are changed in place.
+    Returns the history of the Peg Keeper and the pool.
+    """
+    pool = keeper.pool
+    report = ReplayReport([], [], [], [], [], 0, 0)
+    caller_payout = 0
+    updates = skipped = 0
+    next_sample = None
+
+    def record(timestamp):
+        report.timestamp.append(timestamp)
+        report.debt.append(keeper.debt)
+        report.profit.append(keeper.calc_profit())
+        report.caller_payout.append(caller_payout)
+        report.price.append(_price(keeper))
+
+    for timestamp, kind, amount0, amount1 in events:
+        pool_state = dict(pool.__dict__)
+        try:
+            _apply(pool, kind, amount0, amount1)
+        except (Revert, ZeroDivisionError):
+            pool.__dict__.update(pool_state)
+            skipped += 1
+            continue
+
+        balance_pegged, balance_peg = keeper._balances()
+        # Withdrawal without debt reverts in the pool, it is not tried
+        can_update = balance_peg > balance_pegged or keeper.debt > 0
+        if can_update and keeper.last_change + keeper.action_delay <= timestamp:
+            state = dict(keeper.__dict__)
+            pool_state = dict(pool.__dict__)
+            try:
+                caller_profit = keeper.update(timestamp)
+            except (Revert, ZeroDivisionError):
+                caller_profit = None
+            if caller_profit is not None and caller_profit >= min_caller_profit:
+                caller_payout += caller_profit
+                updates += 1
+                record(timestamp)
+            else:
+                # Not worth calling, the bot does not send the transaction
+                keeper.__dict__.update(state)
+                pool.__dict__.update(pool_state)
+
+        if next_sample is None or timestamp >= next_sample:
+            record(timestamp)
+            next_sample = timestamp + sample_interval
+
+    return report._replace(updates=updates, skipped=skipped)
+
+
+def _replay_policy(args) -> ReplayReport:
+    keeper, events, kwargs = args
+    return replay(keeper, events, **kwargs)
+
+
+def sweep_replays(
+    keeper: PegKeeper,
+    events: Sequence,
+    caller_shares: Sequence = (2 * 10**4,),
+    step_divisors: Sequence = (STEP_DIVISOR,),
+    action_delays: Sequence = (ACTION_DELAY,),
+    processes: int = None,
+    **kwargs,
+) -> dict:
+    """
+    Replay the events for every combination of policy parameters, starting from
+    copies of `keeper`. Returns a dict keyed by `(caller_share, step_divisor, action_delay)`,
+    other arguments are passed to `replay`. With `processes` policies are replayed in parallel.
+    """
+    policies = list(product(caller_shares, step_divisors, action_delays))
+    jobs = []
+    for caller_share, step_divisor, action_delay in policies:
+        copy = keeper.copy()
+        copy.caller_share = caller_share
+        copy.step_divisor = step_divisor
+        copy.action_delay = action_delay
+        jobs.append((copy, events, kwargs))
+
+    if processes:
+        with Pool(processes) as pool:
+            reports = pool.map(_replay_policy, jobs)
+    else:
+        reports = [_replay_policy(job) for job in jobs]
+    return dict(zip(policies, reports))
@@ -0,0 +1,527 @@
+"""
+Integer-exact Python port of the StableSwap math used by the testing pools.
+
+Every function mirrors its counterpart in `contracts/testing/StableSwap.vy`
+(or `StableSwapMeta.vy`) operation by operation, so results are equal to the
+on-chain ones up to the last wei.
+
+Newton's method in `get_D` and `get_y` stops as soon as the next step is
+known to be below 1 wei (it converges quadratically, so the step after a
+`diff` is at most `diff**2 / D`). Deployed Curve pools make that last step,
+their results may differ by 1 wei. Away from balance rounding keeps moving
+`D` by a few wei after convergence, so `get_D` stops early only while
+balances differ at most `EARLY_STOP_RATIO` times.
+"""
+
+N_COINS = 2
+PRECISION = 10**18
+A_PRECISION = 100
+FEE_DENOMINATOR = 10**10
+ADMIN_FEE = 0
+
+MAX_ITERATIONS = 255
+EARLY_STOP_RATIO = 10
+
+
+class Revert(Exception):
+    """Raised where the contract would revert."""
+
+
+def _sub(a: int, b: int) -> int:
+    # uint256 subtraction, reverts on underflow like Vyper does
+    if b > a:
+        raise Revert("underflow")
+    return a - b
+
+
+def xp_mem(rates, balances) -> list:
+    return [rate * balance // PRECISION for rate, balance in zip(rates, balances)]
+
+
+def _early_stop(xp) -> bool:
+    return xp[0] <= EARLY_STOP_RATIO * xp[1] and xp[1] <= EARLY_STOP_RATIO * xp[0]
+
+
+def get_D(xp, amp: int) -> int:
+    """
+    D invariant calculation in non-overflowing integer operations iteratively.
+    Mirrors `StableSwap.get_D`.
+    """
+    S = sum(xp)
+    if S == 0:
+        return 0
+    if 0 in xp:
+        raise Revert("division by zero")
+
+    D = S
+    Ann = amp * N_COINS
+    early_stop = _early_stop(xp)
+    for _ in range(MAX_ITERATIONS):
+        D_P = D * D // xp[0] * D // xp[1] // N_COINS**2
+        Dprev = D
+        D = (
+            (Ann * S // A_PRECISION + D_P * N_COINS)
+            * D
+            // ((Ann - A_PRECISION) * D // A_PRECISION + (N_COINS + 1) * D_P)
+        )
+        # Equality with the precision of 1, the next step would be below it
+        diff = abs(D - Dprev)
+        if diff <= 1 or (early_stop and diff * diff < D // 4):
+            return D
+    raise Revert("get_D did not converge")
+
+
+def get_D_meta(xp, amp: int) -> int:
+    """
+    Mirrors `StableSwapMeta.get_D`, which rounds `D_P` coin by coin.
+    """
+    S = sum(xp)
+    if S == 0:
+        return 0
+    if 0 in xp:
+        raise Revert("division by zero")
+
+    D = S
+    Ann = amp * N_COINS
+    early_stop = _early_stop(xp)
+    for _ in range(MAX_ITERATIONS):
+        D_P = D
+        for x in xp:
+            D_P = D_P * D // (x * N_COINS)
+        Dprev = D
+        D = (
+            (Ann * S // A_PRECISION + D_P * N_COINS)
+            * D
+            // ((Ann - A_PRECISION) * D // A_PRECISION + (N_COINS + 1) * D_P)
+        )
+        # Equality with the precision of 1, the next step would be below it
+        diff = abs(D - Dprev)
+        if diff <= 1 or (early_stop and diff * diff < D // 4):
+            return D
+    raise Revert("get_D did not converge")
+
+
+def get_D_warm(xp, amp: int, D: int = None, meta: bool = False) -> tuple:
+    """
+    Newton's method of `get_D` (or `get_D_meta` with `meta`) started from `D`
+    instead of the sum of `xp`. Returns `(D, iterations)`.
+    Started close to the root it converges in a couple of iterations,
+    to the same value as `get_D` up to 1 wei.
+    """
+    S = sum(xp)
+    if S == 0:
+        return 0, 0
+    if 0 in xp:
+        raise Revert("division by zero")
+
+    if not D:
+        D = S
+    Ann = amp * N_COINS
+    early_stop = _early_stop(xp)
+    for i in range(MAX_ITERATIONS):
+        if meta:
+            D_P = D
+            for x in xp:
+                D_P = D_P * D // (x * N_COINS)
+        else:
+            D_P = D * D // xp[0] * D // xp[1] // N_COINS**2
+        Dprev = D
+        D = (
+            (Ann * S // A_PRECISION + D_P * N_COINS)
+            * D
+            // ((Ann - A_PRECISION) * D // A_PRECISION + (N_COINS + 1) * D_P)
+        )
+        # Equality with the precision of 1, the next step would be below it
+        diff = abs(D - Dprev)
+        if diff <= 1 or (early_stop and diff * diff < D // 4):
+            return D, i + 1
+    raise Revert("get_D did not converge")
+
+
+class DTracker:
+    """
+    Incremental `D` of a pool. Remembers the last `size` invariants and
+    warm-starts Newton's method from the latest one, scaled by the change
+    of the sum of balances. `iterations` holds the count of every call,
+    0 for invariants already known.
+    """
+
+    def __init__(self, meta: bool = False, size: int = 4):
+        self.meta = meta
+        self.size = size
+        self.iterations = []
+        # (tuple(xp), amp) -> D, the latest last
+        self._known = {}
+
+    def get_D(self, xp, amp: int) -> int:
+        key = (tuple(xp), amp)
+        if key in self._known:
+            self.iterations.append(0)
+            return self._known[key]
+
+        D0 = None
+        if self._known:
+            (last_xp, last_amp), last_D = next(reversed(self._known.items()))
+            if last_amp == amp and sum(last_xp) > 0:
+                D0 = last_D * sum(xp) // sum(last_xp)
+        D, iterations = get_D_warm(xp, amp, D0, self.meta)
+        self.iterations.append(iterations)
+
+        self._known[key] = D
+        if len(self._known) > self.size:
+            del self._known[next(iter(self._known))]
+        return D
+
+
+def _solve_y(c: int, b: int, D: int) -> int:
+    # x_1 = (x_1**2 + c) / (2*x_1 + b - D), shared by `get_y` and `get_y_D`
+    y = D
+    for _ in range(MAX_ITERATIONS):
+        y_prev = y
+        denominator = 2 * y + b - D
+        if denominator <= 0:
+            raise Revert("underflow")
+        y = (y * y + c) // denominator
+        # Equality with the precision of 1, the next step would be below it
+        diff = abs(y - y_prev)
+        if diff <= 1 or diff * diff < denominator // 4:
+            return y
+    raise Revert("get_y did not converge")
+
+
+def get_y(i: int, j: int, x: int, xp, amp: int, D: int) -> int:
+    """
+    Calculate x[j] if one makes x[i] = x. Mirrors `StableSwap.get_y`,
+    taking the invariant `D` of `xp` precomputed.
+    """
+    assert i != j  # dev: same coin
+    assert 0 <= j < N_COINS
+    assert 0 <= i < N_COINS
+
+    S_ = 0
+    c = D
+    Ann = amp * N_COINS
+
+    for _i in range(N_COINS):
+        if _i == i:
+            _x = x
+        elif _i != j:
+            _x = xp[_i]
+        else:
+            continue
+        S_ += _x
+        c = c * D // (_x * N_COINS)
+
+    c = c * D * A_PRECISION // (Ann * N_COINS)
+    b = S_ + D * A_PRECISION // Ann  # - D
+    return _solve_y(c, b, D)
+
+
+def get_y_D(A: int, i: int, xp, D: int) -> int:
+    """
+    Calculate x[i] if one reduces D from being calculated for xp to D.
+    Mirrors `StableSwap.get_y_D`.
+    """
+    assert 0 <= i < N_COINS
+
+    S_ = 0
+    c = D
+    Ann = A * N_COINS
+
+    for _i in range(N_COINS):
+        if _i == i:
+            continue
+        _x = xp[_i]
+        S_ += _x
+        c = c * D // (_x * N_COINS)
+
+    c = c * D * A_PRECISION // (Ann * N_COINS)
+    b = S_ + D * A_PRECISION // Ann
+    return _solve_y(c, b, D)
+
+
+class StableSwap:
+    """
+    State of a plain 2-coin pool: the same `rates`, `A_precise` and `fee`
+    the contract works with, plus balances and LP total supply.
+    """
+
+    META = False
+
+    def __init__(
+        self, balances, rates, A_precise: int, fee: int, total_supply: int = 0
+    ):
+        self.balances = list(balances)
+        self.rates = list(rates)
+        self.A_precise = A_precise
+        self.fee = fee
+        self.total_supply = total_supply
+        self.d_tracker = None
+
+    @classmethod
+    def from_contract(cls, swap, rates=None, block_identifier=None):
+        """
+        Read the state of a deployed pool.
+        `rates` default to equal decimals of coins.
+        """
+        block = block_identifier
+        return cls(
+            [swap.balances(i, block_identifier=block) for i in range(N_COINS)],
+            rates or [PRECISION] * N_COINS,
+            swap.A_precise(block_identifier=block),
+            swap.fee(block_identifier=block),
+            swap.totalSupply(block_identifier=block),
+        )
+
+    def copy(self):
+        pool = self.__class__(
+            self.balances, self.rates, self.A_precise, self.fee, self.total_supply
+        )
+        # Copies are simulated on close states, so they share the tracker
+        pool.d_tracker = self.d_tracker
+        return pool
+
+    def track_D(self) -> DTracker:
+        """
+        Compute `D` incrementally from now on, see `DTracker`.
+        Results may differ from the contract by 1 wei.
+        """
+        self.d_tracker = DTracker(self.META)
+        return self.d_tracker
+
+    def get_D(self, xp, amp: int) -> int:
+        if self.d_tracker is not None:
+            return self.d_tracker.get_D(xp, amp)
+        return get_D(xp, amp)
+
+    def get_D_mem(self, rates, balances, amp: int) -> int:
+        return self.get_D(xp_mem(rates, balances), amp)
+
+    def get_virtual_price(self) -> int:
+        D = self.get_D_mem(self.rates, self.balances, self.A_precise)
+        # D is in the units similar to DAI (e.g. converted to precision 1e18)
+        # When balanced, D = n * x_u - total virtual value of the portfolio
+        return D * PRECISION // self.total_supply
+
+    def calc_token_amount(self, amounts, is_deposit: bool) -> int:
+        amp = self.A_precise
+        balances = list(self.balances)
+
+        D0 = self.get_D_mem(self.rates, balances, amp)
+        for i in range(N_COINS):
+            if is_deposit:
+                balances[i] += amounts[i]
+            else:
+                balances[i] = _sub(balances[i], amounts[i])
+        D1 = self.get_D_mem(self.rates, balances, amp)
+        if is_deposit:
+            diff = _sub(D1, D0)
+        else:
+            diff = _sub(D0, D1)
+        return diff * self.total_supply // D0
+
+    def add_liquidity(self, amounts, min_mint_amount: int = 0) -> int:
+        """
+        Deposit coins into the pool.
+        Returns the amount of LP tokens minted, the caller accounts for them.
+        """
+        amp = self.A_precise
+        old_balances = self.balances
+        rates = self.rates
+
+        # Initial invariant
+        D0 = self.get_D_mem(rates, old_balances, amp)
+
+        total_supply = self.total_supply
+        new_balances = list(old_balances)
+        for i in range(N_COINS):
+            if amounts[i] > 0:
+                new_balances[i] += amounts[i]
+            elif total_supply == 0:
+                raise Revert("dev: initial deposit requires all coins")
+
+        # Invariant after change
+        D1 = self.get_D_mem(rates, new_balances, amp)
+        if D1 <= D0:
+            raise Revert()
+
+        # We need to recalculate the invariant accounting for fees
+        # to calculate fair user's share
+        balances = list(new_balances)
+        if total_supply > 0:
+            # Only account for fees if we are not the first to deposit
+            base_fee = self.fee * N_COINS // (4 * (N_COINS - 1))
+            for i in range(N_COINS):
+                ideal_balance = D1 * old_balances[i] // D0
+                new_balance = new_balances[i]
+                fee = base_fee * abs(ideal_balance - new_balance) // FEE_DENOMINATOR
+                balances[i] = new_balance - (fee * ADMIN_FEE // FEE_DENOMINATOR)
+                new_balances[i] = _sub(new_balances[i], fee)
+            D2 = self.get_D_mem(rates, new_balances, amp)
+            mint_amount = total_supply * (D2 - D0) // D0
+        else:
+            mint_amount = D1  # Take the dust if there was any
+
+        if mint_amount < min_mint_amount:
+            raise Revert("Slippage screwed you")
+
+        self.balances = balances
+        self.total_supply = total_supply + mint_amount
+        return mint_amount
+
+    def remove_liquidity_imbalance(
+        self, amounts, max_burn_amount: int = 2**256 - 1
+    ) -> int:
+        """
+        Withdraw coins from the pool in an imbalanced amount.
+        Returns the amount of LP tokens burned, the caller accounts for them.
+        """
+        amp = self.A_precise
+        rates = self.rates
+        old_balances = self.balances
+        D0 = self.get_D_mem(rates, old_balances, amp)
+
+        new_balances = [_sub(old_balances[i], amounts[i]) for i in range(N_COINS)]
+        D1 = self.get_D_mem(rates, new_balances, amp)
+
+        balances = list(new_balances)
+        base_fee = self.fee * N_COINS // (4 * (N_COINS - 1))
+        for i in range(N_COINS):
+            ideal_balance = D1 * old_balances[i] // D0
+            new_balance = new_balances[i]
+            fee = base_fee * abs(ideal_balance - new_balance) // FEE_DENOMINATOR
+            balances[i] = _sub(new_balance, fee * ADMIN_FEE // FEE_DENOMINATOR)
+            new_balances[i] = _sub(new_balances[i], fee)
+        D2 = self.get_D_mem(rates, new_balances, amp)
+
+        total_supply = self.total_supply
+        burn_amount = (_sub(D0, D2) * total_supply // D0) + 1
+        if burn_amount <= 1:
+            raise Revert("dev: zero tokens burned")
+        if burn_amount > max_burn_amount:
+            raise Revert("Slippage screwed you")
+
+        self.balances = balances
+        self.total_supply = _sub(total_supply, burn_amount)
+        return burn_amount
+
+    def get_y(self, i: int, j: int, x: int, xp) -> int:
+        amp = self.A_precise
+        return get_y(i, j, x, xp, amp, self.get_D(xp, amp))
+
+    def get_y_D(self, A: int, i: int, xp, D: int) -> int:
+        return get_y_D(A, i, xp, D)
+
+    def get_dy(self, i: int, j: int, dx: int) -> int:
+        rates = self.rates
+        xp = xp_mem(rates, self.balances)
+
+        x = xp[i] + (dx * rates[i] // PRECISION)
+        y = self.get_y(i, j, x, xp)
+        dy = _sub(_sub(xp[j], y), 1)
+        fee = self.fee * dy // FEE_DENOMINATOR
+        return (dy - fee) * PRECISION // rates[j]
+
+    def exchange(self, i: int, j: int, dx: int, min_dy: int = 0) -> int:
+        """
+        Exchange `dx` of coin `i` to coin `j`.
+        Returns the amount of coin `j` received.
+        """
+        rates = self.rates
+        old_balances = self.balances
+        xp = xp_mem(rates, old_balances)
+
+        x = xp[i] + dx * rates[i] // PRECISION
+        y = self.get_y(i, j, x, xp)
+        dy = _sub(_sub(xp[j], y), 1)  # -1 just in case there were some rounding errors
+        dy_fee = dy * self.fee // FEE_DENOMINATOR
+
+        # Convert all to real units
+        dy = (dy - dy_fee) * PRECISION // rates[j]
+        if dy < min_dy:
+            raise Revert("Exchange resulted in fewer coins than expected")
+
+        dy_admin_fee = dy_fee * ADMIN_FEE // FEE_DENOMINATOR
+        dy_admin_fee = dy_admin_fee * PRECISION // rates[j]
+
+        balances = list(old_balances)
+        balances[i] = old_balances[i] + dx
+        balances[j] = _sub(_sub(old_balances[j], dy), dy_admin_fee)
+        self.balances = balances
+        return dy
+
+    def remove_liquidity(self, burn_amount: int) -> list:
+        """
+        Withdraw coins from the pool in the current proportion.
+        Returns the amounts of coins received.
+        """
+        total_supply = self.total_supply
+        amounts = [balance * burn_amount // total_supply for balance in self.balances]
+
+        self.balances = [_sub(b, amount) for b, amount in zip(self.balances, amounts)]
+        self.total_supply = _sub(total_supply, burn_amount)
+        return amounts
+
+    def remove_liquidity_one_coin(self, burn_amount: int, i: int) -> int:
+        """
+        Withdraw a single coin from the pool.
+        Returns the amount of coin `i` received.
+        """
+        dy, dy_fee = self._calc_withdraw_one_coin(burn_amount, i)
+
+        balances = list(self.balances)
+        balances[i] = _sub(balances[i], dy + dy_fee * ADMIN_FEE // FEE_DENOMINATOR)
+        self.balances = balances
+        self.total_supply = _sub(self.total_supply, burn_amount)
+        return dy
+
+    def _calc_withdraw_one_coin(self, burn_amount: int, i: int) -> tuple:
+        """
+        Returns the amount received and the fee charged, as the contract does.
+        """
+        amp = self.A_precise
+        rates = self.rates
+        xp = xp_mem(rates, self.balances)
+        D0 = self.get_D(xp, amp)
+
+        D1 = _sub(D0, burn_amount * D0 // self.total_supply)
+        new_y = self.get_y_D(amp, i, xp, D1)
+
+        base_fee = self.fee * N_COINS // (4 * (N_COINS - 1))
+        xp_reduced = [0] * N_COINS
+
+        for j in range(N_COINS):
+            xp_j = xp[j]
+            if j == i:
+                dx_expected = _sub(xp_j * D1 // D0, new_y)
+            else:
+                dx_expected = _sub(xp_j, xp_j * D1 // D0)
+            xp_reduced[j] = _sub(xp_j, base_fee * dx_expected // FEE_DENOMINATOR)
+
+        dy = _sub(xp_reduced[i], self.get_y_D(amp, i, xp_reduced, D1))
+        dy_0 = _sub(xp[i], new_y) * PRECISION // rates[i]  # w/o fees
+        # Withdraw less to account for rounding errors
+        dy = _sub(dy, 1) * PRECISION // rates[i]
+
+        return dy, _sub(dy_0, dy)
+
+    def calc_withdraw_one_coin(self, burn_amount: int, i: int) -> int:
+        return self._calc_withdraw_one_coin(burn_amount, i)[0]
+
+
+class StableSwapMeta(StableSwap):
+    """
+    State of a metapool. `rates[1]` is the virtual price of the base pool
+    and has to be kept up to date by the caller.
+    """
+
+    META = True
+
+    @classmethod
+    def from_contract(cls, swap, rates, block_identifier=None):
+        return super().from_contract(swap, rates, block_identifier)
+
+    def get_D(self, xp, amp: int) -> int:
+        if self.d_tracker is not None:
+            return self.d_tracker.get_D(xp, amp)
+        return get_D_meta(xp, amp)
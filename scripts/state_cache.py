@@ -0,0 +1,178 @@
+"""
+Cache of Peg Keeper and pool views, kept per block.
+
+Values stay cached across blocks until an event of a watched contract
+touches them: `Provide`, `Withdraw` and `Profit` of Peg Keepers, swaps,
+liquidity changes and LP transfers of pools, and any event of a base pool
+whose virtual price is used as a rate. Reads within a block and across quiet
+blocks do not hit the node.
+"""
+
+from brownie import ZERO_ADDRESS, web3
+from eth_utils import to_checksum_address
+
+from scripts.keeper import describe
+from scripts.multicall import read
+
+# Pool views which change together with the balances
+BALANCE_VIEWS = (
+    "balances",
+    "get_balances",
+    "get_virtual_price",
+    "calc_token_amount",
+    "calc_withdraw_one_coin",
+    "get_dy",
+)
+POOL_LIQUIDITY_EVENTS = (
+    "AddLiquidity",
+    "RemoveLiquidity",
+    "RemoveLiquidityOne",
+    "RemoveLiquidityImbalance",
+)
+POOL_SWAP_EVENTS = ("TokenExchange", "TokenExchangeUnderlying")
+
+KEEPER_VIEWS = {
+    "Provide": ("debt", "last_change", "calc_profit"),
+    "Withdraw": ("debt", "last_change", "calc_profit"),
+    "Profit": ("calc_profit",),
+}
+
+# Views changed without an event, they are never cached
+UNCACHED = ("caller_share", "adaptive", "fee")
+
+
+def _topic_address(topic) -> str:
+    return to_checksum_address(topic[-20:])
+
+
+class StateCache:
+    """
+    Values of view calls valid at `block`, keyed by `(address, name, args)`.
+    `sync()` moves the cache to a new block, invalidating the entries touched
+    by events emitted in between.
+    """
+
+    def __init__(self, multicall=None):
+        self.multicall = multicall
+        self.block = None
+        self._block_hash = None
+        self._values = {}
+        # address -> (contract, kind, {topic: event name})
+        self._watched = {}
+        # pool address -> [Peg Keeper addresses]
+        self._keepers = {}
+        # rate source address -> [pool addresses]
+        self._rate_users = {}
+
+    def _watch(self, contract, kind: str):
+        topics = {topic: name for name, topic in contract.topics.items()}
+        self._watched[contract.address] = (contract, kind, topics)
+
+    def add_peg_keeper(self, peg_keeper):
+        """Watch a Peg Keeper together with its pool and sources of rates."""
+        pool, pegged, _, rate_sources = describe(peg_keeper)
+        self._watch(peg_keeper, "keeper")
+        self._watch(pool, "pool")
+        self._keepers.setdefault(pool.address, []).append(peg_keeper.address)
+        for source in rate_sources:
+            if source is not None:
+                self._watch(source, "rate")
+                self._rate_users.setdefault(source.address, []).append(pool.address)
+        if peg_keeper._name == "PegKeeperMim":
+            # Pegged coin balance of the Peg Keeper is read for the model
+            self._watch(pegged, "token")
+
+    def invalidate(self, address: str, names=None, arg=None):
+        """
+        Drop cached values of `address`.
+        Only views in `names` and with the first argument `arg` when given.
+        """
+        for key in list(self._values):
+            if key[0] != address:
+                continue
+            if names is not None and key[1] not in names:
+                continue
+            if arg is not None and (not key[2] or key[2][0] != arg):
+                continue
+            del self._values[key]
+
+    def _invalidate_pool(self, pool: str):
+        self.invalidate(pool, BALANCE_VIEWS + ("totalSupply",))
+        for keeper in self._keepers.get(pool, []):
+            self.invalidate(keeper, ("calc_profit",))
+
+    def _handle(self, log):
+        _, kind, topics = self._watched[log.address]
+        name = topics.get("0x" + bytes(log.topics[0]).hex()) if log.topics else None
+
+        if kind == "keeper":
+            self.invalidate(log.address, KEEPER_VIEWS.get(name))
+        elif kind == "rate":
+            self.invalidate(log.address)
+            for pool in self._rate_users[log.address]:
+                self._invalidate_pool(pool)
+        elif name == "Transfer":
+            sender, receiver = (_topic_address(topic) for topic in log.topics[1:3])
+            for account in (sender, receiver):
+                self.invalidate(log.address, ("balanceOf",), account)
+                if account in self._keepers.get(log.address, []):
+                    self.invalidate(account, ("calc_profit",))
+            if ZERO_ADDRESS in (sender, receiver):
+                self.invalidate(log.address, ("totalSupply",))
+        elif kind == "token" or name == "Approval":
+            return
+        elif name in POOL_SWAP_EVENTS or name in POOL_LIQUIDITY_EVENTS:
+            self._invalidate_pool(log.address)
+        else:
+            # Ramping A or unknown events, drop everything depending on the pool
+            self.invalidate(log.address)
+            self._invalidate_pool(log.address)
+
+    def sync(self, block_identifier="latest") -> int:
+        """Move the cache to a block. Returns the block number."""
+        block = web3.eth.get_block(block_identifier)
+        if self.block is not None and block.number >= self.block:
+            # Chain was reorganized if the synced block was replaced
+            if web3.eth.get_block(self.block).hash != self._block_hash:
+                self._values.clear()
+            elif block.number > self.block:
+                logs = web3.eth.get_logs(
+                    {
+                        "address": list(self._watched),
+                        "fromBlock": self.block + 1,
+                        "toBlock": block.number,
+                    }
+                )
+                for log in logs:
+                    self._handle(log)
+        else:
+            self._values.clear()
+        self.block = block.number
+        self._block_hash = block.hash
+
+        # Amplification changes with time while ramping
+        for address, (pool, kind, _) in self._watched.items():
+            if kind == "pool" and self.call(pool.future_A_time) > block.timestamp:
+                self.invalidate(address, ("A", "A_precise"))
+                self._invalidate_pool(address)
+        return self.block
+
+    def read(self, calls) -> list:
+        """Read `(contract_call, args)` pairs at `block`, fetching only missing values."""
+        assert self.block is not None, "sync() first"
+
+        keys = [(fn._address, fn.abi["name"], tuple(args)) for fn, args in calls]
+        missing = [
+            i
+            for i, key in enumerate(keys)
+            if key[1] in UNCACHED or key not in self._values
+        ]
+        if missing:
+            values = read([calls[i] for i in missing], self.block, self.multicall)
+            for i, value in zip(missing, values):
+                self._values[keys[i]] = value
+        return [self._values[key] for key in keys]
+
+    def call(self, fn, *args):
+        """Read one view function at `block`."""
+        return self.read([(fn, args)])[0]
@@ -0,0 +1,80 @@
+import pytest
+
+pytestmark = pytest.mark.usefixtures(
+    "add_initial_liquidity",
+    "provide_token_to_peg_keeper",
+    "mint_alice",
+    "approve_alice",
+)
+
+# Coins added to the pool, in percent of the initial balance
+IMBALANCES = [1, 5, 10, 25, 50]
+
+
+@pytest.mark.parametrize("imbalance", IMBALANCES)
+def test_update_provide(
+    peg_keeper,
+    initial_amounts,
+    imbalance_pool,
+    peg_keeper_updater,
+    gas_report,
+    imbalance,
+):
+    imbalance_pool(1, initial_amounts[1] * imbalance // 100)
+
+    tx = peg_keeper.update({"from": peg_keeper_updater})
+    assert "Provide" in tx.events
+    gas_report("update_provide", imbalance, tx.gas_used)
+
+
+@pytest.mark.parametrize("imbalance", IMBALANCES)
+def test_update_withdraw(
+    peg_keeper,
+    initial_amounts,
+    imbalance_pool,
+    peg_keeper_updater,
+    gas_report,
+    imbalance,
+):
+    imbalance_pool(0, initial_amounts[0] * imbalance // 100)
+
+    tx = peg_keeper.update({"from": peg_keeper_updater})
+    assert "Withdraw" in tx.events
+    gas_report("update_withdraw", imbalance, tx.gas_used)
+
+
+@pytest.mark.parametrize("imbalance", IMBALANCES)
+def test_calc_profit(
+    peg_keeper,
+    initial_amounts,
+    imbalance_pool,
+    make_profit,
+    alice,
+    gas_report,
+    imbalance,
+):
+    make_profit(10**20)
+    imbalance_pool(1, initial_amounts[1] * imbalance // 100)
+
+    # includes the intrinsic gas of a transaction
+    gas_report(
+        "calc_profit", imbalance, peg_keeper.calc_profit.estimate_gas({"from": alice})
+    )
+
+
+@pytest.mark.parametrize("imbalance", IMBALANCES)
+def test_withdraw_profit(
+    peg_keeper,
+    initial_amounts,
+    imbalance_pool,
+    make_profit,
+    admin,
+    gas_report,
+    imbalance,
+):
+    make_profit(10**20)
+    imbalance_pool(1, initial_amounts[1] * imbalance // 100)
+
+    tx = peg_keeper.withdraw_profit({"from": admin})
+    assert tx.return_value > 0
+    gas_report("withdraw_profit", imbalance, tx.gas_used)
@@ -5,10 +5,14 @@ from brownie import ZERO_ADDRESS, Contract
 from brownie._config import CONFIG
 from brownie.project.main import get_loaded_projects
 
+from tests import py_evm
+
 pytest_plugins = [
     "tests.fixtures.accounts",
+    "tests.fixtures.benchmarks",
     "tests.fixtures.coins",
     "tests.fixtures.functions",
+    "tests.fixtures.snapshots",
 ]
 
 
@@ -25,7 +29,7 @@ def pytest_addoption(parser):
         "--contract",
         action="store",
         default=list(_contracts.keys())[0],
-        help="peg keeper name to test against",
+        help="peg keeper name to test against, `all` for every one",
     )
     parser.addoption("--unitary", action="store_true", help="only run unit tests")
     parser.addoption(
@@ -37,6 +41,29 @@ def pytest_addoption(parser):
         default=False,
         help="only run forked tests",
     )
+    parser.addoption(
+        "--benchmarks",
+        action="store_true",
+        default=False,
+        help="only run gas benchmarks",
+    )
+    parser.addoption(
+        "--py-evm",
+        action="store_true",
+        default=False,
+        help="run contracts in an in-process py-evm instead of ganache",
+    )
+    parser.addoption(
+        "--gas-report",
+        action="store",
+        default="reports/gas-benchmarks.json",
+        help="file to write gas benchmarks to",
+    )
+
+
+def pytest_configure(config):
+    if config.getoption("py_evm"):
+        py_evm.install()
 
 
 def pytest_ignore_collect(path, config):
@@ -62,6 +89,12 @@ def pytest_ignore_collect(path, config):
     if config.getoption("forked_tests") or "forked" in path_parts:
         return True
 
+    # Same for benchmarks
+    if config.getoption("benchmarks") and "benchmarks" in path_parts:
+        return None
+    if config.getoption("benchmarks") or "benchmarks" in path_parts:
+        return True
+
     # with the `--unitary` flag, skip any tests in an `integration` subdirectory
     if config.getoption("unitary") and "integration" in path_parts:
         return True
@@ -73,11 +106,12 @@ def pytest_ignore_collect(path, config):
 
 def pytest_generate_tests(metafunc):
     cli_option = metafunc.config.getoption("contract")
+    names = list(_contracts) if cli_option == "all" else [cli_option]
     metafunc.parametrize(
         "peg_keeper_name",
-        [cli_option],
+        names,
         indirect=True,
-        ids=[f"(PegKeeper={cli_option})"],
+        ids=[f"(PegKeeper={name})" for name in names],
     )
 
 
@@ -95,6 +129,12 @@ def pytest_collection_modifyitems(config, items):
                 items.remove(item)
                 continue
 
+        # Multi-pool Peg Keeper is tested with plain pools only
+        if peg_keeper_name != "pluggable-optimized":
+            if "test_multi.py" in path_parts:
+                items.remove(item)
+                continue
+
     # hacky magic to ensure the correct number of tests is shown in collection report
     config.pluginmanager.get_plugin("terminalreporter")._numcollected = len(items)
 
@@ -104,25 +144,43 @@ def isolation_setup(fn_isolation):
     pass
 
 
+@pytest.fixture(scope="module")
+def module_isolation(request, snapshot_cache, deployment, peg_keeper_name):
+    """
+    Replaces the chain reset of brownie between modules: contracts are deployed
+    once per session and every module starts from a cached snapshot.
+    """
+    snapshot_cache.enter_module(peg_keeper_name, request.node)
+    yield
+
+
 @pytest.fixture(scope="session")
 def is_forked():
     yield "fork" in CONFIG.active_network["id"]
 
 
 @pytest.fixture(scope="session")
-def peg_keeper_name(request):
+def peg_keeper_name(request, snapshot_cache):
+    # Other Peg Keepers are deployed before the setup of any module
+    snapshot_cache.reset(request.param)
     return request.param
 
 
-@pytest.fixture(scope="module")
-def swap(StableSwap, StableSwapMeta, coins, alice, peg_keeper_name, is_forked):
+@pytest.fixture(scope="session")
+def swap(
+    StableSwap, StableSwapMeta, coins, alice, peg_keeper_name, is_forked, snapshot_cache
+):
     if is_forked:
         yield Contract(
             "0x5a6A4D54456819380173272A5E8E9B9904BdF41B"
         )  # MIM Pool Swap Address
-    else:
-        if "meta" in peg_keeper_name:
-            yield StableSwapMeta.deploy(
+        return
+
+    name = f"{peg_keeper_name}/swap"
+    if "meta" in peg_keeper_name:
+        contract = snapshot_cache.contract(name, StableSwapMeta)
+        if contract is None:
+            contract = StableSwapMeta.deploy(
                 "Test",  # name
                 "TEST",  # symbol
                 coins,  # coins[2]
@@ -131,8 +189,10 @@ def swap(StableSwap, StableSwapMeta, coins, alice, peg_keeper_name, is_forked):
                 0,  # fee
                 {"from": alice},
             )
-        else:
-            yield StableSwap.deploy(
+    else:
+        contract = snapshot_cache.contract(name, StableSwap)
+        if contract is None:
+            contract = StableSwap.deploy(
                 "Test",  # name
                 "TEST",  # symbol
                 coins + [ZERO_ADDRESS] * 2,  # coins[4]
@@ -141,15 +201,31 @@ def swap(StableSwap, StableSwapMeta, coins, alice, peg_keeper_name, is_forked):
                 0,  # fee
                 {"from": alice},
             )
+    snapshot_cache.add_contract(name, contract)
+    yield contract
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def peg_keeper(
-    peg_keeper_name, swap, admin, receiver, pegged, alice, initial_amounts, is_forked
+    peg_keeper_name,
+    swap,
+    admin,
+    receiver,
+    pegged,
+    alice,
+    initial_amounts,
+    is_forked,
+    snapshot_cache,
 ):
     project = get_loaded_projects()[0]
     peg_keeper = getattr(project, _contracts[peg_keeper_name])
 
+    name = f"{peg_keeper_name}/peg_keeper"
+    contract = snapshot_cache.contract(name, peg_keeper)
+    if contract is not None:
+        yield contract
+        return
+
     abi = next(i["inputs"] for i in peg_keeper.abi if i["type"] == "constructor")
     args = {
         "_pool": swap,
@@ -167,9 +243,21 @@ def peg_keeper(
     if peg_keeper_name == "mim":
         pegged._mint_for_testing(contract, 10 * initial_amounts[0], {"from": alice})
 
+    snapshot_cache.add_contract(name, contract)
     yield contract
 
 
+@pytest.fixture(scope="session")
+def deployment(snapshot_cache, peg_keeper_name, peg_keeper):
+    snapshot_cache.push_base(peg_keeper_name)
+
+
 @pytest.fixture(scope="module")
 def peg_keeper_updater(charlie, swap):
     return charlie
+
+
+@pytest.fixture(scope="module")
+def multicall(Multicall, alice, peg_keeper_name):
+    # Deployed for each Peg Keeper, the chain is reset to its deployment between them
+    yield Multicall.deploy({"from": alice})
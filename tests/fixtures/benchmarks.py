@@ -0,0 +1,34 @@
+import fcntl
+import json
+from pathlib import Path
+
+import pytest
+from brownie.project.main import get_loaded_projects
+
+
+@pytest.fixture(scope="session")
+def gas_report(request, peg_keeper_name):
+    """
+    Record gas used as `gas_report(function, imbalance, gas)`.
+    Results are merged into the report file per function and imbalance, under a
+    file lock so that xdist workers benchmarking the same contract keep each
+    other's results.
+    """
+    results = {}
+
+    def _record(function: str, imbalance, gas: int):
+        results.setdefault(function, {})[str(imbalance)] = gas
+
+    yield _record
+
+    if not results:
+        return
+    path = Path(get_loaded_projects()[0]._path) / request.config.getoption("gas_report")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.with_name(path.name + ".lock").open("w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        report = json.loads(path.read_text()) if path.exists() else {}
+        contract = report.setdefault(peg_keeper_name, {})
+        for function, gas_used in results.items():
+            contract.setdefault(function, {}).update(gas_used)
+        path.write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
@@ -2,32 +2,40 @@ import pytest
 from brownie_tokens import MintableForkToken
 
 
-@pytest.fixture(scope="module")
-def peg(ERC20Mock, alice, is_forked):
+@pytest.fixture(scope="session")
+def peg(ERC20Mock, alice, is_forked, snapshot_cache):
     if is_forked:
         yield MintableForkToken("0x6c3F90f043a72FA612cbac8115EE7e52BDe6E490")  # 3CRV
     else:
-        yield ERC20Mock.deploy("Peg Coin", "Peg", 18, {"from": alice})
+        contract = snapshot_cache.contract("peg", ERC20Mock)
+        if contract is None:
+            contract = ERC20Mock.deploy("Peg Coin", "Peg", 18, {"from": alice})
+            snapshot_cache.add_contract("peg", contract)
+        yield contract
 
 
-@pytest.fixture(scope="module")
-def pegged(ERC20Pegged, alice, is_forked):
+@pytest.fixture(scope="session")
+def pegged(ERC20Pegged, alice, is_forked, snapshot_cache):
     if is_forked:
         yield MintableForkToken("0x99d8a9c45b2eca8864373a26d1459e3dff1e17f3")  # MIM
     else:
-        yield ERC20Pegged.deploy("Pegged Coin", "Pegged", 18, {"from": alice})
+        contract = snapshot_cache.contract("pegged", ERC20Pegged)
+        if contract is None:
+            contract = ERC20Pegged.deploy("Pegged Coin", "Pegged", 18, {"from": alice})
+            snapshot_cache.add_contract("pegged", contract)
+        yield contract
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def coins(peg, pegged):
     yield [pegged, peg]
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def decimals(coins):
     yield [coin.decimals() for coin in coins]
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def n_coins(coins):
     yield len(coins)
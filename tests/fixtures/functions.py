@@ -1,15 +1,21 @@
+import brownie
 import pytest
 from brownie import chain
+from brownie.exceptions import VirtualMachineError
+
+from scripts import keeper
+from scripts.simulation.peg_keeper import PegKeeper, PegKeeperMeta, PegKeeperMim
+from scripts.simulation.stableswap import Revert, StableSwap, StableSwapMeta
 
 # ------------------------------ Coins functions -------------------------------
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def base_amount():
     yield 1_000_000
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def initial_amounts(coins, base_amount, peg_keeper_name):
     amounts = [base_amount * 10 ** coin.decimals() for coin in coins]
     if "meta" in peg_keeper_name:
@@ -31,12 +37,15 @@ def equal_balances(swap, peg_keeper_name):
 
 
 @pytest.fixture(scope="module")
-def add_initial_liquidity(swap, coins, initial_amounts, alice):
+def add_initial_liquidity(snapshot_cache, swap, coins, initial_amounts, alice):
+    if snapshot_cache.restore("add_initial_liquidity"):
+        return
     for coin, amount in zip(coins, initial_amounts):
         coin._mint_for_testing(alice, amount)
         coin.approve(swap, amount, {"from": alice})
 
     swap.add_liquidity(initial_amounts, 0, {"from": alice})
+    snapshot_cache.store("add_initial_liquidity")
 
 
 def _mint(acct, coins, amounts):
@@ -50,23 +59,31 @@ def _approve(acct, coins, pool, amounts):
 
 
 @pytest.fixture(scope="module")
-def mint_alice(alice, coins, initial_amounts):
-    _mint(alice, coins, initial_amounts)
+def mint_alice(snapshot_cache, alice, coins, initial_amounts):
+    if not snapshot_cache.restore("mint_alice"):
+        _mint(alice, coins, initial_amounts)
+        snapshot_cache.store("mint_alice")
 
 
 @pytest.fixture(scope="module")
-def approve_alice(alice, coins, swap, initial_amounts):
-    _approve(alice, coins, swap, initial_amounts)
+def approve_alice(snapshot_cache, alice, coins, swap, initial_amounts):
+    if not snapshot_cache.restore("approve_alice"):
+        _approve(alice, coins, swap, initial_amounts)
+        snapshot_cache.store("approve_alice")
 
 
 @pytest.fixture(scope="module")
-def mint_bob(bob, coins, initial_amounts):
-    _mint(bob, coins, initial_amounts)
+def mint_bob(snapshot_cache, bob, coins, initial_amounts):
+    if not snapshot_cache.restore("mint_bob"):
+        _mint(bob, coins, initial_amounts)
+        snapshot_cache.store("mint_bob")
 
 
 @pytest.fixture(scope="module")
-def approve_bob(bob, coins, swap, initial_amounts):
-    _approve(bob, coins, swap, initial_amounts)
+def approve_bob(snapshot_cache, bob, coins, swap, initial_amounts):
+    if not snapshot_cache.restore("approve_bob"):
+        _approve(bob, coins, swap, initial_amounts)
+        snapshot_cache.store("approve_bob")
 
 
 # ---------------------------- Stable Swap functions ---------------------------
@@ -108,11 +125,31 @@ def imbalance_pool(swap, coins, initial_amounts, alice, peg_keeper_name):
     return _inner
 
 
+@pytest.fixture(scope="module")
+def swap_model(swap, peg, peg_keeper_name):
+    """Python model of the current pool state."""
+
+    def basic():
+        return StableSwap.from_contract(swap)
+
+    def meta():
+        return StableSwapMeta.from_contract(swap, [10**18, peg.get_virtual_price()])
+
+    return meta if "meta" in peg_keeper_name else basic
+
+
+@pytest.fixture(scope="module")
+def clear_keeper_cache():
+    """Contracts of different tests may be deployed at the same addresses."""
+    keeper._DESCRIPTIONS.clear()
+
+
 # ---------------------------- Stable Peg functions ----------------------------
 
 
 @pytest.fixture(scope="module")
 def provide_token_to_peg_keeper_no_sleep(
+    snapshot_cache,
     swap,
     peg,
     alice,
@@ -123,6 +160,8 @@ def provide_token_to_peg_keeper_no_sleep(
     peg_keeper_name,
 ):
     """Add 5x of peg, so Peg Keeper mints x, then remove 4x, so pool is balanced."""
+    if snapshot_cache.restore("provide_token_to_peg_keeper_no_sleep"):
+        return
     equal_balances()
     amount = initial_amounts[1] * 5
     peg._mint_for_testing(alice, amount)
@@ -147,11 +186,14 @@ def provide_token_to_peg_keeper_no_sleep(
     )
 
     equal_balances()
+    snapshot_cache.store("provide_token_to_peg_keeper_no_sleep")
 
 
 @pytest.fixture(scope="module")
-def provide_token_to_peg_keeper(provide_token_to_peg_keeper_no_sleep):
-    chain.sleep(15 * 60)
+def provide_token_to_peg_keeper(snapshot_cache, provide_token_to_peg_keeper_no_sleep):
+    if not snapshot_cache.restore("provide_token_to_peg_keeper"):
+        chain.sleep(15 * 60)
+        snapshot_cache.store("provide_token_to_peg_keeper")
 
 
 @pytest.fixture(scope="module")
@@ -190,3 +232,181 @@ def balance_change_after_withdraw(swap, coins, peg_keeper_name):
             )
 
     return _inner
+
+
+@pytest.fixture(scope="module")
+def peg_keeper_model(swap, pegged, peg_keeper, peg_keeper_name, swap_model):
+    """Python model of the current Peg Keeper state."""
+
+    def _inner():
+        kwargs = {
+            "caller_share": peg_keeper.caller_share(),
+            "debt": peg_keeper.debt(),
+            "lp_balance": swap.balanceOf(peg_keeper),
+            "last_change": peg_keeper.last_change(),
+            "adaptive": peg_keeper.adaptive(),
+        }
+        if peg_keeper_name == "mim":
+            return PegKeeperMim(
+                swap_model(), pegged_balance=pegged.balanceOf(peg_keeper), **kwargs
+            )
+        if "meta" in peg_keeper_name:
+            return PegKeeperMeta(swap_model(), **kwargs)
+        return PegKeeper(swap_model(), **kwargs)
+
+    return _inner
+
+
+# One in this many actions the models revert on is sent, the chain must revert on it too
+REVERT_SAMPLE_INTERVAL = 5
+
+
+class _ModelGuard:
+    """
+    Pool actions and Peg Keeper updates of `caller`, sent only when the Python
+    models do not revert on them and applied to the models after the chain.
+    A revert of the chain on an action sent fails the test, so does a sampled
+    action on which the models revert and the chain does not.
+    Removals are scaled down to the LP tokens of the caller.
+    Methods return the result of the model, or None if nothing was sent.
+    """
+
+    def __init__(self, swap, peg_keeper, caller, peg_keeper_model):
+        self.swap = swap
+        self.peg_keeper = peg_keeper
+        self.caller = caller
+        self._peg_keeper_model = peg_keeper_model
+        self.predicted_reverts = 0
+        self.sync()
+
+    def sync(self):
+        """Read the models and the LP balance of the caller from the chain."""
+        self.model = self._peg_keeper_model()
+        self.lp_balance = self.swap.balanceOf(self.caller)
+
+    def _transact(self, transact):
+        try:
+            return transact({"from": self.caller})
+        except VirtualMachineError as exc:
+            raise AssertionError(f"Chain reverted, the models did not: {exc}") from None
+
+    def _check_revert(self, transact):
+        self.predicted_reverts += 1
+        if self.predicted_reverts % REVERT_SAMPLE_INTERVAL == 0:
+            with brownie.reverts():
+                transact({"from": self.caller})
+
+    def _send(self, simulate, transact):
+        model = self.model.copy()
+        try:
+            result = simulate(model)
+        except (Revert, ZeroDivisionError):
+            self._check_revert(transact)
+            return None
+        self._transact(transact)
+        self.model = model
+        return result
+
+    def add_liquidity(self, amounts):
+        mint_amount = self._send(
+            lambda model: model.pool.add_liquidity(amounts),
+            lambda tx: self.swap.add_liquidity(amounts, 0, tx),
+        )
+        self.lp_balance += mint_amount or 0
+        return mint_amount
+
+    def remove_liquidity(self, burn_amount: int):
+        burn_amount = min(burn_amount, self.lp_balance)
+        amounts = self._send(
+            lambda model: model.pool.remove_liquidity(burn_amount),
+            lambda tx: self.swap.remove_liquidity(burn_amount, [0, 0], tx),
+        )
+        if amounts is not None:
+            self.lp_balance -= burn_amount
+        return amounts
+
+    def remove_liquidity_imbalance(self, amounts):
+        def simulate(model):
+            burn_amount = model.pool.remove_liquidity_imbalance(amounts)
+            if burn_amount > self.lp_balance:
+                raise Revert("insufficient balance")
+            return burn_amount
+
+        burn_amount = self._send(
+            simulate,
+            lambda tx: self.swap.remove_liquidity_imbalance(amounts, 2**256 - 1, tx),
+        )
+        self.lp_balance -= burn_amount or 0
+        return burn_amount
+
+    def remove_liquidity_one_coin(self, burn_amount: int, i: int):
+        burn_amount = min(burn_amount, self.lp_balance)
+        dy = self._send(
+            lambda model: model.pool.remove_liquidity_one_coin(burn_amount, i),
+            lambda tx: self.swap.remove_liquidity_one_coin(burn_amount, i, 0, tx),
+        )
+        if dy is not None:
+            self.lp_balance -= burn_amount
+        return dy
+
+    def exchange(self, i: int, j: int, dx: int):
+        return self._send(
+            lambda model: model.pool.exchange(i, j, dx),
+            lambda tx: self.swap.exchange(i, j, dx, 0, tx),
+        )
+
+    def withdraw_profit(self):
+        return self._send(
+            lambda model: model.withdraw_profit(),
+            lambda tx: self.peg_keeper.withdraw_profit(tx),
+        )
+
+    def update(self):
+        """Returns the caller's profit, or None if the update was not sent."""
+        # Before the delay update() does nothing
+        timestamp = chain.time()
+        if self.model.last_change + self.model.action_delay > timestamp:
+            return None
+        try:
+            self.model.copy().update(timestamp)
+        except (Revert, ZeroDivisionError):
+            self._check_revert(self.peg_keeper.update)
+            return None
+
+        tx = self._transact(self.peg_keeper.update)
+        # The time of the block only decides the delay, as on the chain
+        try:
+            caller_profit = self.model.update(tx.timestamp)
+        except (Revert, ZeroDivisionError) as exc:
+            raise AssertionError(
+                f"Models reverted at the block, the chain did not: {exc}"
+            ) from None
+        self.lp_balance += caller_profit
+        return caller_profit
+
+
+@pytest.fixture(scope="module")
+def model_guard(swap, peg_keeper, alice, peg_keeper_model):
+    """Pool actions of alice that do not revert in the Python models, see `_ModelGuard`."""
+
+    def _inner():
+        return _ModelGuard(swap, peg_keeper, alice, peg_keeper_model)
+
+    return _inner
+
+
+@pytest.fixture(scope="module")
+def make_profit(swap, peg, pegged, initial_amounts, alice, set_fees):
+    def _inner(amount):
+        """Amount to add to balances."""
+        set_fees(1 * 10**9)
+        exchange_amount = amount * 5
+
+        peg.approve(swap, exchange_amount, {"from": alice})
+        swap.exchange(0, 1, exchange_amount, 0, {"from": alice})
+
+        pegged.approve(swap, exchange_amount, {"from": alice})
+        swap.exchange(1, 0, exchange_amount, 0, {"from": alice})
+        set_fees(0)
+
+    return _inner
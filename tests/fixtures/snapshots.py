@@ -0,0 +1,313 @@
+import gzip
+import hashlib
+import os
+import pickle
+from contextlib import contextmanager
+from importlib.metadata import version
+from pathlib import Path
+
+import pytest
+from brownie import chain, history
+from brownie.network.transaction import TransactionReceipt
+from brownie.project.main import get_loaded_projects
+from hexbytes import HexBytes
+
+from tests import py_evm
+
+# Sources of the fixtures that deploy and set up the states saved in images
+IMAGE_SOURCES = [
+    "tests/conftest.py",
+    "tests/fixtures/accounts.py",
+    "tests/fixtures/coins.py",
+    "tests/fixtures/functions.py",
+    "tests/fixtures/snapshots.py",
+    "tests/py_evm.py",
+]
+# Packages that execute the transactions and store the chain of images
+IMAGE_PACKAGES = ["eth-tester", "py-evm"]
+
+
+def _setup_order(item) -> list:
+    """Names of the fixtures of `item` in the order pytest sets them up."""
+    definitions = item._fixtureinfo.name2fixturedefs
+    seen, order = set(), []
+
+    def visit(name):
+        if name in seen or name not in definitions:
+            return
+        seen.add(name)
+        fixturedef = definitions[name][-1]
+        for argname in fixturedef.argnames:
+            visit(argname)
+        # Dependencies are set up first
+        order.append(name)
+
+    for name in item.fixturenames:
+        visit(name)
+    return [(name, definitions[name][-1]) for name in order]
+
+
+def _drop_other_branches():
+    """
+    Forget transactions and contracts which are not on the branch of the chain
+    restored from an image. brownie only drops the ones of higher blocks.
+    """
+    blocks = {}
+
+    def on_branch(tx) -> bool:
+        if tx.block_number not in blocks:
+            blocks[tx.block_number] = chain[tx.block_number].transactions
+        return HexBytes(tx.txid) in blocks[tx.block_number]
+
+    for tx in history.copy():
+        if not on_branch(tx):
+            history._list.remove(tx)
+    for container in get_loaded_projects()[0]:
+        for contract in list(container):
+            if contract.tx is not None and not on_branch(contract.tx):
+                container.remove(contract)
+
+
+class ChainImage:
+    """
+    Chain of the py-evm backend saved between sessions, with the block hashes of
+    the cached states and the contracts deployed by session fixtures.
+    Images are keyed by the bytecode of the project, the sources of the fixtures
+    and the versions of the EVM packages. The clock of a loaded image resumes at
+    the time of its head.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        # {(peg_keeper_name, fixtures): block hash}
+        self.states = {}
+        # {name: (address, deployment txid)}
+        self.contracts = {}
+        # State loaded first, the deployment of coins and of the first Peg Keeper
+        self.head = None
+        # Database of the chain when the last new state was added
+        self.db = None
+        self.changed = False
+        if path.exists():
+            with gzip.open(path, "rb") as f:
+                image = pickle.load(f)
+            py_evm.load_state(image["db"], image["head"])
+            # brownie takes the offset of the clock from a zero sleep
+            chain.sleep(0)
+            self.states, self.contracts = image["states"], image["contracts"]
+            self.head = image["head"]
+            self.db = image["db"]
+
+    @classmethod
+    def for_project(cls, project) -> "ChainImage":
+        sha = hashlib.sha256()
+        for name in sorted(project.keys()):
+            sha.update(project[name].bytecode.encode())
+        for source in IMAGE_SOURCES:
+            sha.update(Path(project._path).joinpath(source).read_bytes())
+        for package in IMAGE_PACKAGES:
+            sha.update(f"{package}=={version(package)}".encode())
+        path = Path(project._path).joinpath(
+            "build", "chain-images", sha.hexdigest()[:16]
+        )
+        return cls(path)
+
+    def add_state(self, key, block_hash: bytes):
+        if self.head is None:
+            self.head = block_hash
+        self.states[key] = block_hash
+        # Blocks mined by tests after the last setup are left out of the image
+        self.db = py_evm.dump_state()
+        self.changed = True
+
+    def find(self, peg_keeper_name: str, fixtures: tuple):
+        """Key of the deepest saved state of `fixtures` applied in order."""
+        for i in range(len(fixtures), -1, -1):
+            if (peg_keeper_name, fixtures[:i]) in self.states:
+                return peg_keeper_name, fixtures[:i]
+        return None
+
+    def save(self):
+        if not self.changed:
+            return
+        image = {
+            "db": self.db,
+            "head": self.head,
+            "states": self.states,
+            "contracts": self.contracts,
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # xdist workers may write the same image, each one is complete
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}")
+        with gzip.open(tmp_path, "wb") as f:
+            pickle.dump(image, f)
+        os.replace(tmp_path, self.path)
+
+
+class SnapshotCache:
+    """
+    Snapshots of the chain states set up by module fixtures, keyed by
+    `(peg_keeper_name, names of the fixtures applied in order)`.
+
+    Snapshots of the node form a stack: reverting to one discards the ones
+    taken after it, so only the states on the path of the latest module are kept.
+    A module fixture is cached when it requests `snapshot_cache`, calls `restore()`
+    first and `store()` last. Fixtures of test modules are never cached, states
+    set up after them are built as usual.
+
+    With an `image`, cached states and deployed contracts are also saved for
+    later sessions and restored from it.
+
+    Takes and reverts snapshots with `chain._take_snapshot()` and `chain._revert()`
+    of brownie 1.22, the version pinned in `requirements.txt`.
+    """
+
+    def __init__(self, image: ChainImage = None):
+        self._image = image
+        # [(key, snapshot id)], states of the chain in order
+        self._stack = []
+        # Key of the current chain state, None when it is not cached
+        self._key = None
+        self._height = None
+        # Fixtures already applied by the restored state, in order
+        self._restored = []
+
+    def _push(self, key):
+        # The time offset of brownie is stored with the snapshot
+        self._stack.append((key, chain._take_snapshot()))
+        self._key = key
+        self._height = chain.height
+        if self._image is not None and key not in self._image.states:
+            self._image.add_state(key, chain[-1].hash)
+
+    def _restore_image(self, key):
+        snapshot_id = py_evm.snapshot_at(self._image.states[key])
+        self._stack.append((key, chain._revert(snapshot_id)))
+        self._key = key
+        self._height = chain.height
+        _drop_other_branches()
+
+    def reset(self, peg_keeper_name: str):
+        """
+        Revert to the deployment of `peg_keeper_name` saved in the image, or else
+        to the deployment of the first Peg Keeper to deploy another one.
+        """
+        key = (peg_keeper_name, ())
+        if self._image is not None and key in self._image.states:
+            self._stack = []
+            self._restore_image(key)
+        elif self._stack:
+            key, snapshot_id = self._stack[0]
+            self._stack = [(key, chain._revert(snapshot_id))]
+            self._key = None
+
+    def push_base(self, peg_keeper_name: str):
+        """Cache the state after the deployment of the contracts."""
+        key = (peg_keeper_name, ())
+        if not self._stack or self._stack[-1][0] != key:
+            self._push(key)
+
+    def contract(self, name: str, container):
+        """Contract `name` deployed by a previous session, or None."""
+        if self._image is None or name not in self._image.contracts:
+            return None
+        address, txid = self._image.contracts[name]
+        tx = TransactionReceipt(txid, silent=True)
+        # Transactions without a sender are sent by the deployer
+        return container.at(address, owner=tx.sender, tx=tx)
+
+    def add_contract(self, name: str, contract):
+        """Save the deployment of contract `name` to the image."""
+        if self._image is not None and name not in self._image.contracts:
+            self._image.contracts[name] = (contract.address, contract.tx.txid)
+            self._image.changed = True
+
+    def enter_module(self, peg_keeper_name: str, module):
+        """
+        Revert to the deepest cached state of the fixtures that `module`
+        sets up before its own ones.
+        """
+        item = next(
+            i for i in module.session.items if i.getparent(pytest.Module) is module
+        )
+        names = []
+        for name, fixturedef in _setup_order(item):
+            if fixturedef.scope != "module" or name == "module_isolation":
+                continue
+            if fixturedef.func.__module__ == module.obj.__name__:
+                break
+            if "snapshot_cache" in fixturedef.argnames:
+                names.append(name)
+        names = tuple(names)
+
+        depth = 0
+        for i, ((name, fixtures), _) in enumerate(self._stack):
+            if name == peg_keeper_name and names[: len(fixtures)] == fixtures:
+                depth = i
+
+        key, snapshot_id = self._stack[depth]
+        image_key = self._image and self._image.find(peg_keeper_name, names)
+        if image_key and len(image_key[1]) > len(key[1]):
+            del self._stack[depth + 1 :]
+            self._restore_image(image_key)
+        else:
+            # Reverting consumes the snapshot, a new one of the same state is taken
+            del self._stack[depth:]
+            self._stack.append((key, chain._revert(snapshot_id)))
+            self._key = key
+            self._height = chain.height
+        self._restored = list(self._key[1])
+
+    def restore(self, name: str) -> bool:
+        """Return True if the state of fixture `name` is already set up."""
+        if self._restored:
+            if self._restored[0] != name or chain.height != self._height:
+                raise RuntimeError(f"Fixture {name} is set up out of the cached order")
+            self._restored.pop(0)
+            return True
+
+        if chain.height != self._height:
+            # Another fixture changed the chain, following states are not cached
+            self._key = None
+        return False
+
+    def store(self, name: str):
+        """Cache the state after the setup of fixture `name`."""
+        if self._key is not None:
+            peg_keeper_name, fixtures = self._key
+            self._push((peg_keeper_name, fixtures + (name,)))
+
+
+@pytest.fixture(scope="session")
+def snapshot_cache(request):
+    image = None
+    if request.config.getoption("py_evm"):
+        image = ChainImage.for_project(get_loaded_projects()[0])
+    yield SnapshotCache(image)
+    if image is not None:
+        image.save()
+
+
+@contextmanager
+def _scratch_state():
+    undo_length = len(chain._undo_buffer)
+    # Taken by brownie, which stores its time offset with the snapshot
+    snapshot_id = chain._take_snapshot()
+    try:
+        yield
+    finally:
+        # Later snapshots of brownie are discarded, so are their undo entries
+        chain._current_id = chain._revert(snapshot_id)
+        del chain._undo_buffer[undo_length:]
+        chain._redo_buffer.clear()
+
+
+@pytest.fixture(scope="session")
+def scratch_state():
+    """
+    Context manager that reverts the chain on exit to its state on entry,
+    with one revert of the node whatever the number of transactions.
+    Does not use `chain.snapshot()`, which state machines reset examples with,
+    but the snapshot and undo internals of the pinned brownie 1.22.
+    """
+    return _scratch_state
@@ -1,6 +1,5 @@
 import pytest
 from brownie import chain
-from brownie.exceptions import VirtualMachineError
 from brownie.test import strategy
 
 pytestmark = pytest.mark.usefixtures(
@@ -15,20 +14,23 @@ class StateMachine:
     """
     Stateful test that performs a series of deposits, swaps and withdrawals
     and confirms that profit is calculated right.
+    Actions that revert in the Python models are not sent.
     """
 
     st_idx = strategy("int", min_value=0, max_value=1)
     st_pct = strategy("decimal", min_value="0.5", max_value="10000", places=2)
 
-    def __init__(cls, alice, swap, peg_keeper, decimals):
+    def __init__(cls, alice, swap, peg_keeper, decimals, model_guard):
         cls.alice = alice
         cls.swap = swap
         cls.peg_keeper = peg_keeper
         cls.decimals = decimals
+        cls.model_guard = staticmethod(model_guard)
         cls.profit = 0
 
     def setup(self):
         self.profit = self.peg_keeper.calc_profit()
+        self.pool = self.model_guard()
 
     def rule_add_one_coin(self, st_idx, st_pct):
         """
@@ -36,7 +38,7 @@ class StateMachine:
         """
         amounts = [0, 0]
         amounts[st_idx] = int(10 ** self.decimals[st_idx] * st_pct)
-        self.swap.add_liquidity(amounts, 0, {"from": self.alice})
+        self.pool.add_liquidity(amounts)
 
     def rule_add_coins(self, amount_0="st_pct", amount_1="st_pct"):
         """
@@ -46,16 +48,14 @@ class StateMachine:
             int(10 ** self.decimals[0] * amount_0),
             int(10 ** self.decimals[1] * amount_1),
         ]
-        self.swap.add_liquidity(amounts, 0, {"from": self.alice})
+        self.pool.add_liquidity(amounts)
 
     def rule_remove_one_coin(self, st_idx, st_pct):
         """
         Remove liquidity from the pool in only one coin.
         """
         token_amount = int(10**18 * st_pct)
-        self.swap.remove_liquidity_one_coin(
-            token_amount, st_idx, 0, {"from": self.alice}
-        )
+        self.pool.remove_liquidity_one_coin(token_amount, st_idx)
 
     def rule_remove_imbalance(self, amount_0="st_pct", amount_1="st_pct"):
         """
@@ -65,23 +65,21 @@ class StateMachine:
             int(10 ** self.decimals[0] * amount_0),
             int(10 ** self.decimals[1] * amount_1),
         ]
-        self.swap.remove_liquidity_imbalance(
-            amounts, 2**256 - 1, {"from": self.alice}
-        )
+        self.pool.remove_liquidity_imbalance(amounts)
 
     def rule_remove(self, st_pct):
         """
         Remove liquidity from the pool.
         """
         amount = int(10**18 * st_pct)
-        self.swap.remove_liquidity(amount, [0] * 2, {"from": self.alice})
+        self.pool.remove_liquidity(amount)
 
     def rule_exchange(self, st_idx, st_pct):
         """
         Perform a swap.
         """
-        amount = 10 ** self.decimals[st_idx] * st_pct
-        self.swap.exchange(st_idx, 1 - st_idx, amount, 0, {"from": self.alice})
+        amount = int(10 ** self.decimals[st_idx] * st_pct)
+        self.pool.exchange(st_idx, 1 - st_idx, amount)
 
     def invariant_profit_increases(self):
         """
@@ -92,15 +90,8 @@ class StateMachine:
         self.profit = profit
 
     def _manual_update(self) -> bool:
-        try:
-            self.peg_keeper.update({"from": self.alice})
-        except VirtualMachineError:
-            # assert e.revert_msg in [
-            #     "dev: peg was unprofitable",
-            #     "dev: zero tokens burned",  # StableSwap assertion when add/remove zero coins
-            # ]
-            return False
-        return True
+        # Updates reverting in the model, e.g. unprofitable pegs, are not sent
+        return self.pool.update() is not None
 
     def invariant_profit(self):
         """
@@ -134,6 +125,7 @@ def test_profit_increases(
     set_fees,
     peg_keeper,
     admin,
+    model_guard,
 ):
     set_fees(4 * 10**7)
 
@@ -143,5 +135,6 @@ def test_profit_increases(
         swap,
         peg_keeper,
         decimals,
+        model_guard,
         settings={"max_examples": 20, "stateful_step_count": 40},
     )
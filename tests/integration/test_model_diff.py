@@ -0,0 +1,211 @@
+import pytest
+from brownie import chain
+from brownie.exceptions import VirtualMachineError
+from brownie.test import strategy
+
+from scripts.simulation.stableswap import Revert
+
+pytestmark = pytest.mark.usefixtures(
+    "add_initial_liquidity",
+    "provide_token_to_peg_keeper",
+    "mint_alice",
+    "approve_alice",
+)
+
+
+class StateMachine:
+    """
+    Stateful test that performs the same deposits, swaps, withdrawals and
+    updates on the contracts and on the Python models and confirms that
+    their states are equal after every step.
+    """
+
+    st_idx = strategy("int", min_value=0, max_value=1)
+    st_pct = strategy("decimal", min_value="0.5", max_value="10000", places=2)
+
+    def __init__(cls, alice, swap, peg_keeper, pegged, decimals, peg_keeper_model):
+        cls.alice = alice
+        cls.swap = swap
+        cls.peg_keeper = peg_keeper
+        cls.pegged = pegged
+        cls.decimals = decimals
+        cls.peg_keeper_model = staticmethod(peg_keeper_model)
+
+    def setup(self):
+        self.model = self.peg_keeper_model()
+        self.pool = self.model.pool
+        # LP tokens of alice, the model pool does not keep balances of accounts
+        self.lp_balance = self.swap.balanceOf(self.alice)
+
+    def _both(self, send, simulate):
+        """
+        Send a transaction and apply the same action to the model.
+        Both have to revert or both have to succeed with the same result.
+        """
+        try:
+            tx = send({"from": self.alice})
+        except VirtualMachineError:
+            with pytest.raises(Revert):
+                simulate()
+            return None
+
+        result = tx.return_value
+        if isinstance(result, tuple):
+            # brownie 1.22 cannot compare a ReturnValue of Wei with a list
+            result = list(result)
+        assert simulate() == result
+        return result
+
+    def _burn(self, amount: int) -> int:
+        # Transfer of LP tokens reverts on insufficient balance
+        if amount > self.lp_balance:
+            raise Revert("insufficient balance")
+        self.lp_balance -= amount
+        return amount
+
+    def _add_liquidity(self, amounts):
+        def simulate():
+            mint_amount = self.pool.add_liquidity(amounts)
+            self.lp_balance += mint_amount
+            return mint_amount
+
+        self._both(lambda tx: self.swap.add_liquidity(amounts, 0, tx), simulate)
+
+    def rule_add_one_coin(self, st_idx, st_pct):
+        """
+        Add one coin to the pool.
+        """
+        amounts = [0, 0]
+        amounts[st_idx] = int(10 ** self.decimals[st_idx] * st_pct)
+        self._add_liquidity(amounts)
+
+    def rule_add_coins(self, amount_0="st_pct", amount_1="st_pct"):
+        """
+        Add coins to the pool.
+        """
+        self._add_liquidity(
+            [
+                int(10 ** self.decimals[0] * amount_0),
+                int(10 ** self.decimals[1] * amount_1),
+            ]
+        )
+
+    def rule_remove_one_coin(self, st_idx, st_pct):
+        """
+        Remove liquidity from the pool in only one coin.
+        """
+        token_amount = int(10**18 * st_pct)
+
+        def simulate():
+            # Balance is checked after the amount is calculated
+            dy = self.pool.copy().remove_liquidity_one_coin(token_amount, st_idx)
+            self._burn(token_amount)
+            self.pool.remove_liquidity_one_coin(token_amount, st_idx)
+            return dy
+
+        self._both(
+            lambda tx: self.swap.remove_liquidity_one_coin(token_amount, st_idx, 0, tx),
+            simulate,
+        )
+
+    def rule_remove_imbalance(self, amount_0="st_pct", amount_1="st_pct"):
+        """
+        Remove liquidity from the pool in an imbalanced manner.
+        """
+        amounts = [
+            int(10 ** self.decimals[0] * amount_0),
+            int(10 ** self.decimals[1] * amount_1),
+        ]
+
+        def simulate():
+            burn_amount = self.pool.copy().remove_liquidity_imbalance(amounts)
+            self._burn(burn_amount)
+            return self.pool.remove_liquidity_imbalance(amounts)
+
+        self._both(
+            lambda tx: self.swap.remove_liquidity_imbalance(amounts, 2**256 - 1, tx),
+            simulate,
+        )
+
+    def rule_remove(self, st_pct):
+        """
+        Remove liquidity from the pool.
+        """
+        amount = int(10**18 * st_pct)
+
+        def simulate():
+            self._burn(amount)
+            return self.pool.remove_liquidity(amount)
+
+        self._both(lambda tx: self.swap.remove_liquidity(amount, [0] * 2, tx), simulate)
+
+    def rule_exchange(self, st_idx, st_pct):
+        """
+        Perform a swap.
+        """
+        amount = int(10 ** self.decimals[st_idx] * st_pct)
+        self._both(
+            lambda tx: self.swap.exchange(st_idx, 1 - st_idx, amount, 0, tx),
+            lambda: self.pool.exchange(st_idx, 1 - st_idx, amount),
+        )
+
+    def invariant_update(self):
+        """
+        Update the Peg Keeper and its model, results have to be equal.
+        """
+        try:
+            caller_profit = self.peg_keeper.update({"from": self.alice}).return_value
+        except VirtualMachineError:
+            with pytest.raises(Revert):
+                self.model.update(chain[-1].timestamp)
+            return
+
+        assert self.model.update(chain[-1].timestamp) == caller_profit
+        self.lp_balance += caller_profit
+
+    def invariant_equal_state(self):
+        """
+        Verify that the models are equal to the contracts.
+        """
+        assert self.pool.balances == [self.swap.balances(0), self.swap.balances(1)]
+        assert self.pool.total_supply == self.swap.totalSupply()
+        assert self.model.debt == self.peg_keeper.debt()
+        assert self.model.lp_balance == self.swap.balanceOf(self.peg_keeper)
+        assert self.model.last_change == self.peg_keeper.last_change()
+        if hasattr(self.model, "pegged_balance"):
+            assert self.model.pegged_balance == self.pegged.balanceOf(self.peg_keeper)
+
+    def invariant_advance_time(self):
+        """
+        Advance the clock by 15 minutes between each action.
+        Needed for action_delay in Peg Keeper.
+        """
+        chain.sleep(15 * 60)
+
+
+@pytest.mark.parametrize("adaptive", [False, True])
+def test_model_equals_contracts(
+    state_machine,
+    swap,
+    alice,
+    decimals,
+    set_fees,
+    peg_keeper,
+    pegged,
+    peg_keeper_model,
+    admin,
+    adaptive,
+):
+    set_fees(4 * 10**7)
+    peg_keeper.set_adaptive(adaptive, {"from": admin})
+
+    state_machine(
+        StateMachine,
+        alice,
+        swap,
+        peg_keeper,
+        pegged,
+        decimals,
+        peg_keeper_model,
+        settings={"max_examples": 10, "stateful_step_count": 40},
+    )
@@ -0,0 +1,142 @@
+import pytest
+from brownie.test import strategy
+
+from scripts.simulation.peg_keeper import ACTION_DELAY
+from scripts.simulation.stableswap import Revert
+
+pytestmark = pytest.mark.usefixtures(
+    "add_initial_liquidity",
+    "provide_token_to_peg_keeper",
+)
+
+
+class StateMachine:
+    """
+    Stateful test of the Python models only, which `test_model_diff.py`
+    checks against the contracts. Performs the deposits, swaps and withdrawals
+    of the other state machines without a chain, so it runs many more steps,
+    and confirms that profit only increases and is never overestimated.
+    """
+
+    st_idx = strategy("int", min_value=0, max_value=1)
+    st_pct = strategy("decimal", min_value="0.5", max_value="10000", places=2)
+
+    def __init__(cls, decimals, peg_keeper_model):
+        cls.decimals = decimals
+        cls.peg_keeper_model = peg_keeper_model
+        # The models are read from the chain once, examples start from copies
+        cls.initial_model = peg_keeper_model()
+
+    def setup(self):
+        self.model = self.initial_model.copy()
+        self.pool = self.model.pool
+        self.timestamp = self.model.last_change + ACTION_DELAY
+        self.profit = self.model.calc_profit()
+        # LP tokens of other holders, they cannot withdraw more
+        self.lp_balance = self.pool.total_supply - self.model.lp_balance
+
+    def _try(self, action, *args):
+        # Actions reverting in the pool are skipped, the model is untouched
+        try:
+            return action(*args)
+        except Revert:
+            return None
+
+    def _add_liquidity(self, amounts):
+        self.lp_balance += self._try(self.pool.add_liquidity, amounts) or 0
+
+    def _remove(self, burn_amount, action, *args):
+        if burn_amount is not None and burn_amount <= self.lp_balance:
+            if self._try(action, *args) is not None:
+                self.lp_balance -= burn_amount
+
+    def rule_add_one_coin(self, st_idx, st_pct):
+        """
+        Add one coin to the pool.
+        """
+        amounts = [0, 0]
+        amounts[st_idx] = int(10 ** self.decimals[st_idx] * st_pct)
+        self._add_liquidity(amounts)
+
+    def rule_add_coins(self, amount_0="st_pct", amount_1="st_pct"):
+        """
+        Add coins to the pool.
+        """
+        amounts = [
+            int(10 ** self.decimals[0] * amount_0),
+            int(10 ** self.decimals[1] * amount_1),
+        ]
+        self._add_liquidity(amounts)
+
+    def rule_remove_one_coin(self, st_idx, st_pct):
+        """
+        Remove liquidity from the pool in only one coin.
+        """
+        token_amount = int(10**18 * st_pct)
+        self._remove(
+            token_amount, self.pool.remove_liquidity_one_coin, token_amount, st_idx
+        )
+
+    def rule_remove_imbalance(self, amount_0="st_pct", amount_1="st_pct"):
+        """
+        Remove liquidity from the pool in an imbalanced manner.
+        """
+        amounts = [
+            int(10 ** self.decimals[0] * amount_0),
+            int(10 ** self.decimals[1] * amount_1),
+        ]
+        burn_amount = self._try(self.pool.copy().remove_liquidity_imbalance, amounts)
+        self._remove(burn_amount, self.pool.remove_liquidity_imbalance, amounts)
+
+    def rule_remove(self, st_pct):
+        """
+        Remove liquidity from the pool.
+        """
+        token_amount = int(10**18 * st_pct)
+        self._remove(token_amount, self.pool.remove_liquidity, token_amount)
+
+    def rule_exchange(self, st_idx, st_pct):
+        """
+        Perform a swap.
+        """
+        amount = int(10 ** self.decimals[st_idx] * st_pct)
+        self._try(self.pool.exchange, st_idx, 1 - st_idx, amount)
+
+    def invariant_profit(self):
+        """
+        Update the Peg Keeper and check the profit: it only increases
+        and is never more than the real one.
+        """
+        self.lp_balance += self._try(self.model.update, self.timestamp) or 0
+
+        profit = self.model.calc_profit()
+        assert profit >= self.profit
+        self.profit = profit
+
+        aim_profit = (
+            self.model.lp_balance
+            - self.model.debt * 10**18 // self.pool.get_virtual_price()
+        )
+        assert aim_profit >= profit  # Never take more than real profit
+        assert aim_profit - profit < 2e18  # Error less than 2 LP Tokens
+
+    def invariant_advance_time(self):
+        """
+        Advance the clock by 15 minutes between each action.
+        """
+        self.timestamp += ACTION_DELAY
+
+
+@pytest.mark.parametrize("adaptive", [False, True])
+def test_model_properties(
+    state_machine, decimals, set_fees, peg_keeper, peg_keeper_model, admin, adaptive
+):
+    set_fees(4 * 10**7)
+    peg_keeper.set_adaptive(adaptive, {"from": admin})
+
+    state_machine(
+        StateMachine,
+        decimals,
+        peg_keeper_model,
+        settings={"max_examples": 50, "stateful_step_count": 200},
+    )
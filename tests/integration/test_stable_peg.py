@@ -1,6 +1,5 @@
 import pytest
 from brownie import chain
-from brownie.exceptions import VirtualMachineError
 from brownie.test import strategy
 
 pytestmark = pytest.mark.usefixtures(
@@ -15,6 +14,7 @@ class StateMachine:
     """
     Stateful test that performs a series of deposits, swaps and withdrawals
     and confirms that peg keeper does not fail and pegs correctly.
+    Actions that revert in the Python models are not sent.
     """
 
     st_idx = strategy("int", min_value=0, max_value=1)
@@ -27,6 +27,7 @@ class StateMachine:
         decimals,
         min_asymmetry,
         peg_keeper,
+        model_guard,
     ):
         cls.alice = alice
         cls.swap = swap
@@ -35,6 +36,10 @@ class StateMachine:
         cls.balances = [swap.balances(0), swap.balances(1)]
 
         cls.peg_keeper = peg_keeper
+        cls.model_guard = staticmethod(model_guard)
+
+    def setup(self):
+        self.pool = self.model_guard()
 
     def _update_balances(self, amounts, remove: bool = False):
         if remove:
@@ -54,8 +59,8 @@ class StateMachine:
         """
         amounts = [0, 0]
         amounts[st_idx] = int(10 ** self.decimals[st_idx] * st_pct)
-        self.swap.add_liquidity(amounts, 0, {"from": self.alice})
-        self._update_balances(amounts)
+        if self.pool.add_liquidity(amounts) is not None:
+            self._update_balances(amounts)
 
     def rule_add_coins(self, amount_0="st_pct", amount_1="st_pct"):
         """
@@ -65,8 +70,8 @@ class StateMachine:
             int(10 ** self.decimals[0] * amount_0),
             int(10 ** self.decimals[1] * amount_1),
         ]
-        self.swap.add_liquidity(amounts, 0, {"from": self.alice})
-        self._update_balances(amounts)
+        if self.pool.add_liquidity(amounts) is not None:
+            self._update_balances(amounts)
 
     def rule_remove_one_coin(self, st_idx, st_pct):
         """
@@ -74,10 +79,9 @@ class StateMachine:
         """
         amounts = [0, 0]
         token_amount = int(10**18 * st_pct)
-        amounts[st_idx] = self.swap.remove_liquidity_one_coin(
-            token_amount, st_idx, 0, {"from": self.alice}
-        ).return_value
-        self._update_balances(amounts, True)
+        amounts[st_idx] = self.pool.remove_liquidity_one_coin(token_amount, st_idx)
+        if amounts[st_idx] is not None:
+            self._update_balances(amounts, True)
 
     def rule_remove_imbalance(self, amount_0="st_pct", amount_1="st_pct"):
         """
@@ -87,42 +91,32 @@ class StateMachine:
             int(10 ** self.decimals[0] * amount_0),
             int(10 ** self.decimals[1] * amount_1),
         ]
-        self.swap.remove_liquidity_imbalance(
-            amounts, 2**256 - 1, {"from": self.alice}
-        )
-        self._update_balances(amounts, True)
+        if self.pool.remove_liquidity_imbalance(amounts) is not None:
+            self._update_balances(amounts, True)
 
     def rule_remove(self, st_pct):
         """
         Remove liquidity from the pool.
         """
         amount = int(10**18 * st_pct)
-        amounts = self.swap.remove_liquidity(
-            amount, [0] * 2, {"from": self.alice}
-        ).return_value
-        self._update_balances(amounts, True)
+        amounts = self.pool.remove_liquidity(amount)
+        if amounts is not None:
+            self._update_balances(amounts, True)
 
     def rule_exchange(self, st_idx, st_pct):
         """
         Perform a swap.
         """
         amounts = [0, 0]
-        amounts[st_idx] = 10 ** self.decimals[st_idx] * st_pct
-        amounts[1 - st_idx] = -self.swap.exchange(
-            st_idx, 1 - st_idx, amounts[st_idx], 0, {"from": self.alice}
-        ).return_value
-        self._update_balances(amounts)
+        amounts[st_idx] = int(10 ** self.decimals[st_idx] * st_pct)
+        dy = self.pool.exchange(st_idx, 1 - st_idx, amounts[st_idx])
+        if dy is not None:
+            amounts[1 - st_idx] = -dy
+            self._update_balances(amounts)
 
     def _manual_update(self) -> bool:
-        try:
-            self.peg_keeper.update({"from": self.alice})
-        except VirtualMachineError:
-            # assert e.revert_msg in [
-            #     "dev: peg was unprofitable",
-            #     "dev: zero tokens burned",  # StableSwap assertion when add/remove zero coins
-            # ]
-            return False
-        return True
+        # Updates reverting in the model, e.g. unprofitable pegs, are not sent
+        return self.pool.update() is not None
 
     def invariant_check_diff(self):
         """
@@ -157,6 +151,7 @@ def test_always_peg(
     peg_keeper,
     admin,
     min_asymmetry,
+    model_guard,
 ):
     set_fees(4 * 10**7)
 
@@ -167,5 +162,6 @@ def test_always_peg(
         decimals,
         min_asymmetry,
         peg_keeper,
+        model_guard,
         settings={"max_examples": 10, "stateful_step_count": 40},
     )
@@ -15,6 +15,7 @@ class StateMachine:
     """
     Stateful test that performs a series of deposits, swaps and withdrawals
     and confirms that peg keeper's withdraw profit does not take too much.
+    Actions that revert in the Python models are not sent.
     """
 
     st_idx = strategy("int", min_value=0, max_value=1)
@@ -30,6 +31,8 @@ class StateMachine:
         receiver,
         always_withdraw,
         peg_keeper_name,
+        model_guard,
+        scratch_state,
     ):
         cls.alice = alice
         cls.swap = swap
@@ -39,10 +42,13 @@ class StateMachine:
         cls.receiver = receiver
         cls.always_withdraw = always_withdraw
         cls.is_meta = "meta" in peg_keeper_name
+        cls.model_guard = staticmethod(model_guard)
+        cls.scratch_state = staticmethod(scratch_state)
 
     def setup(self):
         # Needed in withdraw profit check
         self.pegged.approve(self.swap, 2**256 - 1, {"from": self.alice})
+        self.pool = self.model_guard()
 
     def rule_add_one_coin(self, st_idx, st_pct):
         """
@@ -50,7 +56,7 @@ class StateMachine:
         """
         amounts = [0, 0]
         amounts[st_idx] = int(10 ** self.decimals[st_idx] * st_pct)
-        self.swap.add_liquidity(amounts, 0, {"from": self.alice})
+        self.pool.add_liquidity(amounts)
 
     def rule_add_coins(self, amount_0="st_pct", amount_1="st_pct"):
         """
@@ -60,16 +66,14 @@ class StateMachine:
             int(10 ** self.decimals[0] * amount_0),
             int(10 ** self.decimals[1] * amount_1),
         ]
-        self.swap.add_liquidity(amounts, 0, {"from": self.alice})
+        self.pool.add_liquidity(amounts)
 
     def rule_remove_one_coin(self, st_idx, st_pct):
         """
         Remove liquidity from the pool in only one coin.
         """
         token_amount = int(10**18 * st_pct)
-        self.swap.remove_liquidity_one_coin(
-            token_amount, st_idx, 0, {"from": self.alice}
-        )
+        self.pool.remove_liquidity_one_coin(token_amount, st_idx)
 
     def rule_remove_imbalance(self, amount_0="st_pct", amount_1="st_pct"):
         """
@@ -79,23 +83,21 @@ class StateMachine:
             int(10 ** self.decimals[0] * amount_0),
             int(10 ** self.decimals[1] * amount_1),
         ]
-        self.swap.remove_liquidity_imbalance(
-            amounts, 2**256 - 1, {"from": self.alice}
-        )
+        self.pool.remove_liquidity_imbalance(amounts)
 
     def rule_remove(self, st_pct):
         """
         Remove liquidity from the pool.
         """
         amount = int(10**18 * st_pct)
-        self.swap.remove_liquidity(amount, [0] * 2, {"from": self.alice})
+        self.pool.remove_liquidity(amount)
 
     def rule_exchange(self, st_idx, st_pct):
         """
         Perform a swap.
         """
-        amount = 10 ** self.decimals[st_idx] * st_pct
-        self.swap.exchange(st_idx, 1 - st_idx, amount, 0, {"from": self.alice})
+        amount = int(10 ** self.decimals[st_idx] * st_pct)
+        self.pool.exchange(st_idx, 1 - st_idx, amount)
 
     def rule_withdraw_profit(self):
         """
@@ -108,6 +110,7 @@ class StateMachine:
 
         assert profit == returned
         assert receiver_balance + profit == self.swap.balanceOf(self.receiver)
+        self.pool.sync()
 
     def _manual_update(self) -> bool:
         try:
@@ -124,9 +127,18 @@ class StateMachine:
         """
         Withdraw profit and check that Peg Keeper is still able to withdraw his debt.
         """
-        self._manual_update()
-        self.rule_withdraw_profit()
+        self.pool.update()
+        if self.always_withdraw:
+            self.rule_withdraw_profit()
 
+        # Paying off the debt is only probed, the chain is reverted afterwards
+        with self.scratch_state():
+            if not self.always_withdraw:
+                self.rule_withdraw_profit()
+            self._check_debt_withdrawal()
+        self.pool.sync()
+
+    def _check_debt_withdrawal(self):
         debt = self.peg_keeper.debt()
         if self.is_meta:
             amount = (
@@ -149,9 +161,6 @@ class StateMachine:
             else:
                 assert self.swap.balances(1) == self.swap.balances(0) - 4 * debt - 5
 
-        # withdraw_profit, mint, add_liquidity
-        chain.undo(2 if self.always_withdraw else 3)
-
     def invariant_advance_time(self):
         """
         Advance the clock by 15 minutes between each action.
@@ -174,6 +183,8 @@ def test_withdraw_profit(
     alice,
     always_withdraw,
     peg_keeper_name,
+    model_guard,
+    scratch_state,
 ):
     set_fees(4 * 10**7)
 
@@ -187,5 +198,7 @@ def test_withdraw_profit(
         receiver,
         always_withdraw,
         peg_keeper_name,
+        model_guard,
+        scratch_state,
         settings={"max_examples": 10, "stateful_step_count": 10},
     )
@@ -0,0 +1,280 @@
+"""
+In-process py-evm backend of brownie, used instead of ganache with `--py-evm`.
+
+Transactions are executed by eth-tester in the process of pytest, so there is
+no node to launch and requests do not go over HTTP. Requires the pinned packages
+of `requirements-py-evm.txt`.
+Reverted transactions are mined like with ganache and `chain.sleep()` mines an
+empty block.
+Blocks are mined at the time of the chain, the wall time shifted by an offset.
+Reverting to a snapshot restores the offset of the snapshot, as ganache does, and
+a state loaded from a dump resumes at the time of its head.
+Traces only hold the return value: `return_value` works, `call_trace()`,
+`traceback()` and coverage do not.
+"""
+
+import ast
+import importlib
+import sys
+import time
+
+import psutil
+from brownie._config import CONFIG
+from brownie.network.web3 import web3
+
+CMD = "py-evm"
+
+
+def install():
+    """Launch the development network with this backend."""
+    rpc = importlib.import_module("brownie.network.rpc")
+    rpc.LAUNCH_BACKENDS[CMD] = sys.modules[__name__]
+    CONFIG.networks["development"]["cmd"] = CMD
+
+
+def _provider(gas_limit: int):
+    from eth_tester import EthereumTester, PyEVMBackend
+    from eth_tester.exceptions import TransactionFailed
+    from web3.providers.eth_tester import EthereumTesterProvider
+    from web3.providers.eth_tester.defaults import API_ENDPOINTS
+
+    class Backend(PyEVMBackend):
+        def send_transaction(self, transaction):
+            # Same as eth-tester, which drops the computation and its output
+            evm_transaction = self._get_normalized_and_signed_evm_transaction(
+                transaction
+            )
+            _, _, self.computation = self.chain.apply_transaction(evm_transaction)
+            return evm_transaction.hash
+
+    genesis = PyEVMBackend.generate_genesis_params({"gas_limit": gas_limit})
+    # brownie sends with a zero gas price, the base fee stays 0 under the gas target
+    genesis["base_fee_per_gas"] = 0
+    eth_tester = EthereumTester(Backend(genesis))
+    clock = _Clock()
+    # {transaction hash: (failed, output)}, eth-tester does not keep outputs
+    outputs = {}
+
+    def send_transaction(eth_tester, params):
+        tx_hash = eth_tester.send_transaction(params[0])
+        # A revert keeps its data as output, other errors return nothing
+        computation = eth_tester.backend.computation
+        failed, output = computation.is_error, computation.output
+        outputs[tx_hash] = (failed, output)
+        if failed:
+            raise _Reverted(tx_hash, output)
+        return tx_hash
+
+    def increase_time(eth_tester, params) -> int:
+        if params[0]:
+            clock.pin(eth_tester)
+            clock.offset += params[0]
+            clock.pin(eth_tester)
+            eth_tester.mine_blocks()
+        return clock.offset
+
+    def mine(eth_tester, params):
+        if params:
+            eth_tester.time_travel(params[0])
+            clock.resume_at(params[0])
+        else:
+            eth_tester.mine_blocks()
+        return "0x0"
+
+    def snapshot(eth_tester, params) -> int:
+        snapshot_id = eth_tester.take_snapshot()
+        clock.snapshots[snapshot_id] = clock.offset
+        return snapshot_id
+
+    def revert(eth_tester, params) -> bool:
+        eth_tester.revert_to_snapshot(params[0])
+        if params[0] in clock.snapshots:
+            clock.offset = clock.snapshots[params[0]]
+        else:
+            clock.resume_at(eth_tester.get_block_by_number("latest")["timestamp"])
+        return True
+
+    def trace_transaction(eth_tester, params) -> dict:
+        # brownie reads the return value from the memory of the last step
+        failed, output = outputs.get(params[0], (False, b""))
+        memory = [
+            output[i : i + 32].ljust(32, b"\x00").hex()
+            for i in range(0, len(output), 32)
+        ]
+        step = {
+            "pc": 0,
+            "op": "REVERT" if failed else "RETURN",
+            "gas": 0,
+            "gasCost": 0,
+            "depth": 1,
+            "stack": [f"{len(output):064x}", "0" * 64],
+            "memory": memory,
+            "storage": {},
+        }
+        return {
+            "gas": 0,
+            "failed": failed,
+            "returnValue": output.hex(),
+            "structLogs": [step],
+        }
+
+    endpoints = {
+        namespace: dict(methods) for namespace, methods in API_ENDPOINTS.items()
+    }
+    endpoints["eth"]["sendTransaction"] = send_transaction
+    endpoints["evm"].update(
+        increaseTime=increase_time, mine=mine, snapshot=snapshot, revert=revert
+    )
+    endpoints["debug"]["traceTransaction"] = trace_transaction
+
+    class Provider(EthereumTesterProvider):
+        endpoint_uri = CMD
+
+        def make_request(self, method, params):
+            if method == "debug_traceTransaction" and not params:
+                # brownie checks that traces are supported with empty params
+                return self._error(-32602, "missing params")
+            if method in _PENDING_METHODS:
+                clock.pin(self.ethereum_tester)
+            try:
+                return super().make_request(method, params)
+            except _Reverted as exc:
+                # Same error as ganache, brownie loads the mined transaction
+                message = "VM Exception while processing transaction: revert"
+                data = {
+                    exc.tx_hash: {
+                        "error": "revert",
+                        "program_counter": None,
+                        "reason": "0x" + exc.output.hex(),
+                    }
+                }
+                return self._error(-32000, message, data)
+            except TransactionFailed as exc:
+                # Same error as hardhat, revert data is decoded by brownie
+                message = "VM Exception while processing transaction: revert"
+                return self._error(-32000, message, _revert_data(str(exc)))
+
+        def _error(self, code: int, message: str, data=None) -> dict:
+            error = {"code": code, "message": message}
+            if isinstance(data, bytes):
+                error["data"] = "0x" + data.hex()
+            elif data is not None:
+                error["data"] = data
+            return {"jsonrpc": "2.0", "id": self._current_request_id, "error": error}
+
+    provider = Provider(eth_tester, endpoints)
+    provider.clock = clock
+    return provider
+
+
+# Requests that run in or mine the pending block, brownie calls the latest block
+_PENDING_METHODS = {
+    "eth_sendTransaction",
+    "eth_estimateGas",
+    "evm_mine",
+}
+
+
+class _Clock:
+    """
+    Time of the chain, the wall time shifted by `offset`. eth-tester creates the
+    pending block at the wall time of the last mining, it is moved to this time
+    before it is used.
+    """
+
+    def __init__(self):
+        self.offset = 0
+        # {snapshot id: offset when taken}
+        self.snapshots = {}
+
+    def resume_at(self, timestamp: int):
+        self.offset = timestamp - int(time.time())
+
+    def pin(self, eth_tester):
+        backend = eth_tester.backend
+        latest = backend.chain.get_canonical_head().timestamp
+        timestamp = max(latest + 1, int(time.time()) + self.offset)
+        # Blocks mined within a second are a second apart, the clock follows them
+        self.resume_at(timestamp)
+        backend.chain.header = backend.chain.header.copy(timestamp=timestamp)
+
+
+class _Reverted(Exception):
+    def __init__(self, tx_hash: str, output: bytes):
+        super().__init__(tx_hash)
+        self.tx_hash = tx_hash
+        self.output = output
+
+
+def _revert_data(message: str) -> bytes:
+    # eth-tester gives the reason string, or the repr of the data without one
+    from eth_abi import encode
+
+    reason = message.split("execution reverted: ", 1)[-1]
+    if reason.startswith(("b'", 'b"')):
+        return ast.literal_eval(reason)
+    return bytes.fromhex("08c379a0") + encode(["string"], [reason])
+
+
+def _database() -> dict:
+    return web3.provider.ethereum_tester.backend.chain.chaindb.db.wrapped_db.kv_store
+
+
+def dump_state() -> dict:
+    """Database of the chain, it holds every state since the genesis."""
+    return dict(_database())
+
+
+def _move_head(block_hash: bytes):
+    # The clock resumes at the head, however long ago it was mined
+    eth_tester = web3.provider.ethereum_tester
+    eth_tester.backend.revert_to_snapshot(bytes(block_hash))
+    web3.provider.clock.resume_at(eth_tester.get_block_by_number("latest")["timestamp"])
+
+
+def load_state(database: dict, head: bytes):
+    """Add a dumped database to the chain and move the head to block `head`."""
+    _database().update(database)
+    _move_head(head)
+
+
+def snapshot_at(block_hash: bytes) -> int:
+    """Move the head to `block_hash` and return the id of its snapshot."""
+    _move_head(block_hash)
+    return _request("evm_snapshot", [])
+
+
+def launch(cmd: str, **kwargs):
+    if kwargs.get("fork"):
+        raise ValueError("py-evm backend cannot fork a network")
+    web3.provider = _provider(kwargs.get("gas_limit") or 12_000_000)
+    # The node is this process, it is never killed by brownie
+    return psutil.Process()
+
+
+def on_connection():
+    pass
+
+
+def _request(method: str, args: list):
+    return web3.provider.make_request(method, args)["result"]
+
+
+def sleep(seconds: int) -> int:
+    return _request("evm_increaseTime", [seconds])
+
+
+def mine(timestamp: int = None) -> None:
+    _request("evm_mine", [timestamp] if timestamp else [])
+
+
+def snapshot() -> int:
+    return _request("evm_snapshot", [])
+
+
+def revert(snapshot_id: int) -> None:
+    _request("evm_revert", [snapshot_id])
+
+
+def unlock_account(address: str) -> None:
+    raise ValueError("py-evm backend cannot unlock accounts")
@@ -16,6 +16,7 @@ def test_parameters(peg_keeper, swap, pegged, admin, receiver):
     assert peg_keeper.future_receiver() == ZERO_ADDRESS
 
     assert peg_keeper.caller_share() == 2e4
+    assert not peg_keeper.adaptive()
 
     if hasattr(peg_keeper, "pegged_admin"):
         assert peg_keeper.pegged_admin() == admin
@@ -50,6 +51,19 @@ def test_set_new_caller_share_only_admin(peg_keeper, alice):
         peg_keeper.set_new_caller_share(5e4, {"from": alice})
 
 
+def test_set_adaptive(peg_keeper, admin):
+    peg_keeper.set_adaptive(True, {"from": admin})
+    assert peg_keeper.adaptive()
+
+    peg_keeper.set_adaptive(False, {"from": admin})
+    assert not peg_keeper.adaptive()
+
+
+def test_set_adaptive_only_admin(peg_keeper, alice):
+    with brownie.reverts():  # dev: only admin
+        peg_keeper.set_adaptive(True, {"from": alice})
+
+
 def test_commit_new_admin(peg_keeper, admin, alice):
     tx = peg_keeper.commit_new_admin(alice, {"from": admin})
     tx_time = web3.eth.get_block(tx.block_number).timestamp
@@ -0,0 +1,38 @@
+import pytest
+from brownie import chain
+
+from tests.fixtures.snapshots import ChainImage
+
+pytestmark = pytest.mark.usefixtures(
+    "add_initial_liquidity",
+    "provide_token_to_peg_keeper_no_sleep",
+    "mint_bob",
+    "approve_bob",
+)
+
+ACTION_DELAY = 15 * 60
+
+
+@pytest.fixture(autouse=True)
+def py_evm_only(request):
+    if not request.config.getoption("py_evm"):
+        pytest.skip("chain images need --py-evm")
+
+
+def test_old_image_resumes_at_head(
+    tmp_path, peg_keeper, swap, peg, bob, peg_keeper_updater
+):
+    swap.add_liquidity([0, peg.balanceOf(bob)], 0, {"from": bob})
+    image = ChainImage(tmp_path / "image")
+    image.add_state(("test", ()), chain[-1].hash)
+    image.save()
+    head = chain[-1].timestamp
+
+    # Time moved on since the image was saved
+    chain.sleep(2 * ACTION_DELAY)
+    chain.mine()
+    ChainImage(tmp_path / "image")
+    assert head <= chain.time() < head + ACTION_DELAY
+
+    chain.mine(timestamp=peg_keeper.last_change() + ACTION_DELAY)
+    assert peg_keeper.update({"from": peg_keeper_updater}).return_value
@@ -0,0 +1,100 @@
+import pytest
+from brownie import chain
+
+from scripts.event_indexer import (
+    EventIndexer,
+    debt_history,
+    load_checkpoint,
+    profit_history,
+    read_columns,
+)
+
+pytestmark = pytest.mark.usefixtures(
+    "add_initial_liquidity",
+    "provide_token_to_peg_keeper",
+)
+
+ACTION_DELAY = 15 * 60
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    return str(tmp_path / "events")
+
+
+@pytest.fixture
+def indexer(peg_keeper, index_path):
+    def _inner():
+        return EventIndexer(
+            index_path,
+            [peg_keeper],
+            from_block=peg_keeper.tx.block_number,
+            chunk_blocks=3,
+            confirmations=0,
+        )
+
+    return _inner
+
+
+@pytest.fixture
+def updates(peg_keeper, imbalance_pool, peg_keeper_updater):
+    def _inner(coins):
+        for i in coins:
+            imbalance_pool(i)
+            peg_keeper.update({"from": peg_keeper_updater})
+            chain.sleep(ACTION_DELAY)
+
+    return _inner
+
+
+def test_debt_history(peg_keeper, indexer, index_path, updates):
+    updates([1, 0, 0])
+    indexer().sync()
+
+    history = debt_history(index_path, peg_keeper.address)
+    assert len(history) == 4
+    assert history[-1][1] == peg_keeper.debt()
+    for block, debt in history:
+        assert peg_keeper.debt(block_identifier=block) == debt
+
+
+def test_profit_history(peg_keeper, indexer, index_path, updates, receiver):
+    updates([1, 0])
+    tx = peg_keeper.withdraw_profit({"from": receiver})
+    indexer().sync()
+
+    assert profit_history(index_path, peg_keeper.address) == [
+        (tx.block_number, tx.return_value)
+    ]
+
+
+def test_resume(peg_keeper, indexer, index_path, tmp_path, updates):
+    updates([1])
+    next_block = indexer().sync()
+    updates([0])
+    assert indexer().sync() == chain.height + 1
+
+    full_path = str(tmp_path / "full")
+    full = EventIndexer(
+        full_path,
+        [peg_keeper],
+        from_block=peg_keeper.tx.block_number,
+        confirmations=0,
+    )
+    full.sync()
+
+    assert load_checkpoint(index_path)["next_block"] > next_block
+    assert read_columns(index_path) == read_columns(full_path)
+
+
+def test_confirmations(peg_keeper, index_path, updates):
+    updates([1])
+    indexer = EventIndexer(
+        index_path,
+        [peg_keeper],
+        from_block=peg_keeper.tx.block_number,
+        confirmations=5,
+    )
+
+    assert indexer.sync() == chain.height - 4
+    assert chain.height not in read_columns(index_path)["block"]
@@ -0,0 +1,55 @@
+import pytest
+from brownie import chain
+
+from scripts.keeper import expected_caller_profit, load_model, try_update
+from scripts.simulation.peg_keeper import ACTION_DELAY
+
+pytestmark = pytest.mark.usefixtures(
+    "add_initial_liquidity",
+    "provide_token_to_peg_keeper_no_sleep",
+    "clear_keeper_cache",
+)
+
+
+def test_load_model(peg_keeper, peg_keeper_model, imbalance_pool):
+    imbalance_pool(1)
+
+    model = load_model(peg_keeper)
+    expected = peg_keeper_model()
+    assert type(model) is type(expected)
+    assert model.pool.balances == expected.pool.balances
+    assert model.pool.rates == expected.pool.rates
+    assert model.debt == expected.debt
+    assert model.lp_balance == expected.lp_balance
+    assert model.calc_profit() == expected.calc_profit()
+
+
+def test_expected_profit(peg_keeper, imbalance_pool, peg_keeper_updater):
+    imbalance_pool(1)
+    chain.sleep(ACTION_DELAY)
+    chain.mine()
+
+    model = load_model(peg_keeper)
+    profit = expected_caller_profit(model, chain[-1].timestamp)
+    tx = peg_keeper.update({"from": peg_keeper_updater})
+
+    assert profit > 0
+    assert profit == tx.return_value * model.pool.get_virtual_price() // 10**18
+
+
+def test_no_update_before_delay(peg_keeper, imbalance_pool, bob):
+    imbalance_pool(1)
+
+    assert not try_update(peg_keeper, bob, gas_price=0)
+    assert bob.nonce == 0
+
+
+@pytest.mark.parametrize("i", [0, 1])
+def test_update(peg_keeper, swap, imbalance_pool, bob, i):
+    imbalance_pool(i)
+    chain.sleep(ACTION_DELAY)
+    chain.mine()
+
+    assert try_update(peg_keeper, bob, gas_price=0)
+    assert swap.balanceOf(bob) > 0
+    assert peg_keeper.last_change() == chain[-1].timestamp
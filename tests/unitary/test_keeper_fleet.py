@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+from brownie import chain
+
+from scripts.keeper_fleet import Fleet, NonceManager
+from scripts.simulation.peg_keeper import ACTION_DELAY
+
+pytestmark = pytest.mark.usefixtures(
+    "add_initial_liquidity",
+    "provide_token_to_peg_keeper_no_sleep",
+    "clear_keeper_cache",
+)
+
+
+@pytest.fixture
+def fleet(peg_keeper, bob):
+    fleet = Fleet([peg_keeper], bob, gas_price=0)
+    asyncio.run(fleet.schedule())
+    return fleet
+
+
+def test_schedule(fleet, peg_keeper):
+    assert fleet._queue == [(peg_keeper.last_change() + ACTION_DELAY, 0)]
+
+
+def test_not_due(fleet, imbalance_pool, bob):
+    imbalance_pool(1)
+
+    assert asyncio.run(fleet.step()) == []
+    assert bob.nonce == 0
+
+
+@pytest.mark.parametrize("i", [0, 1])
+def test_update(fleet, peg_keeper, swap, imbalance_pool, bob, i):
+    imbalance_pool(i)
+    chain.sleep(ACTION_DELAY)
+    chain.mine()
+
+    assert asyncio.run(fleet.step()) == [0]
+    assert bob.nonce == 1
+    assert swap.balanceOf(bob) > 0
+    assert fleet._queue == [(peg_keeper.last_change() + ACTION_DELAY, 0)]
+
+
+def test_nonce_resync_waits_for_sends(bob):
+    nonces = NonceManager(bob)
+
+    async def call(fn, *args):
+        return fn(*args)
+
+    async def run():
+        first = await nonces.next(call)
+        second = await nonces.next(call)
+        await nonces.done(failed=True)
+        # The nonce is read again only after the send of `second` is finished
+        resync = asyncio.create_task(nonces.next(call))
+        await asyncio.sleep(0)
+        assert not resync.done()
+
+        await nonces.done()
+        return first, second, await resync
+
+    assert asyncio.run(run()) == (0, 1, 0)
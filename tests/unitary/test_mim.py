@@ -1,11 +1,17 @@
 import brownie
 import pytest
 
-pytestmark = pytest.mark.usefixtures(
-    "add_initial_liquidity",
-    "mint_alice",
-    "approve_alice",
-)
+pytestmark = [
+    pytest.mark.usefixtures(
+        "add_initial_liquidity",
+        "mint_alice",
+        "approve_alice",
+    ),
+    # Burns from the Peg Keeper, the py-evm backend cannot unlock accounts
+    pytest.mark.skipif(
+        "config.getoption('py_evm')", reason="needs an unlocked account"
+    ),
+]
 
 
 @pytest.fixture(scope="module", autouse=True)
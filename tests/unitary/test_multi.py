@@ -0,0 +1,185 @@
+import brownie
+import pytest
+from brownie import ZERO_ADDRESS, chain
+
+ACTION_DELAY = 15 * 60
+
+
+@pytest.fixture(scope="module")
+def pools(StableSwap, swap, coins, initial_amounts, alice):
+    # Second pool holds the pegged coin at index 1
+    pool = StableSwap.deploy(
+        "Test2",
+        "TEST2",
+        coins[::-1] + [ZERO_ADDRESS] * 2,
+        [10**18] * 4,
+        200 * 2,
+        0,
+        {"from": alice},
+    )
+    return [swap, pool]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def add_liquidity(pools, coins, initial_amounts, alice):
+    for pool, order in zip(pools, [[0, 1], [1, 0]]):
+        for i in order:
+            coins[i]._mint_for_testing(alice, initial_amounts[i], {"from": alice})
+            coins[i].approve(pool, initial_amounts[i], {"from": alice})
+        pool.add_liquidity([initial_amounts[i] for i in order], 0, {"from": alice})
+
+
+@pytest.fixture(scope="module")
+def multi(PegKeeperMulti, pools, pegged, admin, receiver, alice):
+    contract = PegKeeperMulti.deploy(pegged, receiver, 2 * 10**4, {"from": admin})
+    pegged.add_minter(contract, {"from": alice})
+    for pool in pools:
+        contract.add_pool(pool, {"from": admin})
+    return contract
+
+
+@pytest.fixture(scope="module")
+def imbalance(alice):
+    def _inner(pool, coin, amount):
+        amounts = [0, 0]
+        amounts[int(pool.coins(1) == coin)] = amount
+        coin._mint_for_testing(alice, amount, {"from": alice})
+        coin.approve(pool, amount, {"from": alice})
+        pool.add_liquidity(amounts, 0, {"from": alice})
+
+    return _inner
+
+
+def _pad(pools):
+    return list(pools) + [ZERO_ADDRESS] * (8 - len(pools))
+
+
+def test_add_pool(multi, pools):
+    assert multi.n_pools() == 2
+    assert [multi.pools(i) for i in range(3)] == _pad(pools)[:3]
+    assert [multi.debt(pool) for pool in pools] == [0, 0]
+
+
+def test_add_pool_twice(multi, pools, admin):
+    with brownie.reverts():  # dev: pool already added
+        multi.add_pool(pools[0], {"from": admin})
+
+
+def test_add_pool_only_admin(multi, swap, alice):
+    with brownie.reverts():  # dev: only admin
+        multi.add_pool(swap, {"from": alice})
+
+
+def test_update_many(multi, pools, peg, imbalance, bob, initial_amounts):
+    amount = initial_amounts[1] // 2
+    for pool in pools:
+        imbalance(pool, peg, amount)
+
+    prices = [pool.get_virtual_price() for pool in pools]
+    tx = multi.update_many(_pad(pools), {"from": bob})
+
+    assert [event["pool"] for event in tx.events["Provide"]] == list(pools)
+    for pool in pools:
+        assert multi.debt(pool) == amount // 5
+        assert multi.last_change(pool) == tx.timestamp
+        assert pool.balanceOf(bob) > 0
+    # Profit is valued by virtual prices before the update
+    assert tx.return_value == sum(
+        pool.balanceOf(bob) * price // 10**18 for pool, price in zip(pools, prices)
+    )
+
+
+def test_update_many_skips_delay(multi, pools, peg, imbalance, bob, initial_amounts):
+    imbalance(pools[0], peg, initial_amounts[1] // 2)
+    multi.update(pools[0], {"from": bob})
+
+    imbalance(pools[1], peg, initial_amounts[1] // 2)
+    tx = multi.update_many(_pad(pools), {"from": bob})
+
+    assert [event["pool"] for event in tx.events["Provide"]] == [pools[1]]
+
+
+def test_update_many_skips_noop(
+    multi, pools, StableSwap, coins, peg, pegged, imbalance, admin, alice, bob
+):
+    balanced = StableSwap.deploy(
+        "Test3",
+        "TEST3",
+        coins + [ZERO_ADDRESS] * 2,
+        [10**18] * 4,
+        200 * 2,
+        0,
+        {"from": alice},
+    )
+    amount = 10**24
+    for coin in coins:
+        coin._mint_for_testing(alice, amount, {"from": alice})
+        coin.approve(balanced, amount, {"from": alice})
+    balanced.add_liquidity([amount, amount], 0, {"from": alice})
+    multi.add_pool(balanced, {"from": admin})
+    # Nothing to withdraw without debt
+    imbalance(pools[0], pegged, amount)
+    imbalance(pools[1], peg, amount)
+
+    tx = multi.update_many(_pad([balanced] + pools), {"from": bob})
+
+    assert [event["pool"] for event in tx.events["Provide"]] == [pools[1]]
+    assert "Withdraw" not in tx.events
+    assert [multi.last_change(pool) for pool in [balanced, pools[0]]] == [0, 0]
+    assert multi.last_change(pools[1]) == tx.timestamp
+
+
+def test_update_one_only_self(multi, pools, bob):
+    with brownie.reverts():  # dev: only self
+        multi.update_one(pools[0], 0, 0, 10**18, True, 0, bob, {"from": bob})
+
+
+def test_withdraw_after_provide(
+    multi, pools, peg, pegged, imbalance, bob, initial_amounts
+):
+    imbalance(pools[1], peg, initial_amounts[1] // 2)
+    multi.update(pools[1], {"from": bob})
+    debt = multi.debt(pools[1])
+
+    chain.sleep(ACTION_DELAY)
+    imbalance(pools[1], pegged, initial_amounts[0])
+    tx = multi.update_many(_pad(pools[1:]), {"from": bob})
+
+    assert tx.events["Withdraw"]["pool"] == pools[1]
+    assert multi.debt(pools[1]) == debt - tx.events["Withdraw"]["amount"]
+
+
+def test_unknown_pool(multi, peg, bob):
+    with brownie.reverts():  # dev: unknown pool
+        multi.update_many(_pad([peg]), {"from": bob})
+
+
+def test_withdraw_profit(multi, pools, peg, imbalance, bob, receiver, initial_amounts):
+    for pool in pools:
+        imbalance(pool, peg, initial_amounts[1] // 2)
+    multi.update_many(_pad(pools), {"from": bob})
+    profits = [multi.calc_profit(pool) for pool in pools]
+
+    multi.withdraw_profit({"from": bob})
+    assert [pool.balanceOf(receiver) for pool in pools] == profits
+    assert [multi.calc_profit(pool) for pool in pools] == [0, 0]
+
+
+def test_remove_pool(multi, pools, admin):
+    multi.remove_pool(pools[0], {"from": admin})
+
+    assert multi.n_pools() == 1
+    assert multi.pools(0) == pools[1]
+    assert multi.pools(1) == ZERO_ADDRESS
+    with brownie.reverts():  # dev: unknown pool
+        multi.update(pools[0], {"from": admin})
+
+
+def test_remove_pool_with_debt(
+    multi, pools, peg, imbalance, admin, bob, initial_amounts
+):
+    imbalance(pools[0], peg, initial_amounts[1] // 2)
+    multi.update(pools[0], {"from": bob})
+
+    with brownie.reverts():  # dev: pool has debt
+        multi.remove_pool(pools[0], {"from": admin})
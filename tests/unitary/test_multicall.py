@@ -0,0 +1,65 @@
+import pytest
+from brownie import chain
+
+from scripts import keeper
+from scripts.multicall import read
+
+pytestmark = pytest.mark.usefixtures(
+    "add_initial_liquidity",
+    "provide_token_to_peg_keeper",
+    "clear_keeper_cache",
+)
+
+
+def test_read(multicall, swap, peg_keeper, pegged):
+    calls = [
+        (swap.balances, (0,)),
+        (swap.balances, (1,)),
+        (swap.balanceOf, (peg_keeper.address,)),
+        (peg_keeper.debt, ()),
+        (peg_keeper.pegged, ()),
+    ]
+    expected = [swap.balances(0), swap.balances(1), swap.balanceOf(peg_keeper)]
+    expected += [peg_keeper.debt(), pegged.address]
+
+    assert read(calls) == expected
+    assert read(calls, multicall=multicall) == expected
+
+
+def test_read_at_block(multicall, swap, imbalance_pool):
+    block = chain.height
+    balance = swap.balances(1)
+    imbalance_pool(1)
+
+    assert read([(swap.balances, (1,))], block, multicall) == [balance]
+
+
+def test_read_many(multicall, swap):
+    calls = [(swap.balances, (i % 2,)) for i in range(100)]
+
+    assert read(calls, multicall=multicall) == read(calls)
+
+
+def test_load_model(multicall, peg_keeper, imbalance_pool):
+    imbalance_pool(0)
+
+    model = keeper.load_model(peg_keeper)
+    batched = keeper.load_model(peg_keeper, multicall=multicall)
+    assert type(batched) is type(model)
+    assert batched.__dict__.keys() == model.__dict__.keys()
+    for name, value in model.__dict__.items():
+        if name == "pool":
+            assert batched.pool.__dict__ == value.__dict__
+        else:
+            assert getattr(batched, name) == value
+
+
+def test_load_models(multicall, peg_keeper, imbalance_pool):
+    imbalance_pool(0)
+
+    models = keeper.load_models([peg_keeper, peg_keeper], multicall=multicall)
+    model = keeper.load_model(peg_keeper)
+    for batched in models:
+        assert batched.pool.__dict__ == model.pool.__dict__
+        assert batched.debt == model.debt
+        assert batched.last_change == model.last_change
@@ -0,0 +1,104 @@
+import brownie
+import pytest
+from brownie import chain, web3
+
+ADMIN_ACTIONS_DEADLINE = 3 * 86400
+MAX_DEBT = 2**96 - 1
+
+pytestmark = pytest.mark.usefixtures(
+    "add_initial_liquidity",
+    "provide_token_to_peg_keeper",
+)
+
+
+def _state(peg_keeper):
+    return (
+        peg_keeper.last_change(),
+        peg_keeper.admin_actions_deadline(),
+        peg_keeper.caller_share(),
+        peg_keeper.debt(),
+    )
+
+
+@pytest.mark.parametrize("adaptive", [False, True])
+def test_layout(peg_keeper, admin, alice, adaptive):
+    peg_keeper.commit_new_admin(alice, {"from": admin})
+    peg_keeper.set_adaptive(adaptive, {"from": admin})
+    last_change, deadline, caller_share, debt = _state(peg_keeper)
+
+    packed = int.from_bytes(web3.eth.get_storage_at(peg_keeper.address, 0), "big")
+    assert packed == (
+        last_change
+        | deadline << 64
+        | caller_share << 128
+        | adaptive << 159
+        | debt << 160
+    )
+
+
+@pytest.mark.parametrize("i", [0, 1])
+@pytest.mark.parametrize("adaptive", [False, True])
+def test_update_keeps_admin_values(
+    peg_keeper, admin, alice, imbalance_pool, peg_keeper_updater, i, adaptive
+):
+    peg_keeper.commit_new_admin(alice, {"from": admin})
+    peg_keeper.set_adaptive(adaptive, {"from": admin})
+    _, deadline, caller_share, debt = _state(peg_keeper)
+    imbalance_pool(i)
+
+    tx = peg_keeper.update({"from": peg_keeper_updater})
+    amount = tx.events["Provide" if i else "Withdraw"]["amount"]
+
+    assert peg_keeper.adaptive() == adaptive
+
+    assert _state(peg_keeper) == (
+        tx.timestamp,
+        deadline,
+        caller_share,
+        debt + amount if i else debt - amount,
+    )
+
+
+def test_admin_actions_keep_state(peg_keeper, admin, alice):
+    last_change, _, _, debt = _state(peg_keeper)
+
+    peg_keeper.set_new_caller_share(5 * 10**4, {"from": admin})
+    tx = peg_keeper.commit_new_receiver(alice, {"from": admin})
+    assert _state(peg_keeper) == (
+        last_change,
+        tx.timestamp + ADMIN_ACTIONS_DEADLINE,
+        5 * 10**4,
+        debt,
+    )
+
+    chain.sleep(ADMIN_ACTIONS_DEADLINE)
+    peg_keeper.apply_new_receiver({"from": alice})
+    assert _state(peg_keeper) == (last_change, 0, 5 * 10**4, debt)
+
+
+@pytest.mark.parametrize("excess", [0, 1])
+def test_debt_bound(
+    peg_keeper,
+    peg_keeper_name,
+    pegged,
+    alice,
+    imbalance_pool,
+    peg_keeper_updater,
+    excess,
+):
+    headroom = MAX_DEBT - peg_keeper.debt()
+    if peg_keeper_name == "mim":
+        pegged._mint_for_testing(peg_keeper, 2 * headroom, {"from": alice})
+    imbalance_pool(1, 6 * headroom)
+    amount = peg_keeper.preview_update()[1]
+    # Pegged coin is not scaled in the difference, every 5 of it lower the amount by 1
+    imbalance_pool(0, 5 * (amount - headroom - excess))
+
+    if excess:
+        with brownie.reverts():  # dev: debt overflow
+            peg_keeper.update({"from": peg_keeper_updater})
+    else:
+        tx = peg_keeper.update({"from": peg_keeper_updater})
+        assert tx.events["Provide"]["amount"] == headroom
+        assert peg_keeper.debt() == MAX_DEBT
+        assert peg_keeper.last_change() == tx.timestamp
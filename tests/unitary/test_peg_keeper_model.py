@@ -0,0 +1,105 @@
+import brownie
+import pytest
+from brownie.test import given, strategy
+
+from scripts.simulation.batch import evaluate_update
+from scripts.simulation.peg_keeper import PROVIDE, WITHDRAW
+from scripts.simulation.stableswap import Revert
+
+pytestmark = pytest.mark.usefixtures(
+    "add_initial_liquidity",
+    "provide_token_to_peg_keeper",
+    "mint_alice",
+    "approve_alice",
+)
+
+
+@given(amount=strategy("uint256", min_value=10**18, max_value=10**24))
+@pytest.mark.parametrize("i", [0, 1])
+@pytest.mark.parametrize("fee", [0, 4 * 10**7])
+@pytest.mark.parametrize("adaptive", [False, True])
+def test_update(
+    swap,
+    peg_keeper,
+    peg_keeper_model,
+    admin,
+    alice,
+    peg_keeper_updater,
+    set_fees,
+    amount,
+    i,
+    fee,
+    adaptive,
+):
+    amounts = [0, 0]
+    amounts[i] = amount
+    swap.add_liquidity(amounts, 0, {"from": alice})
+    set_fees(fee)
+    peg_keeper.set_adaptive(adaptive, {"from": admin})
+
+    model = peg_keeper_model()
+    try:
+        caller_profit = model.update()
+    except Revert:
+        with brownie.reverts():
+            peg_keeper.update({"from": peg_keeper_updater})
+        return
+
+    tx = peg_keeper.update({"from": peg_keeper_updater})
+    assert tx.return_value == caller_profit
+    event = tx.events["Provide" if model.last_action == PROVIDE else "Withdraw"]
+    assert event["amount"] == model.last_amount
+    assert peg_keeper.debt() == model.debt
+    assert peg_keeper.calc_profit() == model.calc_profit()
+    assert swap.balanceOf(peg_keeper) == model.lp_balance
+    assert swap.totalSupply() == model.pool.total_supply
+    assert [swap.balances(0), swap.balances(1)] == model.pool.balances
+
+
+@given(amount=strategy("uint256", min_value=10**18, max_value=10**24))
+@pytest.mark.parametrize("i", [0, 1])
+@pytest.mark.parametrize("adaptive", [False, True])
+def test_evaluate_update(
+    swap,
+    peg_keeper,
+    admin,
+    alice,
+    bob,
+    set_fees,
+    amount,
+    i,
+    adaptive,
+    peg_keeper_name,
+):
+    if "meta" in peg_keeper_name:
+        pytest.skip("batch evaluation is for pools of equal rates")
+    peg_keeper.set_adaptive(adaptive, {"from": admin})
+
+    amounts = [0, 0]
+    amounts[i] = amount
+    swap.add_liquidity(amounts, 0, {"from": alice})
+    set_fees(4 * 10**6)
+
+    state = (
+        [swap.balances(0), swap.balances(1)],
+        swap.totalSupply(),
+        peg_keeper.debt(),
+        swap.balanceOf(peg_keeper),
+        swap.A(),
+        swap.fee(),
+    )
+    action, amount, profit_delta, caller_profit, reverted = evaluate_update(
+        state, caller_share=peg_keeper.caller_share(), adaptive=adaptive
+    )
+
+    if reverted:
+        with brownie.reverts():
+            peg_keeper.update({"from": bob})
+        return
+
+    profit_before = peg_keeper.calc_profit()
+    tx = peg_keeper.update({"from": bob})
+    assert tx.events["Provide" if action == PROVIDE else "Withdraw"]["amount"] == amount
+    assert action in (PROVIDE, WITHDRAW)
+    assert tx.return_value == caller_profit
+    assert peg_keeper.calc_profit() + caller_profit - profit_before == profit_delta
@@ -0,0 +1,135 @@
+import brownie
+import pytest
+from brownie import chain
+
+pytestmark = pytest.mark.usefixtures(
+    "add_initial_liquidity",
+    "provide_token_to_peg_keeper",
+    "mint_alice",
+    "approve_alice",
+)
+
+PROVIDE = 1
+WITHDRAW = -1
+
+
+@pytest.mark.parametrize("i", [0, 1])
+@pytest.mark.parametrize("adaptive", [False, True])
+def test_matches_update(
+    peg_keeper, admin, imbalance_pool, peg_keeper_updater, i, adaptive
+):
+    peg_keeper.set_adaptive(adaptive, {"from": admin})
+    imbalance_pool(i)
+
+    action, amount, caller_profit, delayed, reverts = peg_keeper.preview_update()
+    tx = peg_keeper.update({"from": peg_keeper_updater})
+
+    assert action == (PROVIDE if i else WITHDRAW)
+    assert amount == tx.events["Provide" if i else "Withdraw"]["amount"]
+    assert caller_profit == tx.return_value
+    assert not delayed
+    assert not reverts
+
+
+@pytest.mark.parametrize("i", [0, 1])
+def test_with_fees(peg_keeper, imbalance_pool, set_fees, peg_keeper_updater, i):
+    imbalance_pool(i)
+    set_fees(4 * 10**5)
+
+    _, amount, caller_profit, _, reverts = peg_keeper.preview_update()
+    tx = peg_keeper.update({"from": peg_keeper_updater})
+
+    assert amount == tx.events["Provide" if i else "Withdraw"]["amount"]
+    assert int(caller_profit) == pytest.approx(tx.return_value, rel=1e-6)
+    assert not reverts
+
+
+@pytest.mark.parametrize("i", [0, 1])
+def test_adaptive_with_fees(
+    peg_keeper, admin, imbalance_pool, set_fees, peg_keeper_updater, i
+):
+    # update() takes the adaptive step estimated by preview_update()
+    peg_keeper.set_adaptive(True, {"from": admin})
+    imbalance_pool(i)
+    set_fees(4 * 10**5)
+
+    action, amount, caller_profit, _, reverts = peg_keeper.preview_update()
+    tx = peg_keeper.update({"from": peg_keeper_updater})
+
+    assert action == (PROVIDE if i else WITHDRAW)
+    assert amount == tx.events["Provide" if i else "Withdraw"]["amount"]
+    assert int(caller_profit) == pytest.approx(tx.return_value, rel=1e-6)
+    assert not reverts
+
+
+def test_delayed(peg_keeper, imbalance_pool, peg_keeper_updater):
+    imbalance_pool(1)
+    peg_keeper.update({"from": peg_keeper_updater})
+    imbalance_pool(1)
+
+    assert peg_keeper.preview_update()[3]
+    assert not peg_keeper.update({"from": peg_keeper_updater}).return_value
+
+    chain.sleep(15 * 60)
+    assert not peg_keeper.preview_update()[3]
+
+
+def test_unprofitable(swap, alice, peg_keeper, set_fees, peg_keeper_updater):
+    swap.add_liquidity([10**18, 0], 0, {"from": alice})
+    set_fees(1 * 10**6)
+
+    action, _, caller_profit, _, reverts = peg_keeper.preview_update()
+    assert action == WITHDRAW
+    assert caller_profit == 0
+    assert reverts
+    with brownie.reverts():  # dev: peg was unprofitable
+        peg_keeper.update({"from": peg_keeper_updater})
+
+
+def test_balanced(peg_keeper, peg_keeper_updater):
+    action, amount, caller_profit, delayed, reverts = peg_keeper.preview_update()
+    assert (action, amount, caller_profit, delayed) == (0, 0, 0, False)
+    assert reverts
+    with brownie.reverts():
+        peg_keeper.update({"from": peg_keeper_updater})
+
+
+def test_withdraw_without_debt(peg_keeper, imbalance_pool, peg_keeper_updater):
+    imbalance_pool(0, 5 * peg_keeper.debt(), add_diff=True)
+    peg_keeper.update({"from": peg_keeper_updater})
+    assert peg_keeper.debt() == 0
+    chain.sleep(15 * 60)
+
+    action, amount, caller_profit, delayed, reverts = peg_keeper.preview_update()
+    assert (action, amount, caller_profit, delayed) == (0, 0, 0, False)
+    assert reverts
+    with brownie.reverts():
+        peg_keeper.update({"from": peg_keeper_updater})
+
+
+def test_low_pegged_balance(
+    swap,
+    pegged,
+    peg_keeper,
+    peg_keeper_name,
+    admin,
+    imbalance_pool,
+    set_fees,
+    peg_keeper_updater,
+):
+    if peg_keeper_name != "mim":
+        pytest.skip("only the MIM Peg Keeper provides from its balance")
+    peg_keeper.set_adaptive(True, {"from": admin})
+    imbalance_pool(1)
+    diff = swap.balances(1) - swap.balances(0)
+    # Between diff / 4 and diff / 2, steps are capped by it and only diff / 4 is profitable
+    balance = diff * 45 // 100
+    peg_keeper.withdraw_pegged(pegged.balanceOf(peg_keeper) - balance, {"from": admin})
+    set_fees(3 * 10**6)
+
+    action, amount, _, _, reverts = peg_keeper.preview_update()
+    tx = peg_keeper.update({"from": peg_keeper_updater})
+
+    assert action == PROVIDE
+    assert amount == tx.events["Provide"]["amount"] == diff // 4
+    assert not reverts
@@ -10,23 +10,6 @@ pytestmark = pytest.mark.usefixtures(
 )
 
 
-@pytest.fixture(scope="module")
-def make_profit(swap, peg, pegged, initial_amounts, alice, set_fees):
-    def _inner(amount):
-        """Amount to add to balances."""
-        set_fees(1 * 10**9)
-        exchange_amount = amount * 5
-
-        peg.approve(swap, exchange_amount, {"from": alice})
-        swap.exchange(0, 1, exchange_amount, 0, {"from": alice})
-
-        pegged.approve(swap, exchange_amount, {"from": alice})
-        swap.exchange(1, 0, exchange_amount, 0, {"from": alice})
-        set_fees(0)
-
-    return _inner
-
-
 def test_initial_debt(peg_keeper, initial_amounts):
     assert peg_keeper.debt() == initial_amounts[0]
 
@@ -141,11 +124,18 @@ def test_profit_share(
     peg_keeper.set_new_caller_share(share, {"from": admin})
     imbalance_pool(coin_to_imbalance)
 
+    # Profit of the update is valued by the virtual price before it
+    virtual_price = swap.get_virtual_price()
     profit_before = peg_keeper.calc_profit()
     peg_keeper.update({"from": bob})
-    profit_after = peg_keeper.calc_profit()
-
-    receiver_profit = profit_after - profit_before
     caller_profit = swap.balanceOf(bob)
+    profit_after = (
+        swap.balanceOf(peg_keeper)
+        - peg_keeper.debt() * 10**18 // virtual_price
+        - 10**18  # profit threshold
+    )
 
-    assert caller_profit == (receiver_profit + caller_profit) * share // 10**5
+    assert (
+        caller_profit
+        == (profit_after + caller_profit - profit_before) * share // 10**5
+    )
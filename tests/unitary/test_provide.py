@@ -52,3 +52,13 @@ def test_event(swap, initial_amounts, alice, peg_keeper, peg_keeper_updater):
     tx = peg_keeper.update({"from": peg_keeper_updater})
     event = tx.events["Provide"]
     assert initial_amounts[1] // 10 <= event["amount"] <= initial_amounts[1]
+
+
+def test_adaptive(swap, initial_amounts, admin, alice, peg_keeper, peg_keeper_updater):
+    peg_keeper.set_adaptive(True, {"from": admin})
+    swap.add_liquidity([0, initial_amounts[1]], 0, {"from": alice})
+    profit = peg_keeper.calc_profit()
+
+    tx = peg_keeper.update({"from": peg_keeper_updater})
+    assert tx.events["Provide"]["amount"] >= initial_amounts[1] // 4
+    assert peg_keeper.calc_profit() + tx.return_value >= profit
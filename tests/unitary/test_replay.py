@@ -0,0 +1,98 @@
+import brownie
+import pytest
+from brownie import chain
+
+from scripts.simulation.replay import (
+    ADD_LIQUIDITY,
+    EXCHANGE,
+    REMOVE_LIQUIDITY,
+    REMOVE_LIQUIDITY_ONE,
+    read_events,
+    replay,
+    sweep_replays,
+)
+
+pytestmark = pytest.mark.usefixtures(
+    "add_initial_liquidity",
+    "provide_token_to_peg_keeper",
+    "mint_alice",
+    "approve_alice",
+)
+
+ACTION_DELAY = 15 * 60
+
+ACTIONS = [
+    (EXCHANGE, 0, 10**23),
+    (ADD_LIQUIDITY, 10**23, 0),
+    (EXCHANGE, 5 * 10**22, 0),
+    (REMOVE_LIQUIDITY, 10**22, 0),
+    (REMOVE_LIQUIDITY_ONE, 0, 10**22),
+    (EXCHANGE, 0, 2 * 10**23),
+]
+
+
+def _apply(swap, alice, kind, amount0, amount1):
+    i = 0 if amount0 else 1
+    if kind == EXCHANGE:
+        return swap.exchange(i, 1 - i, amount0 or amount1, 0, {"from": alice})
+    if kind == ADD_LIQUIDITY:
+        return swap.add_liquidity([amount0, amount1], 0, {"from": alice})
+    if kind == REMOVE_LIQUIDITY:
+        return swap.remove_liquidity(amount0, [0, 0], {"from": alice})
+    return swap.remove_liquidity_one_coin(amount0 or amount1, i, 0, {"from": alice})
+
+
+def test_matches_chain(swap, peg_keeper, peg_keeper_model, set_fees, alice, bob):
+    set_fees(4 * 10**6)
+    model = peg_keeper_model()
+
+    events = []
+    updates = 0
+    for kind, amount0, amount1 in ACTIONS:
+        chain.sleep(ACTION_DELAY)
+        tx = _apply(swap, alice, kind, amount0, amount1)
+        events.append((tx.timestamp, kind, amount0, amount1))
+        try:
+            peg_keeper.update({"from": bob})
+            updates += 1
+        except brownie.exceptions.VirtualMachineError:
+            pass
+
+    report = replay(model, events)
+
+    assert report.updates == updates > 0
+    assert report.skipped == 0
+    assert report.caller_payout[-1] == swap.balanceOf(bob)
+    assert model.debt == peg_keeper.debt()
+    assert model.pool.balances == [swap.balances(0), swap.balances(1)]
+
+
+def test_read_events(tmp_path):
+    path = tmp_path / "events.csv"
+    path.write_text(
+        "timestamp,kind,amount0,amount1\n"
+        "100,exchange,0,1000\n"
+        "200,remove_liquidity_one,5,0\n"
+    )
+
+    assert read_events(str(path)) == [
+        (100, EXCHANGE, 0, 1000),
+        (200, REMOVE_LIQUIDITY_ONE, 5, 0),
+    ]
+
+
+def test_sweep(peg_keeper_model):
+    model = peg_keeper_model()
+    debt = model.debt
+    events = [(model.last_change + ACTION_DELAY, EXCHANGE, 0, 10**23)]
+
+    reports = sweep_replays(model, events, step_divisors=(2, 5), action_delays=(0,))
+
+    assert list(reports) == [(2 * 10**4, 2, 0), (2 * 10**4, 5, 0)]
+    assert (
+        reports[(2 * 10**4, 2, 0)].debt[-1]
+        > reports[(2 * 10**4, 5, 0)].debt[-1]
+        > debt
+    )
+    # Policies are replayed on copies
+    assert model.debt == debt
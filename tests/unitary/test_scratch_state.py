@@ -0,0 +1,46 @@
+from brownie import chain
+
+DAY = 86400
+
+
+def test_reverts_state(scratch_state, alice, bob):
+    balance = bob.balance()
+    height = chain.height
+
+    with scratch_state():
+        alice.transfer(bob, 10**18)
+        alice.transfer(bob, 10**18)
+        assert bob.balance() == balance + 2 * 10**18
+
+    assert bob.balance() == balance
+    assert chain.height == height
+
+
+def test_restores_time_offset(scratch_state, alice, bob):
+    now = chain.time()
+
+    with scratch_state():
+        chain.sleep(DAY)
+        alice.transfer(bob, 10**18)
+        assert chain.time() >= now + DAY
+
+    assert now <= chain.time() < now + DAY
+    alice.transfer(bob, 10**18)
+    assert chain[-1].timestamp < now + DAY
+
+
+def test_undo_redo(scratch_state, alice, bob):
+    balance = bob.balance()
+    alice.transfer(bob, 10**18)
+    height = chain.height
+
+    with scratch_state():
+        alice.transfer(bob, 10**18)
+        chain.undo()
+
+    assert not chain._redo_buffer
+    chain.undo()
+    assert bob.balance() == balance
+    chain.redo()
+    assert bob.balance() == balance + 10**18
+    assert chain.height == height
@@ -0,0 +1,215 @@
+import pytest
+from brownie.test import given, strategy
+
+from scripts.simulation import stableswap
+from scripts.simulation.stableswap import A_PRECISION, Revert, get_D, get_D_meta, get_y
+
+pytestmark = pytest.mark.usefixtures(
+    "add_initial_liquidity",
+    "mint_alice",
+    "approve_alice",
+)
+
+
+@pytest.fixture(scope="module")
+def make_imbalance(swap, alice):
+    def _inner(amount, i):
+        amounts = [0, 0]
+        amounts[i] = amount
+        swap.add_liquidity(amounts, 0, {"from": alice})
+
+    return _inner
+
+
+@given(amount=strategy("uint256", min_value=10**18, max_value=10**24))
+@pytest.mark.parametrize("i", [0, 1])
+def test_virtual_price(swap, swap_model, make_imbalance, amount, i):
+    make_imbalance(amount, i)
+
+    assert swap_model().get_virtual_price() == swap.get_virtual_price()
+
+
+@given(
+    amount=strategy("uint256", min_value=10**18, max_value=10**24),
+    deposit=strategy("uint256", min_value=1, max_value=10**24),
+)
+@pytest.mark.parametrize("i", [0, 1])
+@pytest.mark.parametrize("is_deposit", [True, False])
+def test_calc_token_amount(
+    swap, swap_model, make_imbalance, amount, deposit, i, is_deposit
+):
+    make_imbalance(amount, i)
+
+    amounts = [deposit, deposit // 3]
+    assert swap_model().calc_token_amount(
+        amounts, is_deposit
+    ) == swap.calc_token_amount(amounts, is_deposit)
+
+
+@given(
+    amount=strategy("uint256", min_value=10**18, max_value=10**24),
+    burn_amount=strategy("uint256", min_value=10**6, max_value=10**23),
+)
+@pytest.mark.parametrize("i", [0, 1])
+def test_calc_withdraw_one_coin(
+    swap, swap_model, make_imbalance, set_fees, amount, burn_amount, i
+):
+    make_imbalance(amount, i)
+    set_fees(4 * 10**7)
+
+    model = swap_model()
+    for j in range(2):
+        assert model.calc_withdraw_one_coin(
+            burn_amount, j
+        ) == swap.calc_withdraw_one_coin(burn_amount, j)
+
+
+@given(
+    amount=strategy("uint256", min_value=10**18, max_value=10**24),
+    dx=strategy("uint256", min_value=1, max_value=10**24),
+)
+@pytest.mark.parametrize("i", [0, 1])
+def test_get_dy(swap, swap_model, make_imbalance, set_fees, amount, dx, i):
+    make_imbalance(amount, i)
+    set_fees(4 * 10**7)
+
+    model = swap_model()
+    assert model.get_dy(i, 1 - i, dx) == swap.get_dy(i, 1 - i, dx)
+    assert model.get_dy(1 - i, i, dx) == swap.get_dy(1 - i, i, dx)
+
+
+def test_invariant(swap, swap_model, alice):
+    model = swap_model()
+    tx = swap.add_liquidity([10**18, 0], 0, {"from": alice})
+
+    model.balances[0] += 10**18
+    assert model.get_D_mem(model.rates, model.balances, model.A_precise) == (
+        tx.events["AddLiquidity"]["invariant"]
+    )
+
+
+@given(amounts=strategy("uint256[3]", min_value=10**18, max_value=10**24 // 3))
+@pytest.mark.parametrize("i", [0, 1])
+def test_tracked_virtual_price(swap, swap_model, make_imbalance, amounts, i):
+    model = swap_model()
+    tracker = model.track_D()
+    for amount in amounts:
+        make_imbalance(amount, i)
+        model.balances = [swap.balances(0), swap.balances(1)]
+        model.total_supply = swap.totalSupply()
+
+        assert model.get_virtual_price() == pytest.approx(
+            swap.get_virtual_price(), abs=1
+        )
+        assert model.get_virtual_price() == pytest.approx(
+            swap.get_virtual_price(), abs=1
+        )
+
+    # the second call is served from memory
+    assert tracker.iterations[1::2] == [0] * len(amounts)
+
+
+def _get_D_deployed(xp, amp, meta=False):
+    # Newton's method of deployed pools, making the last step below 1 wei
+    S = sum(xp)
+    D = S
+    Ann = amp * 2
+    for _ in range(255):
+        if meta:
+            D_P = D * D // (xp[0] * 2) * D // (xp[1] * 2)
+        else:
+            D_P = D * D // xp[0] * D // xp[1] // 4
+        Dprev = D
+        D = (
+            (Ann * S // A_PRECISION + D_P * 2)
+            * D
+            // ((Ann - A_PRECISION) * D // A_PRECISION + 3 * D_P)
+        )
+        if abs(D - Dprev) <= 1:
+            return D
+    return None
+
+
+def _get_y_deployed(x, xp, amp, D):
+    # Newton's method of deployed pools for x[1] if x[0] = x
+    Ann = amp * 2
+    c = D * D // (x * 2) * D * A_PRECISION // (Ann * 2)
+    b = x + D * A_PRECISION // Ann
+    y = D
+    for _ in range(255):
+        y_prev = y
+        y = (y * y + c) // (2 * y + b - D)
+        if abs(y - y_prev) <= 1:
+            return y
+    return None
+
+
+@given(
+    xp=strategy("uint256[2]", min_value=10**18, max_value=10**30),
+    A=strategy("uint256", min_value=10, max_value=10**4),
+)
+@pytest.mark.parametrize("meta", [False, True])
+def test_invariant_precision(xp, A, meta):
+    amp = A * A_PRECISION
+    D_deployed = _get_D_deployed(xp, amp, meta)
+    if D_deployed is None:
+        with pytest.raises(Revert):
+            (get_D_meta if meta else get_D)(xp, amp)
+        return
+
+    D = (get_D_meta if meta else get_D)(xp, amp)
+    assert abs(D - D_deployed) <= 1
+    assert abs(stableswap.get_D_warm(xp, amp, None, meta)[0] - D_deployed) <= 1
+
+    x = xp[0] + xp[0] // 10
+    y = get_y(0, 1, x, xp, amp, D)
+    assert 0 < y < xp[1]
+    assert abs(y - _get_y_deployed(x, xp, amp, D)) <= 1
+
+
+@given(
+    amount=strategy("uint256", min_value=10**18, max_value=10**23),
+    dx=strategy("uint256", min_value=10**6, max_value=10**23),
+)
+@pytest.mark.parametrize("i", [0, 1])
+def test_exchange(swap, swap_model, make_imbalance, set_fees, alice, amount, dx, i):
+    make_imbalance(amount, i)
+    set_fees(4 * 10**7)
+
+    model = swap_model()
+    dy = model.exchange(i, 1 - i, dx)
+    tx = swap.exchange(i, 1 - i, dx, 0, {"from": alice})
+
+    assert dy == tx.return_value
+    assert model.balances == [swap.balances(0), swap.balances(1)]
+
+
+@given(burn_amount=strategy("uint256", min_value=10**6, max_value=10**23))
+def test_remove_liquidity(swap, swap_model, alice, burn_amount):
+    model = swap_model()
+    amounts = model.remove_liquidity(burn_amount)
+    tx = swap.remove_liquidity(burn_amount, [0, 0], {"from": alice})
+
+    assert amounts == list(tx.return_value)
+    assert model.balances == [swap.balances(0), swap.balances(1)]
+    assert model.total_supply == swap.totalSupply()
+
+
+@given(
+    amount=strategy("uint256", min_value=10**18, max_value=10**24),
+    burn_amount=strategy("uint256", min_value=10**6, max_value=10**23),
+)
+@pytest.mark.parametrize("i", [0, 1])
+def test_remove_liquidity_one_coin(
+    swap, swap_model, make_imbalance, set_fees, alice, amount, burn_amount, i
+):
+    make_imbalance(amount, i)
+    set_fees(4 * 10**7)
+
+    model = swap_model()
+    dy = model.remove_liquidity_one_coin(burn_amount, i)
+    tx = swap.remove_liquidity_one_coin(burn_amount, i, 0, {"from": alice})
+
+    assert dy == tx.return_value
+    assert model.balances == [swap.balances(0), swap.balances(1)]
+    assert model.total_supply == swap.totalSupply()
@@ -0,0 +1,93 @@
+import pytest
+from brownie import chain
+
+from scripts.keeper import load_model
+from scripts.state_cache import StateCache
+
+pytestmark = pytest.mark.usefixtures(
+    "add_initial_liquidity",
+    "provide_token_to_peg_keeper",
+    "clear_keeper_cache",
+)
+
+
+@pytest.fixture
+def cache(peg_keeper):
+    cache = StateCache()
+    cache.add_peg_keeper(peg_keeper)
+    cache.sync()
+    return cache
+
+
+def _cached(cache, contract, name) -> bool:
+    return any(key[:2] == (contract.address, name) for key in cache._values)
+
+
+def test_read(cache, peg_keeper, swap):
+    assert cache.call(peg_keeper.debt) == peg_keeper.debt()
+    assert cache.call(peg_keeper.calc_profit) == peg_keeper.calc_profit()
+    assert cache.call(swap.balanceOf, peg_keeper.address) == swap.balanceOf(peg_keeper)
+
+
+def test_quiet_blocks(cache, peg_keeper):
+    cache.call(peg_keeper.debt)
+    cache.call(peg_keeper.calc_profit)
+    chain.mine(5)
+
+    assert cache.sync() == chain.height
+    assert _cached(cache, peg_keeper, "debt")
+    assert _cached(cache, peg_keeper, "calc_profit")
+
+
+def test_pool_event(cache, peg_keeper, swap, imbalance_pool):
+    cache.call(peg_keeper.debt)
+    cache.call(peg_keeper.calc_profit)
+    cache.call(swap.balances, 0)
+    imbalance_pool(0)
+    cache.sync()
+
+    assert _cached(cache, peg_keeper, "debt")
+    assert not _cached(cache, peg_keeper, "calc_profit")
+    assert not _cached(cache, swap, "balances")
+    assert cache.call(swap.balances, 0) == swap.balances(0)
+    assert cache.call(peg_keeper.calc_profit) == peg_keeper.calc_profit()
+
+
+def test_update(cache, peg_keeper, swap, imbalance_pool, peg_keeper_updater):
+    imbalance_pool(0)
+    cache.sync()
+    cache.call(peg_keeper.debt)
+    cache.call(swap.balanceOf, peg_keeper.address)
+    cache.call(swap.balanceOf, peg_keeper_updater.address)
+
+    peg_keeper.update({"from": peg_keeper_updater})
+    cache.sync()
+
+    assert cache.call(peg_keeper.debt) == peg_keeper.debt()
+    assert cache.call(swap.balanceOf, peg_keeper.address) == swap.balanceOf(peg_keeper)
+    assert cache.call(swap.balanceOf, peg_keeper_updater.address) == swap.balanceOf(
+        peg_keeper_updater
+    )
+
+
+def test_reorg(cache, swap, imbalance_pool):
+    imbalance_pool(1)
+    cache.sync()
+    cache.call(swap.balances, 1)
+
+    chain.undo()
+    imbalance_pool(1, 10**18)
+    cache.sync()
+
+    assert cache.call(swap.balances, 1) == swap.balances(1)
+
+
+def test_load_model(cache, peg_keeper, imbalance_pool):
+    imbalance_pool(1)
+    cache.sync()
+
+    model = load_model(peg_keeper)
+    cached = load_model(peg_keeper, cache=cache)
+    assert cached.pool.__dict__ == model.pool.__dict__
+    assert cached.calc_profit() == model.calc_profit()
+    assert cached.last_change == model.last_change